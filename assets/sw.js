@@ -1,9 +1,12 @@
 const CACHE_NAME = 'boris-life-v1';
 const STATIC_ASSETS = [
   '/',
+  '/assets/css/base.css',
   '/assets/css/style.css',
   '/assets/images/avatar.jpg'
 ];
+// The server rewrites CACHE_NAME and the paths above to match the asset manifest
+const FINGERPRINTED = /^\/assets\/.+\.[0-9a-f]{10}\.[a-z0-9]+$/;
 
 // Install - cache static assets
 self.addEventListener('install', event => {
@@ -34,6 +37,20 @@ self.addEventListener('fetch', event => {
   // Skip API requests (always go to network)
   if (event.request.url.includes('/api/')) return;
 
+  // Fingerprinted assets (/assets/css/style.<hash>.css) never change - cache first
+  if (FINGERPRINTED.test(new URL(event.request.url).pathname)) {
+    event.respondWith(
+      caches.match(event.request).then(cached => cached || fetch(event.request).then(response => {
+        if (response.ok) {
+          const responseClone = response.clone();
+          caches.open(CACHE_NAME).then(cache => cache.put(event.request, responseClone));
+        }
+        return response;
+      }))
+    );
+    return;
+  }
+
   event.respondWith(
     fetch(event.request)
       .then(response => {
@@ -0,0 +1,132 @@
+# 待验收清单（docs/PENDING_ACCEPTANCE.md）的解析模型
+#
+# 文件按 (mtime, size, inode) 缓存解析结果：每个 "### acc-XXX: 标题" 条目的字段表，
+# 以及它的状态单元格（"| **状态** | ... |" 第二、三个竖线之间）在文件中的字节区间。
+# 修改状态时只在已知区间拼接新内容，整体原子替换文件，然后平移后面各条目的区间，
+# 不需要重新解析；一次修改多个条目也只写一次文件。
+#
+# 解析规则与原来的 re.split 写法一致：第一个条目之前的内容忽略，条目内容到下一个
+# 条目标题为止，字段行以 "| **" 开头，同名字段取最后一行。
+import re
+import threading
+
+import doc_store
+
+STATUS_FIELD = '状态'
+DEFAULT_STATUS = '⏳ 待验收'
+
+_HEADER_RE = re.compile(rb'### acc-\d+:[^\n]+')
+_TITLE_RE = re.compile(r'### (acc-\d+):\s*(.+)')
+
+
+def parse(data):
+    """解析文件内容（bytes），返回 [[条目, 状态起点, 状态终点], ...]，没有状态行时区间为 None"""
+    entries = []
+    headers = list(_HEADER_RE.finditer(data))
+    for n, header in enumerate(headers):
+        match = _TITLE_RE.match(header.group(0).decode('utf-8').strip())
+        if not match:
+            continue
+        item = {
+            'id': match.group(1),
+            'title': match.group(2).strip(),
+            'fields': {},
+            'status': DEFAULT_STATUS
+        }
+        start = end = None
+        pos = header.end()
+        body_end = headers[n + 1].start() if n + 1 < len(headers) else len(data)
+        while pos < body_end:
+            eol = data.find(b'\n', pos, body_end)
+            if eol < 0:
+                eol = body_end
+            line = data[pos:eol]
+            stripped = line.strip()
+            # UTF-8 的多字节字符里不会出现 '|'，可以直接按字节切分
+            if stripped.startswith(b'| **') and b'|' in stripped[1:]:
+                parts = stripped.split(b'|')
+                if len(parts) >= 3:
+                    name = parts[1].strip().decode('utf-8').replace('**', '')
+                    value = parts[2].strip().decode('utf-8')
+                    item['fields'][name] = value
+                    if name == STATUS_FIELD:
+                        item['status'] = value
+                        first = line.index(b'|')
+                        second = line.index(b'|', first + 1)
+                        third = line.find(b'|', second + 1)
+                        start = pos + second + 1
+                        end = pos + (third if third >= 0 else len(line.rstrip()))
+            pos = eol + 1
+        entries.append([item, start, end])
+    return entries
+
+
+class AcceptanceFile:
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._entries = []
+        self._stat_key = None
+        self._lock = threading.RLock()
+
+    def _load(self):
+        """与文件一致的 (内容, 条目列表)；文件不存在时为空"""
+        key = doc_store.stat_key(self.path)
+        if key is None:
+            return b'', []
+        with self._lock:
+            if self._data is None or self._stat_key != key:
+                with open(self.path, 'rb') as f:
+                    data = f.read()
+                self._data, self._entries, self._stat_key = data, parse(data), key
+            return self._data, self._entries
+
+    def items(self):
+        """所有条目（缓存对象，不要修改）"""
+        try:
+            return [entry[0] for entry in self._load()[1]]
+        except Exception as e:
+            print(f"Error parsing acceptance file: {e}")
+            return []
+
+    def set_statuses(self, statuses):
+        """
+        批量修改状态 {条目 id: 新状态}，写一次文件；返回没有找到状态行的 id 列表
+
+        同一个 id 出现多次时每一处都会修改。
+        """
+        with self._lock:
+            data, entries = self._load()
+            found = set()
+            pieces, last, shift = [], 0, 0
+            moved = []  # (条目, 新起点, 新终点, 新状态或 None)
+            for entry in entries:
+                item, start, end = entry
+                if start is None:
+                    continue
+                status = statuses.get(item['id'])
+                if status is None:
+                    moved.append((entry, start + shift, end + shift, None))
+                    continue
+                cell = f' {status} '.encode('utf-8')
+                pieces.append(data[last:start])
+                pieces.append(cell)
+                last = end
+                moved.append((entry, start + shift, start + shift + len(cell), status))
+                shift += len(cell) - (end - start)
+                found.add(item['id'])
+            if found:
+                pieces.append(data[last:])
+                data = b''.join(pieces)
+                doc_store.write_bytes(self.path, data)
+                for entry, start, end, status in moved:
+                    entry[1], entry[2] = start, end
+                    if status is not None:
+                        entry[0]['status'] = status
+                        entry[0]['fields'][STATUS_FIELD] = status
+                self._data, self._stat_key = data, doc_store.stat_key(self.path)
+            return [item_id for item_id in statuses if item_id not in found]
+
+    def set_status(self, item_id, status):
+        """修改一个条目的状态；条目不存在或没有状态行时返回 False"""
+        return not self.set_statuses({item_id: status})
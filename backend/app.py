@@ -3,12 +3,10 @@ import os
 import sys
 import io
 import secrets
-import re
-import random
 import json
 import uuid
 from datetime import datetime, timedelta
-from functools import wraps
+from functools import lru_cache, wraps
 
 # 修复 Windows 控制台中文编码问题
 if sys.platform == 'win32':
@@ -21,11 +19,37 @@ if sys.platform == 'win32':
 # Get the project root directory (parent of backend/)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Make sibling modules importable when started as `gunicorn backend.app:app`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import acceptance
+import assets
+import compression
+import doc_store
+import etag
+import events
+import file_lock
+import pagination
+import provider_client
+import repo_stats
+import search_index
+import tag_index
+import text_sections
+import todo_stats
+import todo_storage
+import weather
+
 app = Flask(__name__,
             template_folder=os.path.join(BASE_DIR, 'frontend', 'templates'),
             static_folder=os.path.join(BASE_DIR, 'assets'),
             static_url_path='/assets')
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(16))
+# gzip / brotli for text responses (streams and small bodies are left alone)
+app.after_request(compression.compress_response)
+# Fingerprinted, precompressed static files: url_for('static', ...) emits hashed URLs
+# that are served with Cache-Control: immutable
+ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', os.path.join(BASE_DIR, 'build', 'assets'))
+asset_pipeline = assets.AssetPipeline(app.static_folder, ASSET_BUILD_DIR).init_app(app)
 
 # Data file paths
 DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -37,6 +61,9 @@ MOTIVATION_FILE = os.path.join(DATA_DIR, 'motivation.txt')
 QUOTES_FILE = os.path.join(DATA_DIR, 'quotes.txt')
 BUBBLES_FILE = os.path.join(DATA_DIR, 'bubbles.json')
 TODOS_FILE = os.path.join(DATA_DIR, 'todos.json')
+TODOS_LOG_FILE = os.path.join(DATA_DIR, 'todos.log')
+TODOS_DB_FILE = os.path.join(DATA_DIR, 'todos.db')
+EVENTS_FILE = os.path.join(DATA_DIR, 'events.log')
 PROMPTS_FILE = os.path.join(DATA_DIR, 'prompts.json')
 PROMPT_TODO_FILE = os.path.join(DATA_DIR, 'prompt-todo.json')
 EXPENSES_FILE = os.path.join(PRIVATE_DATA_DIR, 'expenses.json')
@@ -44,6 +71,20 @@ PPT_FILE = os.path.join(DATA_DIR, 'ppt.json')
 PPT_DIR = os.path.join(BASE_DIR, 'ppt')
 USERS_FILE = os.path.join(PRIVATE_DATA_DIR, 'users.json')
 
+# Todo storage mode: 'json' rewrites todos.json on every change,
+# 'journal' appends each change to todos.log and compacts it into todos.json,
+# 'write-behind' keeps todos.json but batches changes in memory and flushes them
+# from a background thread (single worker only),
+# 'sqlite' keeps todos in todos.db (migrated from todos.json on first start)
+TODO_STORAGE = os.environ.get('TODO_STORAGE', 'json')
+# Data file format: 'pretty' (indented, default) or 'compact'; both are readable
+# either way, and orjson is used for encoding/decoding when installed
+STORAGE_FORMAT = os.environ.get('STORAGE_FORMAT', 'pretty')
+doc_store.configure(compact=STORAGE_FORMAT == 'compact')
+
+# Change notifications for /api/events, shared by all worker processes through EVENTS_FILE
+events_log = events.EventLog(EVENTS_FILE)
+
 # Ensure backup directory exists
 os.makedirs(BACKUP_DIR, exist_ok=True)
 os.makedirs(EXPENSES_DIR, exist_ok=True)
@@ -54,6 +95,15 @@ CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.json')
 
 # ============ Device Detection & Platform Routing ============
 
+MOBILE_KEYWORDS = ('iphone', 'android', 'mobile', 'ipod', 'blackberry', 'windows phone')
+PLATFORMS = ('desktop', 'mobile')
+
+@lru_cache(maxsize=1024)
+def is_mobile_user_agent(user_agent):
+    """Classify a User-Agent string (memoized: browsers send a handful of distinct strings)"""
+    user_agent = user_agent.lower()
+    return any(keyword in user_agent for keyword in MOBILE_KEYWORDS)
+
 def is_mobile():
     """Detect if request is from a mobile device"""
     # Check for manual override in session
@@ -61,32 +111,51 @@ def is_mobile():
         return session['platform'] == 'mobile'
 
     # Check User-Agent
-    user_agent = request.headers.get('User-Agent', '').lower()
-    mobile_keywords = ['iphone', 'android', 'mobile', 'ipod', 'blackberry', 'windows phone']
-    return any(keyword in user_agent for keyword in mobile_keywords)
+    return is_mobile_user_agent(request.headers.get('User-Agent', ''))
 
 def get_platform():
     """Get current platform: 'mobile' or 'desktop'"""
     return 'mobile' if is_mobile() else 'desktop'
 
-def platform_template(template_name):
+def _scan_platform_templates():
+    """Map (platform, template_name) -> template path for every platform-specific override"""
+    table = {}
+    for platform in PLATFORMS:
+        platform_dir = os.path.join(app.template_folder, platform)
+        for root, _, files in os.walk(platform_dir):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), platform_dir).replace(os.sep, '/')
+                table[(platform, rel)] = f"{platform}/{rel}"
+    return table
+
+def _platform_dirs_key():
+    """mtimes of the platform template directories (changes when files are added or removed)"""
+    key = []
+    for platform in PLATFORMS:
+        for root, _, _ in os.walk(os.path.join(app.template_folder, platform)):
+            key.append((root, os.stat(root).st_mtime_ns))
+    return tuple(key)
+
+# Built once at startup; in debug mode it is rescanned when a platform directory changes
+_platform_table = {'key': _platform_dirs_key(), 'templates': _scan_platform_templates()}
+
+def platform_template(template_name, platform=None):
     """Get the correct template path based on platform"""
-    platform = get_platform()
-    platform_path = f"{platform}/{template_name}"
-
-    # Check if platform-specific template exists
-    template_full_path = os.path.join(app.template_folder, platform_path)
-    if os.path.exists(template_full_path):
-        return platform_path
-
+    if app.debug:
+        key = _platform_dirs_key()
+        if key != _platform_table['key']:
+            _platform_table['templates'] = _scan_platform_templates()
+            _platform_table['key'] = key
+    platform = platform or get_platform()
     # Fall back to original template location
-    return template_name
+    return _platform_table['templates'].get((platform, template_name), template_name)
 
 def render_platform_template(template_name, **context):
     """Render template with platform awareness"""
-    context['platform'] = get_platform()
-    context['is_mobile'] = is_mobile()
-    return render_template(platform_template(template_name), **context)
+    platform = get_platform()
+    context['platform'] = platform
+    context['is_mobile'] = platform == 'mobile'
+    return render_template(platform_template(template_name, platform), **context)
 
 # ============ Config ============
 
@@ -169,112 +238,46 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def normalize_content(content):
-    """Clean up content: normalize line endings and remove excessive blank lines"""
-    content = content.replace('\r\n', '\n').replace('\r', '\n')
-    content = re.sub(r'\n{3,}', '\n\n', content)
-    return content.strip() + '\n'
+# Sectioned text files: parsed once, cached until the file changes, updated in place on save
+TODOLIST_SECTIONS = [
+    ('today', "-------------------Today-------------------"),
+    ('this_week', "-------------------This Week-------------------"),
+    ('next_30_days', "-------------------The next 30 days-------------------"),
+]
+MOTIVATION_SECTIONS = [
+    ('leader', "-------------------精神领袖-------------------"),
+    ('family', "-------------------家庭责任-------------------"),
+    ('mindset', "-------------------心态修炼-------------------"),
+    ('health', "-------------------健康人生-------------------"),
+]
+todolist_doc = text_sections.SectionedDocument(TODOLIST_FILE, TODOLIST_SECTIONS)
+motivation_doc = text_sections.SectionedDocument(MOTIVATION_FILE, MOTIVATION_SECTIONS)
+quotes_list = text_sections.LineList(QUOTES_FILE, ["今天也要加油！"])
 
 def read_quotes():
     """Read all quotes from quotes.txt"""
-    if not os.path.exists(QUOTES_FILE):
-        return ["今天也要加油！"]
-    try:
-        with open(QUOTES_FILE, 'r', encoding='utf-8') as f:
-            quotes = [line.strip() for line in f.readlines() if line.strip()]
-        return quotes if quotes else ["今天也要加油！"]
-    except:
-        return ["今天也要加油！"]
+    return quotes_list.items()
 
 def get_random_quote():
     """Get a random quote"""
-    quotes = read_quotes()
-    return random.choice(quotes)
+    return quotes_list.choice()
 
 def parse_todolist():
     """Parse todolist.txt and return structured data"""
-    if not os.path.exists(TODOLIST_FILE):
-        return {"today": "", "this_week": "", "next_30_days": ""}
-
-    try:
-        with open(TODOLIST_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        today_header = "-------------------Today-------------------"
-        week_header = "-------------------This Week-------------------"
-        month_header = "-------------------The next 30 days-------------------"
-
-        sections = {"today": "", "this_week": "", "next_30_days": ""}
-
-        if today_header in content:
-            parts = content.split(today_header, 1)
-            if len(parts) > 1:
-                remaining = parts[1]
-                if week_header in remaining:
-                    today_part, remaining = remaining.split(week_header, 1)
-                    sections["today"] = today_part.strip()
-                    if month_header in remaining:
-                        week_part, month_part = remaining.split(month_header, 1)
-                        sections["this_week"] = week_part.strip()
-                        sections["next_30_days"] = month_part.strip()
-                    else:
-                        sections["this_week"] = remaining.strip()
-                else:
-                    sections["today"] = remaining.strip()
-
-        return sections
-
-    except Exception as e:
-        print(f"Error parsing todolist.txt: {e}")
-        return {"today": "", "this_week": "", "next_30_days": ""}
+    return todolist_doc.sections()
 
 def parse_motivation():
     """Parse motivation.txt and return structured data by categories"""
-    if not os.path.exists(MOTIVATION_FILE):
-        return {"leader": "", "family": "", "mindset": "", "health": ""}
-
-    try:
-        with open(MOTIVATION_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        leader_header = "-------------------精神领袖-------------------"
-        family_header = "-------------------家庭责任-------------------"
-        mindset_header = "-------------------心态修炼-------------------"
-        health_header = "-------------------健康人生-------------------"
-
-        sections = {"leader": "", "family": "", "mindset": "", "health": ""}
-
-        if leader_header in content:
-            parts = content.split(leader_header, 1)
-            if len(parts) > 1:
-                remaining = parts[1]
-                if family_header in remaining:
-                    leader_part, remaining = remaining.split(family_header, 1)
-                    sections["leader"] = leader_part.strip()
-                    if mindset_header in remaining:
-                        family_part, remaining = remaining.split(mindset_header, 1)
-                        sections["family"] = family_part.strip()
-                        if health_header in remaining:
-                            mindset_part, health_part = remaining.split(health_header, 1)
-                            sections["mindset"] = mindset_part.strip()
-                            sections["health"] = health_part.strip()
-                        else:
-                            sections["mindset"] = remaining.strip()
-                    else:
-                        sections["family"] = remaining.strip()
-                else:
-                    sections["leader"] = remaining.strip()
-
-        return sections
-
-    except Exception as e:
-        print(f"Error parsing motivation.txt: {e}")
-        return {"leader": "", "family": "", "mindset": "", "health": ""}
+    return motivation_doc.sections()
 
 @app.route('/sw.js')
 def service_worker():
-    """Serve service worker from root path"""
-    return send_from_directory(os.path.join(BASE_DIR, 'assets'), 'sw.js', mimetype='application/javascript')
+    """Serve service worker from root path (cache name and precache list follow the asset manifest)"""
+    with open(os.path.join(BASE_DIR, 'assets', 'sw.js'), 'r', encoding='utf-8') as f:
+        source = asset_pipeline.service_worker(f.read())
+    response = app.response_class(source, mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/manifest.json')
 def manifest():
@@ -588,109 +591,25 @@ def save_quotes():
     try:
         data = request.get_json()
         quotes = data.get('quotes', [])
-        content = '\n'.join(quotes)
-        with open(QUOTES_FILE, 'w', encoding='utf-8') as f:
-            f.write(content)
+        quotes_list.save(quotes)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # ============ Weather API ============
 
-# 天气缓存（避免频繁请求）
-_weather_cache = {
-    'data': None,
-    'timestamp': 0
-}
-WEATHER_CACHE_DURATION = 600  # 10分钟缓存
+# 天气缓存：按城市 LRU + TTL，过期后先返回旧值再后台刷新，同一城市的并发请求只查一次上游
+weather_cache = weather.WeatherCache()
 
 @app.route('/api/weather')
 def get_weather():
-    """获取天气信息（使用 wttr.in 免费API）"""
-    import time
-    import urllib.request
-    import urllib.error
-
-    # 检查缓存
-    current_time = time.time()
-    if _weather_cache['data'] and (current_time - _weather_cache['timestamp']) < WEATHER_CACHE_DURATION:
-        return jsonify(_weather_cache['data'])
-
-    try:
-        # 使用 wttr.in API 获取天气（默认滑铁卢）
-        city = request.args.get('city', 'Waterloo,Ontario')
-        url = f'https://wttr.in/{city}?format=j1'
-
-        req = urllib.request.Request(url, headers={'User-Agent': 'curl/7.68.0'})
-        with urllib.request.urlopen(req, timeout=5) as response:
-            weather_data = json.loads(response.read().decode('utf-8'))
-
-        current = weather_data.get('current_condition', [{}])[0]
-
-        # 解析天气代码
-        weather_code = int(current.get('weatherCode', 113))
-
-        # 天气类型映射
-        if weather_code in [113]:  # 晴天
-            weather_type = 'sunny'
-            icon = '☀️'
-        elif weather_code in [116, 119, 122]:  # 多云/阴天
-            weather_type = 'cloudy'
-            icon = '☁️'
-        elif weather_code in [176, 263, 266, 293, 296, 299, 302, 305, 308, 311, 314, 353, 356, 359]:  # 雨
-            weather_type = 'rainy'
-            icon = '🌧️'
-        elif weather_code in [179, 182, 185, 227, 230, 317, 320, 323, 326, 329, 332, 335, 338, 350, 362, 365, 368, 371, 374, 377, 392, 395]:  # 雪
-            weather_type = 'snowy'
-            icon = '❄️'
-        elif weather_code in [200, 386, 389]:  # 雷暴
-            weather_type = 'stormy'
-            icon = '⛈️'
-        else:
-            weather_type = 'cloudy'
-            icon = '☁️'
-
-        result = {
-            'success': True,
-            'weather_type': weather_type,
-            'icon': icon,
-            'temp_c': current.get('temp_C', '--'),
-            'temp_f': current.get('temp_F', '--'),
-            'humidity': current.get('humidity', '--'),
-            'description': current.get('weatherDesc', [{}])[0].get('value', ''),
-            'city': city,
-            'cached': False
-        }
-
-        # 更新缓存
-        _weather_cache['data'] = result
-        _weather_cache['timestamp'] = current_time
-
-        return jsonify(result)
-
-    except Exception as e:
-        # 如果有缓存，返回缓存数据
-        if _weather_cache['data']:
-            cached_result = _weather_cache['data'].copy()
-            cached_result['cached'] = True
-            return jsonify(cached_result)
-
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'weather_type': 'cloudy',
-            'icon': '☁️',
-            'temp_c': '--',
-            'description': '无法获取天气'
-        })
+    """获取天气信息（使用 wttr.in 免费API，默认滑铁卢）"""
+    city = request.args.get('city', 'Waterloo,Ontario')
+    return jsonify(weather_cache.get(city))
 
 @app.route('/save_section/<section>', methods=['POST'])
 def save_section(section):
     """Save a single section of the todo list via AJAX"""
-    today_header = "-------------------Today-------------------"
-    week_header = "-------------------This Week-------------------"
-    month_header = "-------------------The next 30 days-------------------"
-
     section_map = {
         'today': 'today',
         'week': 'this_week',
@@ -703,16 +622,7 @@ def save_section(section):
     try:
         data = request.get_json()
         new_content = data.get('content', '').strip()
-
-        sections = parse_todolist()
-        sections[section_map[section]] = new_content
-
-        file_content = f"{today_header}\n{sections['today']}\n\n{week_header}\n{sections['this_week']}\n\n{month_header}\n{sections['next_30_days']}\n"
-        file_content = normalize_content(file_content)
-
-        with open(TODOLIST_FILE, 'w', encoding='utf-8') as f:
-            f.write(file_content)
-
+        todolist_doc.update(section_map[section], new_content)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -720,11 +630,6 @@ def save_section(section):
 @app.route('/save_motivation/<section>', methods=['POST'])
 def save_motivation_section(section):
     """Save a single section of motivation via AJAX"""
-    leader_header = "-------------------精神领袖-------------------"
-    family_header = "-------------------家庭责任-------------------"
-    mindset_header = "-------------------心态修炼-------------------"
-    health_header = "-------------------健康人生-------------------"
-
     section_map = {
         'leader': 'leader',
         'family': 'family',
@@ -738,51 +643,60 @@ def save_motivation_section(section):
     try:
         data = request.get_json()
         new_content = data.get('content', '').strip()
-
-        sections = parse_motivation()
-        sections[section_map[section]] = new_content
-
-        file_content = f"{leader_header}\n{sections['leader']}\n\n{family_header}\n{sections['family']}\n\n{mindset_header}\n{sections['mindset']}\n\n{health_header}\n{sections['health']}\n"
-        file_content = normalize_content(file_content)
-
-        with open(MOTIVATION_FILE, 'w', encoding='utf-8') as f:
-            f.write(file_content)
-
+        motivation_doc.update(section_map[section], new_content)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # ============ Todo Items with Quadrants ============
 
+todo_store = todo_storage.create_backend(TODO_STORAGE, TODOS_FILE, TODOS_LOG_FILE, TODOS_DB_FILE)
+
 def read_todos():
-    """Read all todo items from todos.json"""
-    if not os.path.exists(TODOS_FILE):
-        return {"items": []}
-    try:
-        with open(TODOS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {"items": []}
+    """Read all todo items as {"items": [...]} from the configured backend"""
+    return todo_store.read_document()
 
 def save_todos(data):
-    """Save all todo items to todos.json"""
-    with open(TODOS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Replace all todo items (single-item changes go through todo_store)"""
+    todo_store.write_document(data)
+    events_log.publish('todos', 'replace')
 
 @app.route('/api/todos', methods=['GET'])
+@etag.conditional(lambda: todo_store.version())
 def get_todos():
-    """Get all todo items, optionally filtered by tab"""
+    """Get all todo items, optionally filtered by tab and/or tag"""
     tab = request.args.get('tab', None)
-    data = read_todos()
-    items = data.get('items', [])
+    tag = request.args.get('tag', None)
+    # Sorted: incomplete first, then by created_at
+    items = todo_store.list_items(tab, tag)
+    return jsonify({'items': items})
 
-    if tab:
-        items = [item for item in items if item.get('tab') == tab]
+# A write stamps updated_at just before it commits, so the window before the
+# previous token is re-sent on every sync; clients apply items by id
+TODO_SYNC_OVERLAP = timedelta(seconds=5)
 
-    # Sort: incomplete first, then by created_at
-    items.sort(key=lambda x: (x.get('completed', False), x.get('created_at', '')))
+@app.route('/api/todos/changes', methods=['GET'])
+def get_todo_changes():
+    """
+    Delta sync: todos created or updated, and ids deleted, since ?since=<token>
 
-    return jsonify({'items': items})
+    Every response carries the token for the next call. Without since, or when
+    the token predates a full replace (import, backup restore) or the tombstone
+    retention window, returns every item with reset=true.
+    """
+    token = datetime.now().isoformat()  # taken before reading, so nothing committed later is skipped
+    since = request.args.get('since', '')
+    changes = None
+    if since:
+        try:
+            cutoff = datetime.fromisoformat(since) - TODO_SYNC_OVERLAP
+        except ValueError:
+            return jsonify({'error': 'invalid since token'}), 400
+        changes = todo_store.changes(cutoff.isoformat())
+    if changes is None:
+        return jsonify({'items': todo_store.list_items(), 'deleted': [], 'reset': True, 'token': token})
+    items, deleted = changes
+    return jsonify({'items': items, 'deleted': deleted, 'reset': False, 'token': token})
 
 @app.route('/api/todos', methods=['POST'])
 def create_todo():
@@ -803,9 +717,8 @@ def create_todo():
             'updated_at': now
         }
 
-        data = read_todos()
-        data['items'].append(item)
-        save_todos(data)
+        todo_store.insert(item)
+        events_log.publish('todos', 'insert', item['id'])
 
         return jsonify({'success': True, 'item': item})
     except Exception as e:
@@ -816,31 +729,30 @@ def update_todo(item_id):
     """Update a todo item (text, quadrant, tab, tags, completed status)"""
     try:
         req_data = request.get_json()
-        data = read_todos()
 
-        for i, item in enumerate(data['items']):
-            if item['id'] == item_id:
-                # Update fields if provided
-                if 'text' in req_data:
-                    data['items'][i]['text'] = req_data['text']
-                if 'quadrant' in req_data:
-                    data['items'][i]['quadrant'] = req_data['quadrant']
-                if 'tab' in req_data:
-                    data['items'][i]['tab'] = req_data['tab']
-                if 'tags' in req_data:  # F401: Task labels support
-                    data['items'][i]['tags'] = req_data['tags']
-                if 'completed' in req_data:
-                    data['items'][i]['completed'] = req_data['completed']
-                    if req_data['completed']:
-                        data['items'][i]['completed_at'] = datetime.now().isoformat()
-                    else:
-                        data['items'][i]['completed_at'] = None
-
-                data['items'][i]['updated_at'] = datetime.now().isoformat()
-                save_todos(data)
-                return jsonify({'success': True, 'item': data['items'][i]})
+        # Collect changed fields if provided
+        changes = {}
+        if 'text' in req_data:
+            changes['text'] = req_data['text']
+        if 'quadrant' in req_data:
+            changes['quadrant'] = req_data['quadrant']
+        if 'tab' in req_data:
+            changes['tab'] = req_data['tab']
+        if 'tags' in req_data:  # F401: Task labels support
+            changes['tags'] = req_data['tags']
+        if 'completed' in req_data:
+            changes['completed'] = req_data['completed']
+            if req_data['completed']:
+                changes['completed_at'] = datetime.now().isoformat()
+            else:
+                changes['completed_at'] = None
+        changes['updated_at'] = datetime.now().isoformat()
 
-        return jsonify({'success': False, 'error': 'Not found'}), 404
+        item = todo_store.update(item_id, changes)
+        if item is None:
+            return jsonify({'success': False, 'error': 'Not found'}), 404
+        events_log.publish('todos', 'update', item_id)
+        return jsonify({'success': True, 'item': item})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -848,9 +760,8 @@ def update_todo(item_id):
 def delete_todo(item_id):
     """Delete a todo item"""
     try:
-        data = read_todos()
-        data['items'] = [item for item in data['items'] if item['id'] != item_id]
-        save_todos(data)
+        if todo_store.delete(item_id):
+            events_log.publish('todos', 'delete', item_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -862,51 +773,41 @@ def batch_update_todos():
         req_data = request.get_json()
         updates = req_data.get('updates', [])
 
-        data = read_todos()
         now = datetime.now().isoformat()
 
+        changes = []
         for update in updates:
-            item_id = update.get('id')
-            for i, item in enumerate(data['items']):
-                if item['id'] == item_id:
-                    if 'quadrant' in update:
-                        data['items'][i]['quadrant'] = update['quadrant']
-                    if 'tab' in update:
-                        data['items'][i]['tab'] = update['tab']
-                    data['items'][i]['updated_at'] = now
-                    break
-
-        save_todos(data)
+            fields = {'updated_at': now}
+            if 'quadrant' in update:
+                fields['quadrant'] = update['quadrant']
+            if 'tab' in update:
+                fields['tab'] = update['tab']
+            changes.append((update.get('id'), fields))
+
+        if todo_store.batch_update(changes):
+            events_log.publish('todos', 'update')
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # ============ Bubble Chart Version Control ============
 
+bubbles_store = doc_store.Collection(BUBBLES_FILE, on_change=events_log.publisher('bubbles'))
+
 def read_bubbles():
-    """Read all bubble charts from bubbles.json"""
-    if not os.path.exists(BUBBLES_FILE):
-        return []
-    try:
-        with open(BUBBLES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+    """Read all bubble charts from bubbles.json (cached until the file changes)"""
+    return bubbles_store.items()
 
 def save_bubbles(bubbles):
     """Save all bubble charts to bubbles.json"""
-    with open(BUBBLES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(bubbles, f, ensure_ascii=False, indent=2)
+    bubbles_store.save(bubbles)
 
 def find_bubble(bubble_id):
-    """Find a bubble chart by ID"""
-    bubbles = read_bubbles()
-    for b in bubbles:
-        if b['id'] == bubble_id:
-            return b
-    return None
+    """Find a bubble chart by ID (hash index lookup)"""
+    return bubbles_store.get(bubble_id)
 
 @app.route('/api/bubbles', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(BUBBLES_FILE))
 def get_bubbles():
     """Get all saved bubble charts (list view)"""
     bubbles = read_bubbles()
@@ -923,6 +824,7 @@ def get_bubbles():
     return jsonify({'bubbles': result})
 
 @app.route('/api/bubbles/<bubble_id>', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(BUBBLES_FILE))
 def get_bubble(bubble_id):
     """Get a specific bubble chart by ID"""
     bubble = find_bubble(bubble_id)
@@ -946,9 +848,7 @@ def create_bubble():
             'created_at': now,
             'updated_at': now
         }
-        bubbles = read_bubbles()
-        bubbles.append(bubble)
-        save_bubbles(bubbles)
+        bubbles_store.insert(bubble)
         return jsonify({'success': True, 'bubble': bubble})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -958,18 +858,18 @@ def update_bubble(bubble_id):
     """Update an existing bubble chart"""
     try:
         data = request.get_json()
-        bubbles = read_bubbles()
-        for i, b in enumerate(bubbles):
-            if b['id'] == bubble_id:
-                bubbles[i]['title'] = data.get('title', b['title'])
-                bubbles[i]['description'] = data.get('description', b.get('description', ''))
-                bubbles[i]['x_label'] = data.get('x_label', b['x_label'])
-                bubbles[i]['y_label'] = data.get('y_label', b['y_label'])
-                bubbles[i]['data'] = data.get('data', b['data'])
-                bubbles[i]['updated_at'] = datetime.now().isoformat()
-                save_bubbles(bubbles)
-                return jsonify({'success': True, 'bubble': bubbles[i]})
-        return jsonify({'success': False, 'error': 'Not found'}), 404
+        with bubbles_store.lock:
+            b = bubbles_store.get(bubble_id)
+            if b is None:
+                return jsonify({'success': False, 'error': 'Not found'}), 404
+            b['title'] = data.get('title', b['title'])
+            b['description'] = data.get('description', b.get('description', ''))
+            b['x_label'] = data.get('x_label', b['x_label'])
+            b['y_label'] = data.get('y_label', b['y_label'])
+            b['data'] = data.get('data', b['data'])
+            b['updated_at'] = datetime.now().isoformat()
+            bubbles_store.save()
+        return jsonify({'success': True, 'bubble': b})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -977,9 +877,7 @@ def update_bubble(bubble_id):
 def delete_bubble(bubble_id):
     """Delete a bubble chart"""
     try:
-        bubbles = read_bubbles()
-        bubbles = [b for b in bubbles if b['id'] != bubble_id]
-        save_bubbles(bubbles)
+        bubbles_store.remove(bubble_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -1003,37 +901,55 @@ def duplicate_bubble(bubble_id):
             'created_at': now,
             'updated_at': now
         }
-        bubbles = read_bubbles()
-        bubbles.append(new_bubble)
-        save_bubbles(bubbles)
+        bubbles_store.insert(new_bubble)
         return jsonify({'success': True, 'bubble': new_bubble})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # ============ Prompt Log ============
 
+# Tag, full-text and (created_at, id) order indexes follow single-prompt writes incrementally
+prompts_store = doc_store.Collection(PROMPTS_FILE, derived=doc_store.Derived(
+    tags=tag_index.TagIndex(), text=search_index.TextIndex('content'),
+    order=pagination.KeysetOrder()), on_change=events_log.publisher('prompts'))
+
 def read_prompts():
-    """Read all prompts from prompts.json"""
-    if not os.path.exists(PROMPTS_FILE):
-        return []
-    try:
-        with open(PROMPTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+    """Read all prompts from prompts.json (cached until the file changes)"""
+    return prompts_store.items()
 
 def save_prompts(prompts):
     """Save all prompts to prompts.json"""
-    with open(PROMPTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(prompts, f, ensure_ascii=False, indent=2)
+    prompts_store.save(prompts)
 
 @app.route('/api/prompts', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(PROMPTS_FILE))
 def get_prompts():
-    """Get all prompts"""
-    prompts = read_prompts()
-    # Sort by created_at descending (newest first)
-    prompts.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    return jsonify({'prompts': prompts})
+    """
+    Get all prompts, newest first
+
+    With ?limit= (and ?cursor= from the previous page's next_cursor) returns one
+    page ordered by (created_at, id) from the presorted in-memory order, plus
+    next_cursor (null on the last page) and total.
+    """
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        prompts = read_prompts()
+        # Sort by created_at descending (newest first)
+        prompts = sorted(prompts, key=lambda x: x.get('created_at', ''), reverse=True)
+        return jsonify({'prompts': prompts})
+    try:
+        limit, cursor = pagination.parse_page_args(request.args.get('limit'), request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'prompts': [], 'error': str(e)}), 400
+    with prompts_store.lock:
+        order = prompts_store.derived().order
+        keys, next_key = order.page(limit, cursor)
+        prompts = [prompts_store.get(key[-1]) for key in keys]
+        total = len(order)
+    return jsonify({
+        'prompts': prompts,
+        'next_cursor': pagination.encode_cursor(next_key) if next_key else None,
+        'total': total,
+    })
 
 @app.route('/api/prompts', methods=['POST'])
 def create_prompt():
@@ -1047,9 +963,7 @@ def create_prompt():
             'tags': data.get('tags', []),
             'created_at': now
         }
-        prompts = read_prompts()
-        prompts.append(prompt)
-        save_prompts(prompts)
+        prompts_store.insert(prompt)
         return jsonify({'success': True, 'prompt': prompt})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -1059,16 +973,11 @@ def update_prompt(prompt_id):
     """Update a prompt entry"""
     try:
         data = request.get_json()
-        prompts = read_prompts()
-        for i, p in enumerate(prompts):
-            if p['id'] == prompt_id:
-                if 'content' in data:
-                    prompts[i]['content'] = data['content']
-                if 'tags' in data:
-                    prompts[i]['tags'] = data['tags']
-                save_prompts(prompts)
-                return jsonify({'success': True, 'prompt': prompts[i]})
-        return jsonify({'success': False, 'error': 'Not found'}), 404
+        changes = {field: data[field] for field in ('content', 'tags') if field in data}
+        p = prompts_store.update(prompt_id, changes)
+        if p is None:
+            return jsonify({'success': False, 'error': 'Not found'}), 404
+        return jsonify({'success': True, 'prompt': p})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -1086,9 +995,7 @@ def delete_prompt(prompt_id):
         if password != correct_password:
             return jsonify({'success': False, 'error': '密码错误'}), 403
 
-        prompts = read_prompts()
-        prompts = [p for p in prompts if p['id'] != prompt_id]
-        save_prompts(prompts)
+        prompts_store.remove(prompt_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -1112,146 +1019,227 @@ def sanitize_content(content):
 
 # ============ 文件锁机制 ============
 import threading
-import time
 
-# 全局文件锁（进程内线程安全）
-_prompt_todo_lock = threading.Lock()
+# 跨进程读写锁（flock）：读取持共享锁，写入持独占锁
 LOCK_FILE = PROMPT_TODO_FILE + '.lock'
 LOCK_TIMEOUT = 10  # 秒
+prompt_todo_lock = file_lock.FileLock(LOCK_FILE)
 
-def _acquire_file_lock():
-    """
-    获取文件锁（跨进程安全）
-    使用 .lock 文件实现简单的锁机制
-    """
-    start_time = time.time()
-    while True:
+def _load_prompt_todo_file():
+    """读取主文件，缺失或损坏时返回 None"""
+    if os.path.exists(PROMPT_TODO_FILE):
         try:
-            # 尝试创建锁文件（原子操作）
-            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-            os.write(fd, str(os.getpid()).encode())
-            os.close(fd)
-            return True
-        except FileExistsError:
-            # 锁文件已存在，检查是否过期
-            try:
-                lock_age = time.time() - os.path.getmtime(LOCK_FILE)
-                if lock_age > LOCK_TIMEOUT:
-                    # 锁已过期，强制释放
-                    os.remove(LOCK_FILE)
-                    print(f"[LOCK] 强制释放过期锁 (已存在 {lock_age:.1f}s)")
-                    continue
-            except:
-                pass
+            data = doc_store.read_json(PROMPT_TODO_FILE)
+            if isinstance(data, list):
+                return data
+        except Exception as e:
+            print(f"[ERROR] 主文件读取失败: {e}")
+    return None
 
-            # 等待重试
-            if time.time() - start_time > LOCK_TIMEOUT:
-                print("[LOCK] 获取锁超时")
-                return False
-            time.sleep(0.1)
+def _recover_prompt_todos(backup_file):
+    """主文件不可用时从 .backup 恢复（需持有独占锁）"""
+    # 等独占锁期间可能已经被其他进程修复
+    data = _load_prompt_todo_file()
+    if data is not None:
+        return data
+
+    # 第二层：主文件失败，尝试从备份恢复
+    if os.path.exists(backup_file):
+        try:
+            data = doc_store.read_json(backup_file)
+            if isinstance(data, list):
+                print(f"[RECOVERY] 从备份文件恢复了 {len(data)} 条数据")
+                # 恢复成功，同时修复主文件（原子替换：.backup 可能与主文件共用 inode）
+                try:
+                    doc_store.write_json(PROMPT_TODO_FILE, data)
+                    print("[RECOVERY] 主文件已修复")
+                except:
+                    pass
+                return data
         except Exception as e:
-            print(f"[LOCK] 获取锁失败: {e}")
-            return False
+            print(f"[ERROR] 备份文件也读取失败: {e}")
 
-def _release_file_lock():
-    """释放文件锁"""
-    try:
-        if os.path.exists(LOCK_FILE):
-            os.remove(LOCK_FILE)
-    except Exception as e:
-        print(f"[LOCK] 释放锁失败: {e}")
+    # 两个文件都不存在 = 空列表（正常情况）
+    if not os.path.exists(PROMPT_TODO_FILE) and not os.path.exists(backup_file):
+        return []
 
-def read_prompt_todos():
+    # 文件存在但都无法读取 = 返回 None（阻止写入）
+    print("[CRITICAL] 所有数据文件都无法读取，拒绝后续写入操作")
+    return None
+
+def _read_prompt_todos_locked():
     """
-    读取 prompt-todo.json，带自动恢复机制和文件锁
+    在文件锁保护下读取 prompt-todo.json（快照失效且无锁读取失败时使用）
 
     防护层级：
-    1. 文件锁保护（防止并发读写冲突）
-    2. 主文件读取失败 → 尝试从 .backup 恢复
+    1. 文件锁保护（共享锁，读取之间互不阻塞）
+    2. 主文件读取失败 → 改持独占锁，尝试从 .backup 恢复
     3. 备份也失败 → 返回 None（阻止后续写入）
     """
     backup_file = PROMPT_TODO_FILE + '.backup'
 
-    with _prompt_todo_lock:  # 线程锁
-        if not _acquire_file_lock():  # 进程锁
-            print("[ERROR] 无法获取文件锁")
-            return None
+    try:
+        # 第一层：尝试读取主文件
+        with prompt_todo_lock.hold(shared=True, timeout=LOCK_TIMEOUT):
+            data = _load_prompt_todo_file()
+            if data is not None:
+                return data
+            if not os.path.exists(PROMPT_TODO_FILE) and not os.path.exists(backup_file):
+                return []
+
+        # 恢复时要重写主文件，不能在共享锁下进行
+        with prompt_todo_lock.hold(timeout=LOCK_TIMEOUT):
+            return _recover_prompt_todos(backup_file)
+    except file_lock.LockTimeout:
+        print("[ERROR] 无法获取文件锁")
+        return None
+
+class _PromptTodoSnapshot:
+    """已提交的一个版本：列表和索引都不再修改，新版本整体替换"""
+    __slots__ = ('stat_key', 'todos', 'index', '_order')
+
+    def __init__(self, stat_key, todos):
+        self.stat_key = stat_key
+        self.todos = todos
+        self.index = {}
+        for t in todos:
+            self.index.setdefault(t.get('id'), t)
+        self._order = None
+
+    def order(self):
+        """(created_at, id) 排序，每个版本第一次分页时构建一次"""
+        if self._order is None:
+            order = pagination.KeysetOrder()
+            order.rebuild(self.todos)
+            self._order = order
+        return self._order
+
+# 最近一次提交的版本。读取方直接拿这个引用（赋值是原子的），不加锁
+_prompt_todo_snapshot = None
+
+def _publish_prompt_todos(todos):
+    global _prompt_todo_snapshot
+    snapshot = _PromptTodoSnapshot(doc_store.stat_key(PROMPT_TODO_FILE), todos)
+    _prompt_todo_snapshot = snapshot
+    return snapshot
+
+def prompt_todo_snapshot():
+    """
+    当前版本的 prompt-todo 快照，读取失败时返回 None
 
+    文件未变化时直接返回内存中的快照，不碰锁也不读文件；文件被其他进程替换后
+    先无锁解析（写入方总是整体替换文件，解析前后 stat 一致说明读到的是完整版本），
+    不行再走加锁读取和备份恢复。
+    """
+    key = doc_store.stat_key(PROMPT_TODO_FILE)
+    snapshot = _prompt_todo_snapshot
+    if snapshot is not None and key is not None and snapshot.stat_key == key:
+        return snapshot
+
+    if key is not None:
         try:
-            # 第一层：尝试读取主文件
-            if os.path.exists(PROMPT_TODO_FILE):
-                try:
-                    with open(PROMPT_TODO_FILE, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if isinstance(data, list):
-                            return data
-                except Exception as e:
-                    print(f"[ERROR] 主文件读取失败: {e}")
+            data = doc_store.read_json(PROMPT_TODO_FILE)
+        except Exception:
+            data = None
+        if isinstance(data, list) and doc_store.stat_key(PROMPT_TODO_FILE) == key:
+            return _publish_prompt_todos(data)
 
-            # 第二层：主文件失败，尝试从备份恢复
-            if os.path.exists(backup_file):
-                try:
-                    with open(backup_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if isinstance(data, list):
-                            print(f"[RECOVERY] 从备份文件恢复了 {len(data)} 条数据")
-                            # 恢复成功，同时修复主文件
-                            try:
-                                with open(PROMPT_TODO_FILE, 'w', encoding='utf-8') as fw:
-                                    json.dump(data, fw, ensure_ascii=False, indent=2)
-                                print("[RECOVERY] 主文件已修复")
-                            except:
-                                pass
-                            return data
-                except Exception as e:
-                    print(f"[ERROR] 备份文件也读取失败: {e}")
+    todos = _read_prompt_todos_locked()
+    if todos is None:
+        return None
+    return _publish_prompt_todos(todos)
 
-            # 两个文件都不存在 = 空列表（正常情况）
-            if not os.path.exists(PROMPT_TODO_FILE) and not os.path.exists(backup_file):
-                return []
+_prompt_todo_text = search_index.TextIndex('content')
+_prompt_todo_text_lock = threading.Lock()
+
+def search_prompt_todos(terms, limit):
+    """
+    在当前快照上全文检索 prompt-todo，返回 [(score, todo), ...]
 
-            # 文件存在但都无法读取 = 返回 None（阻止写入）
-            print("[CRITICAL] 所有数据文件都无法读取，拒绝后续写入操作")
-            return None
+    索引跟随快照增量更新：快照不可变，新旧版本中同一个记录对象必然没变，
+    只需处理新增、删除和被替换的记录。
+    """
+    snapshot = prompt_todo_snapshot()
+    if snapshot is None:
+        return []
+    with _prompt_todo_text_lock:
+        previous = _prompt_todo_text.version
+        if previous is not snapshot:
+            if previous is None:
+                _prompt_todo_text.rebuild(snapshot.todos)
+            else:
+                for todo_id, todo in previous.index.items():
+                    if snapshot.index.get(todo_id) is not todo:
+                        _prompt_todo_text.discard(todo)
+                for todo_id, todo in snapshot.index.items():
+                    if previous.index.get(todo_id) is not todo:
+                        _prompt_todo_text.add(todo)
+            _prompt_todo_text.version = snapshot
+        scores = _prompt_todo_text.search(terms)
+    top = sorted(scores.items(), key=lambda pair: -pair[1])[:limit]
+    return [(score, snapshot.index[todo_id]) for todo_id, score in top]
 
-        finally:
-            _release_file_lock()
+def read_prompt_todos():
+    """
+    读取 prompt-todo.json（已提交的快照，读取方不加锁）
 
-def save_prompt_todos(todos, operation='unknown'):
+    返回的列表和其中的记录是共享的只读版本：修改时构造新列表 / 新记录，
+    再交给 save_prompt_todos()。读取失败返回 None（阻止后续写入）。
+    """
+    snapshot = prompt_todo_snapshot()
+    return snapshot.todos if snapshot is not None else None
+
+def _prompt_todo_count_on_disk():
+    """主文件当前的条目数：快照与文件一致时直接用快照，否则才解析文件"""
+    snapshot = _prompt_todo_snapshot
+    if snapshot is not None and snapshot.stat_key == doc_store.stat_key(PROMPT_TODO_FILE):
+        return len(snapshot.todos)
+    try:
+        old_data = doc_store.read_json(PROMPT_TODO_FILE)
+        return len(old_data) if isinstance(old_data, list) else 0
+    except:
+        return 0
+
+def _rotate_prompt_todo_backups(backup_file, backup_file2):
+    """backup2 <- backup <- 主文件，只改目录项不复制数据"""
+    if os.path.exists(backup_file):
+        os.replace(backup_file, backup_file2)
+    if os.path.exists(PROMPT_TODO_FILE):
+        # .backup 硬链接到当前主文件的 inode；随后主文件被 os.replace 换成新 inode，
+        # .backup 仍指向旧内容。文件系统不支持硬链接时退回复制
+        link_path = f"{backup_file}.{os.getpid()}.tmp"
+        try:
+            os.link(PROMPT_TODO_FILE, link_path)
+        except OSError:
+            shutil.copy2(PROMPT_TODO_FILE, link_path)
+        os.replace(link_path, backup_file)
+
+# save_prompt_todos operation -> change event op
+PROMPT_TODO_EVENT_OPS = {'add': 'insert', 'update': 'update', 'delete': 'delete'}
+
+def save_prompt_todos(todos, operation='unknown', item_id=None):
     """
     保存 prompt-todo.json，带多重保护和文件锁
 
     防护层级：
-    1. 文件锁保护（防止并发写入冲突）
-    2. 数据校验：防止意外清空
-    3. 原子写入：先写临时文件，成功后再替换
-    4. 多级备份：保留 .backup 和 .backup2
+    1. 文件锁保护（独占锁，防止并发写入冲突）
+    2. 数据校验：防止意外清空（旧条目数取自内存快照）
+    3. 原子写入：先写临时文件并 fsync，校验落盘大小后再 os.replace 替换
+    4. 多级备份：保留 .backup 和 .backup2（改名 / 硬链接轮换，不复制文件）
 
     参数:
         todos: 要保存的数据
         operation: 操作类型 ('add', 'update', 'delete', 'unknown')
+        item_id: 被修改的条目（用于变更推送）
     """
-    import shutil
-    import tempfile
-
     backup_file = PROMPT_TODO_FILE + '.backup'
     backup_file2 = PROMPT_TODO_FILE + '.backup2'
 
-    with _prompt_todo_lock:  # 线程锁
-        if not _acquire_file_lock():  # 进程锁
-            print("[ERROR] 无法获取文件锁，保存被阻止")
-            return False
-
-        try:
+    try:
+        with prompt_todo_lock.hold(timeout=LOCK_TIMEOUT):  # 独占锁
             # 第一层：数据完整性校验
             if os.path.exists(PROMPT_TODO_FILE):
-                try:
-                    with open(PROMPT_TODO_FILE, 'r', encoding='utf-8') as f:
-                        old_data = json.load(f)
-                        old_count = len(old_data) if isinstance(old_data, list) else 0
-                except:
-                    old_count = 0
-
+                old_count = _prompt_todo_count_on_disk()
                 new_count = len(todos) if todos else 0
 
                 # 危险操作检测：数据量骤降（除非是显式删除操作）
@@ -1260,34 +1248,28 @@ def save_prompt_todos(todos, operation='unknown'):
                     print(f"[BLOCKED] 如需批量删除，请使用 delete 操作")
                     return False
 
-            # 第二层：多级备份（backup2 <- backup <- 主文件）
+            # 第二层：原子写入（写临时文件 → fsync → 校验大小 → 替换）
+            # 写入的就是内存中序列化好的字节，用 fstat 核对落盘长度（发现写入被截断），不再读回整个文件
+            temp_path = f"{PROMPT_TODO_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
             try:
-                if os.path.exists(backup_file):
-                    shutil.copy2(backup_file, backup_file2)
-                if os.path.exists(PROMPT_TODO_FILE):
-                    shutil.copy2(PROMPT_TODO_FILE, backup_file)
-            except Exception as e:
-                print(f"[WARNING] 备份创建失败: {e}")
+                payload = doc_store.dumps(todos)
+                with open(temp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    if os.fstat(f.fileno()).st_size != len(payload):
+                        raise Exception("写入验证失败：文件大小不一致")
+
+                # 第三层：多级备份（backup2 <- backup <- 主文件）
+                try:
+                    _rotate_prompt_todo_backups(backup_file, backup_file2)
+                except Exception as e:
+                    print(f"[WARNING] 备份创建失败: {e}")
 
-            # 第三层：原子写入（写临时文件 → 验证 → 替换）
-            try:
-                # 写入临时文件
-                dir_name = os.path.dirname(PROMPT_TODO_FILE)
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.json', dir=dir_name,
-                                                  delete=False, encoding='utf-8') as tf:
-                    temp_path = tf.name
-                    json.dump(todos, tf, ensure_ascii=False, indent=2)
-
-                # 验证临时文件可读
-                with open(temp_path, 'r', encoding='utf-8') as f:
-                    verify_data = json.load(f)
-                    if len(verify_data) != len(todos):
-                        raise Exception("写入验证失败：数据不一致")
-
-                # 验证通过，替换主文件
-                if os.path.exists(PROMPT_TODO_FILE):
-                    os.remove(PROMPT_TODO_FILE)
-                os.rename(temp_path, PROMPT_TODO_FILE)
+                # 原子替换主文件
+                os.replace(temp_path, PROMPT_TODO_FILE)
+                _publish_prompt_todos(todos)
+                events_log.publish('prompt_todos', PROMPT_TODO_EVENT_OPS.get(operation, 'replace'), item_id)
 
                 print(f"[SAVED] 成功保存 {len(todos)} 条数据 (操作: {operation})")
                 return True
@@ -1295,23 +1277,40 @@ def save_prompt_todos(todos, operation='unknown'):
             except Exception as e:
                 print(f"[ERROR] 保存失败: {e}")
                 # 清理临时文件
-                if 'temp_path' in locals() and os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
                 return False
-
-        finally:
-            _release_file_lock()
+    except file_lock.LockTimeout:
+        print("[ERROR] 无法获取文件锁，保存被阻止")
+        return False
 
 @app.route('/api/prompt-todos', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(PROMPT_TODO_FILE))
 def get_prompt_todos():
-    """Get all prompt todos"""
-    todos = read_prompt_todos()
-    if todos is None:
+    """
+    Get all prompt todos
+
+    With ?limit= (and ?cursor= from the previous page's next_cursor) returns one
+    page, newest first by (created_at, id), plus next_cursor and total.
+    """
+    snapshot = prompt_todo_snapshot()
+    if snapshot is None:
         return jsonify({'todos': [], 'error': 'Failed to read data file'}), 500
-    return jsonify({'todos': todos})
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return jsonify({'todos': snapshot.todos})
+    try:
+        limit, cursor = pagination.parse_page_args(request.args.get('limit'), request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'todos': [], 'error': str(e)}), 400
+    order = snapshot.order()
+    keys, next_key = order.page(limit, cursor)
+    return jsonify({
+        'todos': [snapshot.index[key[-1]] for key in keys],
+        'next_cursor': pagination.encode_cursor(next_key) if next_key else None,
+        'total': len(order),
+    })
 
 @app.route('/api/prompt-todos', methods=['POST'])
 def create_prompt_todo():
@@ -1329,8 +1328,8 @@ def create_prompt_todo():
         # 关键修复：如果读取失败，拒绝添加以防止数据丢失
         if todos is None:
             return jsonify({'success': False, 'error': '无法读取数据文件，请检查 prompt-todo.json 格式是否正确'}), 500
-        todos.append(todo)
-        if not save_prompt_todos(todos, operation='add'):
+        todos = todos + [todo]
+        if not save_prompt_todos(todos, operation='add', item_id=todo['id']):
             return jsonify({'success': False, 'error': '保存失败，请重试'}), 500
         return jsonify({'success': True, 'todo': todo})
     except Exception as e:
@@ -1341,19 +1340,22 @@ def update_prompt_todo(todo_id):
     """Update a prompt todo (content or status)"""
     try:
         data = request.get_json()
-        todos = read_prompt_todos()
-        if todos is None:
+        snapshot = prompt_todo_snapshot()
+        if snapshot is None:
             return jsonify({'success': False, 'error': '无法读取数据文件'}), 500
-        for i, t in enumerate(todos):
-            if t['id'] == todo_id:
-                if 'content' in data:
-                    todos[i]['content'] = sanitize_content(data['content'])
-                if 'status' in data:
-                    todos[i]['status'] = data['status']
-                if not save_prompt_todos(todos, operation='update'):
-                    return jsonify({'success': False, 'error': '保存失败'}), 500
-                return jsonify({'success': True, 'todo': todos[i]})
-        return jsonify({'success': False, 'error': 'Not found'}), 404
+        old = snapshot.index.get(todo_id)
+        if old is None:
+            return jsonify({'success': False, 'error': 'Not found'}), 404
+        # 快照是只读的：复制这一条记录，组成新版本
+        todo = dict(old)
+        if 'content' in data:
+            todo['content'] = sanitize_content(data['content'])
+        if 'status' in data:
+            todo['status'] = data['status']
+        todos = [todo if t is old else t for t in snapshot.todos]
+        if not save_prompt_todos(todos, operation='update', item_id=todo_id):
+            return jsonify({'success': False, 'error': '保存失败'}), 500
+        return jsonify({'success': True, 'todo': todo})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -1365,7 +1367,7 @@ def delete_prompt_todo(todo_id):
         if todos is None:
             return jsonify({'success': False, 'error': '无法读取数据文件'}), 500
         todos = [t for t in todos if t['id'] != todo_id]
-        if not save_prompt_todos(todos, operation='delete'):
+        if not save_prompt_todos(todos, operation='delete', item_id=todo_id):
             return jsonify({'success': False, 'error': '保存失败'}), 500
         return jsonify({'success': True})
     except Exception as e:
@@ -1378,22 +1380,18 @@ def complete_prompt_todo(todo_id):
         data = request.get_json() or {}
         tags = data.get('tags', [])
 
-        todos = read_prompt_todos()
-        if todos is None:
+        snapshot = prompt_todo_snapshot()
+        if snapshot is None:
             return jsonify({'success': False, 'error': '无法读取数据文件'}), 500
-        completed_todo = None
-
-        for t in todos:
-            if t['id'] == todo_id:
-                completed_todo = t
-                break
+        completed_todo = snapshot.index.get(todo_id)
+        todos = snapshot.todos
 
         if not completed_todo:
             return jsonify({'success': False, 'error': 'Not found'}), 404
 
         # Remove from todos
         todos = [t for t in todos if t['id'] != todo_id]
-        if not save_prompt_todos(todos, operation='delete'):
+        if not save_prompt_todos(todos, operation='delete', item_id=todo_id):
             return jsonify({'success': False, 'error': '保存失败'}), 500
 
         # Add to prompts
@@ -1404,9 +1402,7 @@ def complete_prompt_todo(todo_id):
             'tags': tags,
             'created_at': now
         }
-        prompts = read_prompts()
-        prompts.append(prompt)
-        save_prompts(prompts)
+        prompts_store.insert(prompt)
 
         return jsonify({'success': True, 'prompt': prompt})
     except Exception as e:
@@ -1416,73 +1412,22 @@ def complete_prompt_todo(todo_id):
 
 ACCEPTANCE_FILE = os.path.join(BASE_DIR, 'docs', 'PENDING_ACCEPTANCE.md')
 
-def parse_acceptance_items():
-    """Parse PENDING_ACCEPTANCE.md and extract acceptance items"""
-    items = []
-    try:
-        with open(ACCEPTANCE_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Split by ### acc- headers instead of --- (which conflicts with table separators)
-        # Use regex to split by ### acc-XXX: pattern
-        pattern = r'(### acc-\d+:[^\n]+)'
-        parts = re.split(pattern, content)
-
-        # Process pairs: header + content
-        i = 1  # Start from 1, skip content before first header
-        while i < len(parts) - 1:
-            header = parts[i]
-            body = parts[i + 1] if i + 1 < len(parts) else ''
-
-            # Parse header: ### acc-001: 待验收机制
-            match = re.match(r'### (acc-\d+):\s*(.+)', header.strip())
-            if match:
-                item = {
-                    'id': match.group(1),
-                    'title': match.group(2).strip(),
-                    'fields': {},
-                    'status': '⏳ 待验收'
-                }
-
-                # Parse table rows in body
-                for line in body.split('\n'):
-                    stripped_line = line.strip()
-                    if stripped_line.startswith('| **') and '|' in stripped_line[1:]:
-                        table_parts = stripped_line.split('|')
-                        if len(table_parts) >= 3:
-                            field_name = table_parts[1].strip().replace('**', '')
-                            field_value = table_parts[2].strip()
-                            item['fields'][field_name] = field_value
-
-                            if field_name == '状态':
-                                item['status'] = field_value
-
-                items.append(item)
+# Parsed once per file version; status updates splice the known byte range of the status cell
+acceptance_doc = acceptance.AcceptanceFile(ACCEPTANCE_FILE)
 
-            i += 2
-
-    except Exception as e:
-        print(f"Error parsing acceptance file: {e}")
+ACCEPTANCE_ACTIONS = {
+    'approve': '✅ 已验收',
+    'reject': '❌ 有问题'
+}
 
-    return items
+def parse_acceptance_items():
+    """Parse PENDING_ACCEPTANCE.md and extract acceptance items"""
+    return acceptance_doc.items()
 
 def update_acceptance_status(item_id, new_status):
     """Update the status of an acceptance item in the markdown file"""
     try:
-        with open(ACCEPTANCE_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Find the section for this item and update its status
-        # Pattern: ### acc-XXX: ... then find | **状态** | ... |
-        pattern = rf'(### {item_id}:.*?)\| \*\*状态\*\* \| [^|]+ \|'
-        replacement = rf'\1| **状态** | {new_status} |'
-
-        new_content = re.sub(pattern, replacement, content, flags=re.DOTALL)
-
-        with open(ACCEPTANCE_FILE, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-
-        return True
+        return acceptance_doc.set_status(item_id, new_status)
     except Exception as e:
         print(f"Error updating acceptance status: {e}")
         return False
@@ -1512,11 +1457,8 @@ def update_acceptance_item(item_id):
         action = data.get('action')  # 'approve' or 'reject'
         note = data.get('note', '')
 
-        if action == 'approve':
-            new_status = '✅ 已验收'
-        elif action == 'reject':
-            new_status = f'❌ 有问题'
-        else:
+        new_status = ACCEPTANCE_ACTIONS.get(action)
+        if new_status is None:
             return jsonify({'success': False, 'error': 'Invalid action'})
 
         if update_acceptance_status(item_id, new_status):
@@ -1527,13 +1469,29 @@ def update_acceptance_item(item_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/acceptance', methods=['PUT'])
+def update_acceptance_items():
+    """Update several acceptance items at once: {"ids": [...], "action": "approve" | "reject"}"""
+    try:
+        data = request.get_json()
+        new_status = ACCEPTANCE_ACTIONS.get(data.get('action'))
+        ids = data.get('ids')
+        if new_status is None:
+            return jsonify({'success': False, 'error': 'Invalid action'})
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'success': False, 'error': 'ids must be a non-empty list'})
+
+        missing = acceptance_doc.set_statuses({str(item_id): new_status for item_id in ids})
+        return jsonify({'success': not missing, 'new_status': new_status, 'missing': missing})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 # ============ Prompt Optimization API ============
 
 @app.route('/api/prompt/optimize', methods=['POST'])
 def optimize_prompt():
     """Use AI to optimize a prompt for better clarity and structure"""
-    import requests
-
     try:
         data = request.get_json()
         content = data.get('content', '').strip()
@@ -1582,27 +1540,9 @@ def optimize_prompt():
                     'error': '豆包模型未配置，请在 config/config.json 中配置 doubao_api_key 和 doubao_endpoint_id'
                 })
 
-            headers = {
-                'Authorization': f'Bearer {doubao_api_key}',
-                'Content-Type': 'application/json'
-            }
-
-            payload = {
-                'model': doubao_endpoint_id,
-                'messages': [
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_message}
-                ],
-                'max_tokens': 2000,
-                'temperature': 0.7
-            }
-
-            response = requests.post(
-                'https://ark.cn-beijing.volces.com/api/v3/chat/completions',
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            api_base = provider_client.DOUBAO_API_BASE
+            api_key = doubao_api_key
+            model = doubao_endpoint_id
 
         else:
             # DeepSeek 或 OpenAI（兼容 OpenAI API 格式）
@@ -1625,52 +1565,29 @@ def optimize_prompt():
                     'error': f'{selected_model} 模型未配置，请在 config/config.json 中配置 api_key 并设置 enabled: true'
                 })
 
-            headers = {
-                'Authorization': f'Bearer {model_config["api_key"]}',
-                'Content-Type': 'application/json'
-            }
-
-            payload = {
-                'model': model_config.get('model', 'deepseek-chat'),
-                'messages': [
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_message}
-                ],
-                'max_tokens': 2000,
-                'temperature': 0.7
-            }
-
-            api_base = model_config.get('api_base', 'https://api.deepseek.com/v1')
-            response = requests.post(
-                f'{api_base}/chat/completions',
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-
-        # 处理响应
-        if response.status_code == 200:
-            result = response.json()
-            optimized = result['choices'][0]['message']['content'].strip()
-            return jsonify({'success': True, 'optimized': optimized, 'model_used': selected_model})
-        else:
-            try:
-                error_msg = response.json().get('error', {}).get('message', f'HTTP {response.status_code}')
-            except:
-                error_msg = f'HTTP {response.status_code}'
-            return jsonify({'success': False, 'error': f'AI 服务调用失败: {error_msg}'})
-
-    except requests.exceptions.Timeout:
-        return jsonify({'success': False, 'error': 'AI 服务响应超时，请稍后重试'})
-    except requests.exceptions.RequestException as e:
+            api_base = model_config.get('api_base', provider_client.DEEPSEEK_API_BASE)
+            api_key = model_config['api_key']
+            model = model_config.get('model', 'deepseek-chat')
+
+        messages = [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_message}
+        ]
+        optimized, _ = provider_client.default_client().chat(
+            api_base, api_key, model, messages, timeout=30, max_tokens=2000, temperature=0.7)
+        return jsonify({'success': True, 'optimized': optimized.strip(), 'model_used': selected_model})
+
+    except provider_client.ProviderError as e:
+        if e.timeout:
+            return jsonify({'success': False, 'error': 'AI 服务响应超时，请稍后重试'})
+        if e.status is not None:
+            return jsonify({'success': False, 'error': f'AI 服务调用失败: {e}'})
         return jsonify({'success': False, 'error': f'网络请求失败: {str(e)}'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # ============ AI Chat API ============
 
-import requests
-
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Send message to AI model and get response"""
@@ -1697,31 +1614,8 @@ def chat():
             })
 
         # Call OpenAI-compatible API (both OpenAI and DeepSeek use this format)
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-
-        payload = {
-            'model': model_name,
-            'messages': messages,
-            'temperature': 0.7,
-            'max_tokens': 2000
-        }
-
-        response = requests.post(
-            f'{api_base}/chat/completions',
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-
-        if response.status_code != 200:
-            error_msg = response.json().get('error', {}).get('message', response.text)
-            return jsonify({'success': False, 'error': f'API错误: {error_msg}'})
-
-        result = response.json()
-        assistant_message = result['choices'][0]['message']['content']
+        assistant_message, _ = provider_client.default_client().chat(
+            api_base, api_key, model_name, messages, timeout=60, temperature=0.7, max_tokens=2000)
 
         return jsonify({
             'success': True,
@@ -1729,8 +1623,12 @@ def chat():
             'model': model_name
         })
 
-    except requests.exceptions.Timeout:
-        return jsonify({'success': False, 'error': 'API请求超时，请重试'})
+    except provider_client.ProviderError as e:
+        if e.timeout:
+            return jsonify({'success': False, 'error': 'API请求超时，请重试'})
+        if e.status is not None:
+            return jsonify({'success': False, 'error': f'API错误: {e.api_message or e.body}'})
+        return jsonify({'success': False, 'error': str(e)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -1860,92 +1758,216 @@ def import_data():
 
 # ============ Tags API ============
 
+def tags_version():
+    if request.args.get('store') == 'prompts':
+        return doc_store.version(PROMPTS_FILE)
+    return todo_store.version()
+
 @app.route('/api/tags', methods=['GET'])
+@etag.conditional(tags_version)
 def get_all_tags():
-    """Get all unique tags from todos (F401)"""
+    """
+    Get all unique tags from todos (F401)
+
+    ?prefix= filters for autocomplete (case-insensitive), ?with_counts=1 adds
+    usage counts, ?store=prompts lists prompt tags instead of todo tags.
+    """
     try:
-        todos = read_todos()
-        all_tags = set()
-        for item in todos.get('items', []):
-            for tag in item.get('tags', []):
-                all_tags.add(tag)
-        return jsonify({'tags': sorted(list(all_tags))})
+        prefix = request.args.get('prefix', '')
+        with_counts = request.args.get('with_counts') in ('1', 'true')
+        if request.args.get('store') == 'prompts':
+            with prompts_store.lock:
+                index = prompts_store.derived().tags
+                tags = index.tags(prefix)
+                counts = index.counts(tags) if with_counts else None
+        else:
+            tags = todo_store.all_tags(prefix)
+            counts = todo_store.tag_counts(tags) if with_counts else None
+        result = {'tags': tags}
+        if with_counts:
+            result['counts'] = counts
+        return jsonify(result)
     except Exception as e:
         return jsonify({'tags': [], 'error': str(e)})
 
+# ============ Search API ============
+
+SEARCH_SCOPES = {
+    # scope: (field searched, search function)
+    'todos': ('text', lambda terms, limit: todo_store.search(terms, limit)),
+    'prompts': ('content', lambda terms, limit: search_prompts(terms, limit)),
+    'prompt_todos': ('content', lambda terms, limit: search_prompt_todos(terms, limit)),
+}
+SEARCH_MAX_LIMIT = 100
+
+def search_prompts(terms, limit):
+    """Full-text search over prompts.json, returns [(score, prompt), ...]"""
+    with prompts_store.lock:
+        scores = prompts_store.derived().text.search(terms)
+        top = sorted(scores.items(), key=lambda pair: -pair[1])[:limit]
+        return [(score, prompts_store.get(prompt_id)) for prompt_id, score in top]
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """
+    BM25 full-text search over todos, prompts and prompt-todos
+
+    ?q= query (Chinese is matched by character bigrams), ?scope= comma-separated
+    subset of todos/prompts/prompt_todos (default all), ?limit= (default 20).
+    Each hit carries highlight offsets ([start, end) character indexes) into its field.
+    """
+    query = request.args.get('q', '').strip()
+    scopes = [scope for scope in request.args.get('scope', 'all').split(',') if scope]
+    if scopes == ['all']:
+        scopes = list(SEARCH_SCOPES)
+    unknown = [scope for scope in scopes if scope not in SEARCH_SCOPES]
+    if unknown:
+        return jsonify({'error': f'unknown scope: {", ".join(unknown)}'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), SEARCH_MAX_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    terms = search_index.query_terms(query)
+    if not terms:
+        return jsonify({'query': query, 'results': []})
+
+    try:
+        results = []
+        for scope in scopes:
+            field, search_scope = SEARCH_SCOPES[scope]
+            for score, item in search_scope(terms, limit):
+                if item is None:
+                    continue
+                results.append({
+                    'scope': scope,
+                    'id': item.get('id'),
+                    'score': round(score, 4),
+                    'field': field,
+                    'highlights': search_index.highlights(item.get(field) or '', terms),
+                    'item': item,
+                })
+        results.sort(key=lambda result: -result['score'])
+        return jsonify({'query': query, 'results': results[:limit]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============ Change Events (SSE) ============
+
+@app.route('/api/events')
+def change_events():
+    """
+    Server-Sent Events stream of committed changes
+
+    Each 'change' event carries {generation, store, op, id}; ?stores= limits it to
+    a comma-separated subset of todos/bubbles/prompts/prompt_todos/calendar.
+    A 'resync' event means some notifications were dropped (slow client, or the
+    Last-Event-ID is too old): refetch everything. Idle connections get a
+    heartbeat comment.
+    """
+    stores = [store for store in request.args.get('stores', '').split(',') if store]
+    last_id = request.headers.get('Last-Event-ID')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    try:
+        subscriber = events_log.subscribe(stores)
+    except events.TooManySubscribers:
+        # Each stream holds a worker thread; clients fall back to polling
+        return jsonify({'error': 'too many event streams'}), 503
+    response = app.response_class(events_log.stream(subscriber, last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: events_log.unsubscribe(subscriber))
+    return response
+
 # ============ Statistics API ============
 
+def todo_stats_version():
+    # completed_today 和默认时间范围都取决于今天的日期
+    return (todo_store.version(), datetime.now().date())
+
 @app.route('/api/stats', methods=['GET'])
+@etag.conditional(todo_stats_version)
 def get_stats():
     """Get task statistics"""
     try:
-        data = read_todos()
-        todos = data.get('items', [])
-        now = datetime.now()
-        today = now.date()
+        today = datetime.now().date()
 
         stats = {
-            'total': len(todos),
-            'completed': len([t for t in todos if t.get('completed')]),
-            'pending': len([t for t in todos if not t.get('completed')]),
-            'today': {
-                'total': len([t for t in todos if t.get('tab') == 'today']),
-                'completed': len([t for t in todos if t.get('tab') == 'today' and t.get('completed')]),
-                'pending': len([t for t in todos if t.get('tab') == 'today' and not t.get('completed')])
-            },
-            'week': {
-                'total': len([t for t in todos if t.get('tab') == 'week']),
-                'completed': len([t for t in todos if t.get('tab') == 'week' and t.get('completed')]),
-                'pending': len([t for t in todos if t.get('tab') == 'week' and not t.get('completed')])
-            },
-            'month': {
-                'total': len([t for t in todos if t.get('tab') == 'month']),
-                'completed': len([t for t in todos if t.get('tab') == 'month' and t.get('completed')]),
-                'pending': len([t for t in todos if t.get('tab') == 'month' and not t.get('completed')])
-            },
+            'total': 0,
+            'completed': 0,
+            'pending': 0,
+            'today': {'total': 0, 'completed': 0, 'pending': 0},
+            'week': {'total': 0, 'completed': 0, 'pending': 0},
+            'month': {'total': 0, 'completed': 0, 'pending': 0},
             'by_quadrant': {
-                'important-urgent': len([t for t in todos if t.get('quadrant') == 'important-urgent' and not t.get('completed')]),
-                'important-not-urgent': len([t for t in todos if t.get('quadrant') == 'important-not-urgent' and not t.get('completed')]),
-                'not-important-urgent': len([t for t in todos if t.get('quadrant') == 'not-important-urgent' and not t.get('completed')]),
-                'not-important-not-urgent': len([t for t in todos if t.get('quadrant') == 'not-important-not-urgent' and not t.get('completed')])
+                'important-urgent': 0,
+                'important-not-urgent': 0,
+                'not-important-urgent': 0,
+                'not-important-not-urgent': 0
             },
-            'completed_today': 0
+            'completed_today': todo_store.count_completed_on(today)
         }
 
-        # Count completed today
-        for t in todos:
-            if t.get('completed') and t.get('completed_at'):
-                try:
-                    completed_date = datetime.fromisoformat(t['completed_at']).date()
-                    if completed_date == today:
-                        stats['completed_today'] += 1
-                except:
-                    pass
+        # Fold the grouped (tab, quadrant, completed) counts into the response shape
+        for (tab, quadrant, completed), count in todo_store.status_counts().items():
+            status = 'completed' if completed else 'pending'
+            stats['total'] += count
+            stats[status] += count
+            if tab in ('today', 'week', 'month'):
+                stats[tab]['total'] += count
+                stats[tab][status] += count
+            if not completed and quadrant in stats['by_quadrant']:
+                stats['by_quadrant'][quadrant] += count
 
         return jsonify(stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+TIMESERIES_MAX_BUCKETS = 1000
+
+@app.route('/api/stats/timeseries', methods=['GET'])
+@etag.conditional(todo_stats_version)
+def get_stats_timeseries():
+    """Created/completed counts per day or week, plus streaks and velocity"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in todo_stats.BUCKETS:
+        return jsonify({'error': f'bucket must be one of {", ".join(todo_stats.BUCKETS)}'}), 400
+    try:
+        today = datetime.now().date()
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else today
+        default_span = timedelta(days=29) if bucket == 'day' else timedelta(weeks=11)
+        start = (datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+                 if request.args.get('from') else end - default_span)
+    except ValueError:
+        return jsonify({'error': 'from/to must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (end - start).days // (7 if bucket == 'week' else 1) >= TIMESERIES_MAX_BUCKETS:
+        return jsonify({'error': f'range too large (max {TIMESERIES_MAX_BUCKETS} buckets)'}), 400
+
+    try:
+        return jsonify(todo_store.timeseries(start, end, bucket, today))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============ Project Stats API ============
 
-import subprocess
+# Line counts and git metrics are computed in a background thread; the endpoint
+# returns the latest snapshot (only changed files are recounted, git only reruns
+# when HEAD or the refs change)
+repo_stats_service = repo_stats.RepoStats(BASE_DIR)
 
 @app.route('/api/project/stats')
 def project_stats():
     """Get project statistics"""
     try:
+        snapshot = repo_stats_service.snapshot()
         stats = {
-            'code': {
-                'python': 0,
-                'html': 0,
-                'css': 0,
-                'javascript': 0,
-                'total': 0
-            },
-            'git': {
-                'commits': 0,
-                'authors': []
-            },
+            'code': snapshot['code'],
+            'git': snapshot['git'],
             'features': {
                 'core': [
                     'Todo Management (Four Quadrant)',
@@ -1972,58 +1994,8 @@ def project_stats():
                 ]
             },
             'version': '2.0',
-            'last_updated': datetime.now().isoformat()
+            'last_updated': snapshot['updated_at']
         }
-
-        # Count lines of code
-        try:
-            for ext, key in [('.py', 'python'), ('.html', 'html'), ('.css', 'css'), ('.js', 'javascript')]:
-                count = 0
-                for root, dirs, files in os.walk(BASE_DIR):
-                    # Skip virtual environments and cache
-                    dirs[:] = [d for d in dirs if d not in ['venv', 'env', '__pycache__', 'node_modules', '.git']]
-                    for f in files:
-                        if f.endswith(ext):
-                            try:
-                                with open(os.path.join(root, f), 'r', encoding='utf-8', errors='ignore') as file:
-                                    count += sum(1 for _ in file)
-                            except:
-                                pass
-                stats['code'][key] = count
-            stats['code']['total'] = sum([
-                stats['code']['python'],
-                stats['code']['html'],
-                stats['code']['css'],
-                stats['code']['javascript']
-            ])
-        except Exception as e:
-            print(f"Code counting error: {e}")
-
-        # Get git stats
-        try:
-            result = subprocess.run(
-                ['git', 'rev-list', '--count', 'HEAD'],
-                capture_output=True, text=True, cwd=BASE_DIR
-            )
-            if result.returncode == 0:
-                stats['git']['commits'] = int(result.stdout.strip())
-
-            result = subprocess.run(
-                ['git', 'shortlog', '-sn', '--all'],
-                capture_output=True, text=True, cwd=BASE_DIR
-            )
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        parts = line.strip().split('\t')
-                        if len(parts) == 2:
-                            stats['git']['authors'].append({
-                                'name': parts[1],
-                                'commits': int(parts[0].strip())
-                            })
-        except Exception as e:
-            print(f"Git stats error: {e}")
-
         return jsonify(stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2048,6 +2020,13 @@ BACKUP_FILES = {
     'motivation.txt': MOTIVATION_FILE,
     'todolist.txt': TODOLIST_FILE
 }
+# Restored files that clients subscribed to /api/events must refetch
+BACKUP_EVENT_STORES = {
+    'todos.json': 'todos',
+    'prompts.json': 'prompts',
+    'prompt-todo.json': 'prompt_todos',
+    'bubbles.json': 'bubbles',
+}
 
 @app.route('/api/backup/create', methods=['POST'])
 def create_backup():
@@ -2062,7 +2041,8 @@ def create_backup():
         backup_path = os.path.join(BACKUP_DIR, backup_name)
         os.makedirs(backup_path, exist_ok=True)
 
-        # Copy all data files
+        # Copy all data files (fold any pending todo journal into todos.json first)
+        todo_store.checkpoint()
         backed_up = []
         for filename, filepath in BACKUP_FILES.items():
             if os.path.exists(filepath):
@@ -2135,6 +2115,7 @@ def restore_backup(backup_name):
         os.makedirs(auto_backup_path, exist_ok=True)
 
         # Backup current files
+        todo_store.checkpoint()
         for filename, filepath in BACKUP_FILES.items():
             if os.path.exists(filepath):
                 shutil.copy2(filepath, os.path.join(auto_backup_path, filename))
@@ -2155,6 +2136,11 @@ def restore_backup(backup_name):
             if os.path.exists(backup_file):
                 shutil.copy2(backup_file, filepath)
                 restored.append(filename)
+        if 'todos.json' in restored:
+            todo_store.reload()
+        for filename in restored:
+            if filename in BACKUP_EVENT_STORES:
+                events_log.publish(BACKUP_EVENT_STORES[filename], 'replace')
 
         return jsonify({
             'success': True,
@@ -2330,21 +2316,16 @@ def generate_expense_summary(expense):
 
     return summary
 
+expenses_store = doc_store.Collection(EXPENSES_FILE)
+
 def read_expenses():
-    """Read all expenses from expenses.json"""
-    if not os.path.exists(EXPENSES_FILE):
-        return []
-    try:
-        with open(EXPENSES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+    """Read all expenses from expenses.json (cached until the file changes)"""
+    return expenses_store.items()
 
-def save_expenses(expenses):
-    """Save all expenses to expenses.json"""
+def save_expenses(expenses=None):
+    """Save expenses to expenses.json (None saves records edited in place)"""
     os.makedirs(os.path.dirname(EXPENSES_FILE), exist_ok=True)
-    with open(EXPENSES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(expenses, f, ensure_ascii=False, indent=2)
+    expenses_store.save(expenses)
 
 def get_expense_folder_name(expense):
     """Generate folder name for expense: 报销事件_地点_起止时间_报销凭证"""
@@ -2355,11 +2336,12 @@ def get_expense_folder_name(expense):
     return f"{event}_{location}_{start}-{end}_报销凭证"
 
 @app.route('/api/expenses', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(EXPENSES_FILE))
 def get_expenses():
     """Get all expense items with categories and templates"""
     expenses = read_expenses()
     # Sort by created_at descending
-    expenses.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    expenses = sorted(expenses, key=lambda x: x.get('created_at', ''), reverse=True)
     return jsonify({
         'expenses': expenses,
         'common_locations': COMMON_LOCATIONS,
@@ -2401,21 +2383,20 @@ def create_expense():
         expense['folder_path'] = folder_path
         expense['folder_name'] = folder_name
 
-        expenses = read_expenses()
-        expenses.append(expense)
-        save_expenses(expenses)
+        os.makedirs(os.path.dirname(EXPENSES_FILE), exist_ok=True)
+        expenses_store.insert(expense)
 
         return jsonify({'success': True, 'expense': expense})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/expenses/<expense_id>', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(EXPENSES_FILE))
 def get_expense(expense_id):
     """Get a specific expense by ID"""
-    expenses = read_expenses()
-    for exp in expenses:
-        if exp['id'] == expense_id:
-            return jsonify({'success': True, 'expense': exp})
+    exp = expenses_store.get(expense_id)
+    if exp:
+        return jsonify({'success': True, 'expense': exp})
     return jsonify({'success': False, 'error': 'Not found'}), 404
 
 @app.route('/api/expenses/<expense_id>', methods=['PUT'])
@@ -2423,56 +2404,55 @@ def update_expense(expense_id):
     """Update an expense item"""
     try:
         data = request.get_json()
-        expenses = read_expenses()
-
-        for i, exp in enumerate(expenses):
-            if exp['id'] == expense_id:
-                # Update fields
-                if 'event' in data:
-                    expenses[i]['event'] = data['event']
-                if 'location' in data:
-                    expenses[i]['location'] = data['location']
-                if 'start_date' in data:
-                    expenses[i]['start_date'] = data['start_date']
-                if 'end_date' in data:
-                    expenses[i]['end_date'] = data['end_date']
-                if 'notes' in data:
-                    expenses[i]['notes'] = data['notes']
-                # 新增字段支持
-                if 'category' in data:
-                    expenses[i]['category'] = data['category']
-                if 'sub_categories' in data:
-                    expenses[i]['sub_categories'] = data['sub_categories']
-                if 'template_used' in data:
-                    expenses[i]['template_used'] = data['template_used']
-
-                expenses[i]['updated_at'] = datetime.now().isoformat()
-
-                # Update folder name if needed
-                new_folder_name = get_expense_folder_name(expenses[i])
-                if expenses[i].get('folder_name') != new_folder_name:
-                    old_path = expenses[i].get('folder_path', '')
-                    new_path = os.path.join(EXPENSES_DIR, expense_id + '_' + new_folder_name)
-                    if old_path and os.path.exists(old_path):
-                        os.rename(old_path, new_path)
-                    expenses[i]['folder_path'] = new_path
-                    expenses[i]['folder_name'] = new_folder_name
-
-                save_expenses(expenses)
-                return jsonify({'success': True, 'expense': expenses[i]})
 
-        return jsonify({'success': False, 'error': 'Not found'}), 404
+        with expenses_store.lock:
+            exp = expenses_store.get(expense_id)
+            if exp is None:
+                return jsonify({'success': False, 'error': 'Not found'}), 404
+
+            # Update fields
+            if 'event' in data:
+                exp['event'] = data['event']
+            if 'location' in data:
+                exp['location'] = data['location']
+            if 'start_date' in data:
+                exp['start_date'] = data['start_date']
+            if 'end_date' in data:
+                exp['end_date'] = data['end_date']
+            if 'notes' in data:
+                exp['notes'] = data['notes']
+            # 新增字段支持
+            if 'category' in data:
+                exp['category'] = data['category']
+            if 'sub_categories' in data:
+                exp['sub_categories'] = data['sub_categories']
+            if 'template_used' in data:
+                exp['template_used'] = data['template_used']
+
+            exp['updated_at'] = datetime.now().isoformat()
+
+            # Update folder name if needed
+            new_folder_name = get_expense_folder_name(exp)
+            if exp.get('folder_name') != new_folder_name:
+                old_path = exp.get('folder_path', '')
+                new_path = os.path.join(EXPENSES_DIR, expense_id + '_' + new_folder_name)
+                if old_path and os.path.exists(old_path):
+                    os.rename(old_path, new_path)
+                exp['folder_path'] = new_path
+                exp['folder_name'] = new_folder_name
+
+            save_expenses()
+        return jsonify({'success': True, 'expense': exp})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/expenses/<expense_id>/summary', methods=['GET'])
 def get_expense_summary(expense_id):
     """生成报销说明文本"""
-    expenses = read_expenses()
-    for exp in expenses:
-        if exp['id'] == expense_id:
-            summary = generate_expense_summary(exp)
-            return jsonify({'success': True, 'summary': summary})
+    exp = expenses_store.get(expense_id)
+    if exp:
+        summary = generate_expense_summary(exp)
+        return jsonify({'success': True, 'summary': summary})
     return jsonify({'success': False, 'error': 'Not found'}), 404
 
 @app.route('/api/expenses/guess-category', methods=['POST'])
@@ -2488,13 +2468,7 @@ def guess_category():
 def delete_expense(expense_id):
     """Delete an expense item and its files"""
     try:
-        expenses = read_expenses()
-        expense_to_delete = None
-
-        for exp in expenses:
-            if exp['id'] == expense_id:
-                expense_to_delete = exp
-                break
+        expense_to_delete = expenses_store.get(expense_id)
 
         if not expense_to_delete:
             return jsonify({'success': False, 'error': 'Not found'}), 404
@@ -2505,8 +2479,7 @@ def delete_expense(expense_id):
             shutil.rmtree(folder_path)
 
         # Remove from list
-        expenses = [e for e in expenses if e['id'] != expense_id]
-        save_expenses(expenses)
+        expenses_store.remove(expense_id)
 
         return jsonify({'success': True})
     except Exception as e:
@@ -2523,15 +2496,7 @@ def upload_expense_file(expense_id):
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'}), 400
 
-        expenses = read_expenses()
-        expense = None
-        expense_idx = -1
-
-        for i, exp in enumerate(expenses):
-            if exp['id'] == expense_id:
-                expense = exp
-                expense_idx = i
-                break
+        expense = expenses_store.get(expense_id)
 
         if not expense:
             return jsonify({'success': False, 'error': 'Expense not found'}), 404
@@ -2542,8 +2507,8 @@ def upload_expense_file(expense_id):
             folder_name = get_expense_folder_name(expense)
             folder_path = os.path.join(EXPENSES_DIR, expense_id + '_' + folder_name)
             os.makedirs(folder_path, exist_ok=True)
-            expenses[expense_idx]['folder_path'] = folder_path
-            expenses[expense_idx]['folder_name'] = folder_name
+            expense['folder_path'] = folder_path
+            expense['folder_name'] = folder_name
 
         # Save file
         filename = file.filename
@@ -2568,12 +2533,12 @@ def upload_expense_file(expense_id):
         file_info = analyze_expense_file(file_path, safe_filename)
 
         # Add to expense files list
-        if 'files' not in expenses[expense_idx]:
-            expenses[expense_idx]['files'] = []
-        expenses[expense_idx]['files'].append(file_info)
-        expenses[expense_idx]['updated_at'] = datetime.now().isoformat()
-
-        save_expenses(expenses)
+        with expenses_store.lock:
+            if 'files' not in expense:
+                expense['files'] = []
+            expense['files'].append(file_info)
+            expense['updated_at'] = datetime.now().isoformat()
+            save_expenses()
 
         return jsonify({'success': True, 'file': file_info})
     except Exception as e:
@@ -2626,34 +2591,33 @@ def format_file_size(size):
 def delete_expense_file(expense_id, file_id):
     """Delete a file from an expense item"""
     try:
-        expenses = read_expenses()
-
-        for i, exp in enumerate(expenses):
-            if exp['id'] == expense_id:
-                files = exp.get('files', [])
-                file_to_delete = None
+        with expenses_store.lock:
+            exp = expenses_store.get(expense_id)
+            if exp is None:
+                return jsonify({'success': False, 'error': 'Expense not found'}), 404
 
-                for f in files:
-                    if f['id'] == file_id:
-                        file_to_delete = f
-                        break
+            files = exp.get('files', [])
+            file_to_delete = None
 
-                if not file_to_delete:
-                    return jsonify({'success': False, 'error': 'File not found'}), 404
+            for f in files:
+                if f['id'] == file_id:
+                    file_to_delete = f
+                    break
 
-                # Delete physical file
-                file_path = file_to_delete.get('path', '')
-                if file_path and os.path.exists(file_path):
-                    os.remove(file_path)
+            if not file_to_delete:
+                return jsonify({'success': False, 'error': 'File not found'}), 404
 
-                # Remove from list
-                expenses[i]['files'] = [f for f in files if f['id'] != file_id]
-                expenses[i]['updated_at'] = datetime.now().isoformat()
-                save_expenses(expenses)
+            # Delete physical file
+            file_path = file_to_delete.get('path', '')
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
 
-                return jsonify({'success': True})
+            # Remove from list
+            exp['files'] = [f for f in files if f['id'] != file_id]
+            exp['updated_at'] = datetime.now().isoformat()
+            save_expenses()
 
-        return jsonify({'success': False, 'error': 'Expense not found'}), 404
+        return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -2682,45 +2646,35 @@ def get_expense_locations():
 @app.route('/api/expenses/<expense_id>/file/<file_id>/view')
 def view_expense_file(expense_id, file_id):
     """Serve an expense file for viewing"""
-    expenses = read_expenses()
+    exp = expenses_store.get(expense_id)
 
-    for exp in expenses:
-        if exp['id'] == expense_id:
-            for f in exp.get('files', []):
-                if f['id'] == file_id:
-                    file_path = f.get('path', '')
-                    if file_path and os.path.exists(file_path):
-                        return send_from_directory(
-                            os.path.dirname(file_path),
-                            os.path.basename(file_path)
-                        )
+    if exp:
+        for f in exp.get('files', []):
+            if f['id'] == file_id:
+                file_path = f.get('path', '')
+                if file_path and os.path.exists(file_path):
+                    return send_from_directory(
+                        os.path.dirname(file_path),
+                        os.path.basename(file_path)
+                    )
 
     return jsonify({'success': False, 'error': 'File not found'}), 404
 
 # ============ PPT Generator API ============
 
+ppts_store = doc_store.Collection(PPT_FILE)
+
 def read_ppts():
-    """Read all PPT data from ppt.json"""
-    if not os.path.exists(PPT_FILE):
-        return []
-    try:
-        with open(PPT_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+    """Read all PPT data from ppt.json (cached until the file changes)"""
+    return ppts_store.items()
 
 def save_ppts(ppts):
     """Save PPT data to ppt.json"""
-    with open(PPT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(ppts, f, ensure_ascii=False, indent=2)
+    ppts_store.save(ppts)
 
 def find_ppt(ppt_id):
-    """Find a PPT by ID"""
-    ppts = read_ppts()
-    for p in ppts:
-        if p['id'] == ppt_id:
-            return p
-    return None
+    """Find a PPT by ID (hash index lookup)"""
+    return ppts_store.get(ppt_id)
 
 @app.route('/api/ppt', methods=['GET'])
 def get_ppts():
@@ -2763,9 +2717,7 @@ def create_ppt():
             'created_at': now,
             'updated_at': now
         }
-        ppts = read_ppts()
-        ppts.append(ppt)
-        save_ppts(ppts)
+        ppts_store.insert(ppt)
         return jsonify({'success': True, 'ppt': ppt})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -2775,19 +2727,19 @@ def update_ppt(ppt_id):
     """Update an existing PPT"""
     try:
         data = request.get_json()
-        ppts = read_ppts()
-        for i, p in enumerate(ppts):
-            if p['id'] == ppt_id:
-                ppts[i]['title'] = data.get('title', p['title'])
-                ppts[i]['template'] = data.get('template', p.get('template', 'dark-statement'))
-                ppts[i]['main_title'] = data.get('main_title', p.get('main_title', ''))
-                ppts[i]['subtitle'] = data.get('subtitle', p.get('subtitle', ''))
-                ppts[i]['content_blocks'] = data.get('content_blocks', p.get('content_blocks', []))
-                ppts[i]['footer'] = data.get('footer', p.get('footer', ''))
-                ppts[i]['updated_at'] = datetime.now().isoformat()
-                save_ppts(ppts)
-                return jsonify({'success': True, 'ppt': ppts[i]})
-        return jsonify({'success': False, 'error': 'Not found'}), 404
+        with ppts_store.lock:
+            p = ppts_store.get(ppt_id)
+            if p is None:
+                return jsonify({'success': False, 'error': 'Not found'}), 404
+            p['title'] = data.get('title', p['title'])
+            p['template'] = data.get('template', p.get('template', 'dark-statement'))
+            p['main_title'] = data.get('main_title', p.get('main_title', ''))
+            p['subtitle'] = data.get('subtitle', p.get('subtitle', ''))
+            p['content_blocks'] = data.get('content_blocks', p.get('content_blocks', []))
+            p['footer'] = data.get('footer', p.get('footer', ''))
+            p['updated_at'] = datetime.now().isoformat()
+            ppts_store.save()
+        return jsonify({'success': True, 'ppt': p})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -2795,9 +2747,7 @@ def update_ppt(ppt_id):
 def delete_ppt(ppt_id):
     """Delete a PPT"""
     try:
-        ppts = read_ppts()
-        ppts = [p for p in ppts if p['id'] != ppt_id]
-        save_ppts(ppts)
+        ppts_store.remove(ppt_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -3039,9 +2989,6 @@ def convert_pdf_to_images(pdf_path, output_dir):
 @app.route('/api/ppt-translator/test-api', methods=['POST'])
 def ppt_translator_test_api():
     """测试 API Key 是否有效"""
-    import urllib.request
-    import urllib.error
-
     data = request.get_json()
     provider = data.get('provider', 'deepseek')
     api_key = data.get('api_key', '')
@@ -3051,48 +2998,31 @@ def ppt_translator_test_api():
 
     try:
         if provider == 'deepseek':
-            api_url = 'https://api.deepseek.com/v1/chat/completions'
+            api_base = provider_client.DEEPSEEK_API_BASE
             model = 'deepseek-chat'
         else:
-            api_url = 'https://api.openai.com/v1/chat/completions'
+            api_base = provider_client.OPENAI_API_BASE
             model = 'gpt-4o-mini'
 
         # 发送一个简单的测试请求
-        request_data = json.dumps({
-            "model": model,
-            "messages": [{"role": "user", "content": "Hi"}],
-            "max_tokens": 5
-        }).encode('utf-8')
-
-        req = urllib.request.Request(
-            api_url,
-            data=request_data,
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {api_key}'
-            }
-        )
-
-        with urllib.request.urlopen(req, timeout=15) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            # 如果能成功获取响应，说明 API Key 有效
-            if result.get('choices'):
-                return jsonify({'success': True})
-            else:
-                return jsonify({'success': False, 'error': '响应异常'})
+        _, result = provider_client.default_client().chat(
+            api_base, api_key, model, [{"role": "user", "content": "Hi"}], timeout=15, max_tokens=5)
+        # 如果能成功获取响应，说明 API Key 有效
+        if result.get('choices'):
+            return jsonify({'success': True})
+        else:
+            return jsonify({'success': False, 'error': '响应异常'})
 
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8') if e.fp else ''
-        if e.code == 401:
+    except provider_client.ProviderError as e:
+        if e.status == 401:
             return jsonify({'success': False, 'error': 'API Key 无效或已过期'})
-        elif e.code == 403:
+        elif e.status == 403:
             return jsonify({'success': False, 'error': '访问被拒绝，请检查 API Key 权限'})
-        elif e.code == 429:
+        elif e.status == 429:
             return jsonify({'success': False, 'error': '请求过于频繁，请稍后再试'})
-        else:
-            return jsonify({'success': False, 'error': f'HTTP 错误 {e.code}'})
-    except urllib.error.URLError as e:
-        return jsonify({'success': False, 'error': f'网络错误: {str(e.reason)}'})
+        elif e.status is not None:
+            return jsonify({'success': False, 'error': f'HTTP 错误 {e.status}'})
+        return jsonify({'success': False, 'error': f'网络错误: {str(e)}'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -3125,13 +3055,8 @@ def ppt_translator_settings():
 
 def ocr_with_ocrspace(image_base64):
     """使用免费的 OCR.space API 识别图片文字"""
-    import urllib.request
-    import urllib.parse
-
     # OCR.space 免费 API
     # 免费额度: 25000次/月
-    api_url = 'https://api.ocr.space/parse/image'
-
     # 移除 data:image/png;base64, 前缀
     if ',' in image_base64:
         image_base64 = image_base64.split(',')[1]
@@ -3147,32 +3072,24 @@ def ocr_with_ocrspace(image_base64):
         'OCREngine': '2'  # Engine 2 更适合中文
     }
 
-    data = urllib.parse.urlencode(payload).encode('utf-8')
-
-    req = urllib.request.Request(api_url, data=data)
-    req.add_header('Content-Type', 'application/x-www-form-urlencoded')
-
-    with urllib.request.urlopen(req, timeout=30) as response:
-        result = json.loads(response.read().decode('utf-8'))
+    result = provider_client.default_client().post_form(provider_client.OCRSPACE_URL, payload, timeout=30)
 
-        if result.get('IsErroredOnProcessing'):
-            error_msg = result.get('ErrorMessage', ['OCR识别失败'])[0]
-            return None, error_msg
+    if result.get('IsErroredOnProcessing'):
+        error_msg = result.get('ErrorMessage', ['OCR识别失败'])[0]
+        return None, error_msg
 
-        parsed_results = result.get('ParsedResults', [])
-        if not parsed_results:
-            return None, '未识别到文字'
+    parsed_results = result.get('ParsedResults', [])
+    if not parsed_results:
+        return None, '未识别到文字'
 
-        text = parsed_results[0].get('ParsedText', '').strip()
-        if not text:
-            return None, '未识别到文字'
+    text = parsed_results[0].get('ParsedText', '').strip()
+    if not text:
+        return None, '未识别到文字'
 
-        return text, None
+    return text, None
 
 def translate_with_deepseek(text, target_lang, api_key):
     """使用 DeepSeek 翻译文字"""
-    import urllib.request
-
     lang_names = {'zh': '中文', 'en': 'English', 'ja': '日本語', 'ko': '한국어'}
     target_lang_name = lang_names.get(target_lang, '中文')
 
@@ -3180,29 +3097,13 @@ def translate_with_deepseek(text, target_lang, api_key):
 
 {text}"""
 
-    request_data = json.dumps({
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1000
-    }).encode('utf-8')
-
-    req = urllib.request.Request(
-        'https://api.deepseek.com/v1/chat/completions',
-        data=request_data,
-        headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_key}'
-        }
-    )
-
-    with urllib.request.urlopen(req, timeout=30) as response:
-        result = json.loads(response.read().decode('utf-8'))
-        return result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
+    text, _ = provider_client.default_client().chat(
+        provider_client.DEEPSEEK_API_BASE, api_key, "deepseek-chat",
+        [{"role": "user", "content": prompt}], timeout=30, max_tokens=1000)
+    return text.strip()
 
 def translate_with_doubao(text, target_lang, api_key, endpoint_id):
     """使用豆包(火山引擎)翻译文字"""
-    import urllib.request
-
     lang_names = {'zh': '中文', 'en': 'English', 'ja': '日本語', 'ko': '한국어'}
     target_lang_name = lang_names.get(target_lang, '中文')
 
@@ -3211,74 +3112,35 @@ def translate_with_doubao(text, target_lang, api_key, endpoint_id):
 {text}"""
 
     # 火山引擎豆包 API
-    api_url = 'https://ark.cn-beijing.volces.com/api/v3/chat/completions'
-
-    request_data = json.dumps({
-        "model": endpoint_id,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1000
-    }).encode('utf-8')
-
-    req = urllib.request.Request(
-        api_url,
-        data=request_data,
-        headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_key}'
-        }
-    )
-
-    with urllib.request.urlopen(req, timeout=30) as response:
-        result = json.loads(response.read().decode('utf-8'))
-        return result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
+    text, _ = provider_client.default_client().chat(
+        provider_client.DOUBAO_API_BASE, api_key, endpoint_id,
+        [{"role": "user", "content": prompt}], timeout=30, max_tokens=1000)
+    return text.strip()
 
 def ocr_with_doubao_vision(image_base64, api_key, endpoint_id):
     """使用豆包多模态模型识别图片文字"""
-    import urllib.request
-
-    api_url = 'https://ark.cn-beijing.volces.com/api/v3/chat/completions'
-
     # 确保 base64 格式正确
     if not image_base64.startswith('data:'):
         image_base64 = f'data:image/png;base64,{image_base64}'
 
-    request_data = json.dumps({
-        "model": endpoint_id,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "请识别这张图片中的所有文字，只返回识别出的文字内容，不要添加任何解释或格式。"},
-                    {"type": "image_url", "image_url": {"url": image_base64}}
-                ]
-            }
-        ],
-        "max_tokens": 1000
-    }).encode('utf-8')
-
-    req = urllib.request.Request(
-        api_url,
-        data=request_data,
-        headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_key}'
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "请识别这张图片中的所有文字，只返回识别出的文字内容，不要添加任何解释或格式。"},
+                {"type": "image_url", "image_url": {"url": image_base64}}
+            ]
         }
-    )
-
-    with urllib.request.urlopen(req, timeout=30) as response:
-        result = json.loads(response.read().decode('utf-8'))
-        text = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
-        return text, None
+    ]
+    text, _ = provider_client.default_client().chat(
+        provider_client.DOUBAO_API_BASE, api_key, endpoint_id, messages, timeout=30, max_tokens=1000)
+    return text.strip(), None
 
 def ocr_translate_with_doubao_vision(image_base64, target_lang, api_key, endpoint_id):
     """使用豆包多模态模型一步完成 OCR + 翻译"""
-    import urllib.request
-
     lang_names = {'zh': '中文', 'en': 'English', 'ja': '日本語', 'ko': '한국어'}
     target_lang_name = lang_names.get(target_lang, '中文')
 
-    api_url = 'https://ark.cn-beijing.volces.com/api/v3/chat/completions'
-
     if not image_base64.startswith('data:'):
         image_base64 = f'data:image/png;base64,{image_base64}'
 
@@ -3293,45 +3155,31 @@ def ocr_translate_with_doubao_vision(image_base64, target_lang, api_key, endpoin
 【译文】
 (翻译后的文字)"""
 
-    request_data = json.dumps({
-        "model": endpoint_id,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": image_base64}}
-                ]
-            }
-        ],
-        "max_tokens": 2000
-    }).encode('utf-8')
-
-    req = urllib.request.Request(
-        api_url,
-        data=request_data,
-        headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_key}'
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_base64}}
+            ]
         }
-    )
-
-    with urllib.request.urlopen(req, timeout=60) as response:
-        result = json.loads(response.read().decode('utf-8'))
-        content = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
-
-        # 解析原文和译文
-        original = ''
-        translation = ''
-
-        if '【原文】' in content and '【译文】' in content:
-            parts = content.split('【译文】')
-            original = parts[0].replace('【原文】', '').strip()
-            translation = parts[1].strip() if len(parts) > 1 else ''
-        else:
-            translation = content
+    ]
+    content, _ = provider_client.default_client().chat(
+        provider_client.DOUBAO_API_BASE, api_key, endpoint_id, messages, timeout=60, max_tokens=2000)
+    content = content.strip()
+
+    # 解析原文和译文
+    original = ''
+    translation = ''
+
+    if '【原文】' in content and '【译文】' in content:
+        parts = content.split('【译文】')
+        original = parts[0].replace('【原文】', '').strip()
+        translation = parts[1].strip() if len(parts) > 1 else ''
+    else:
+        translation = content
 
-        return original, translation
+    return original, translation
 
 @app.route('/api/ppt-translator/ocr', methods=['POST'])
 def ppt_translator_ocr_only():
@@ -3724,23 +3572,19 @@ def save_harmonyos_lab_config():
 
 CALENDAR_FILE = os.path.join(DATA_DIR, 'calendar.json')
 
+calendar_store = doc_store.Collection(CALENDAR_FILE, list_key='events',
+                                      on_change=events_log.publisher('calendar'))
+
 def read_calendar_events():
-    """读取日程数据"""
-    if not os.path.exists(CALENDAR_FILE):
-        return []
-    try:
-        with open(CALENDAR_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('events', [])
-    except:
-        return []
+    """读取日程数据（文件未变化时使用缓存）"""
+    return calendar_store.items()
 
 def save_calendar_events(events):
     """保存日程数据"""
-    with open(CALENDAR_FILE, 'w', encoding='utf-8') as f:
-        json.dump({'events': events}, f, ensure_ascii=False, indent=2)
+    calendar_store.save(events)
 
 @app.route('/api/calendar/events', methods=['GET'])
+@etag.conditional(lambda: doc_store.version(CALENDAR_FILE))
 def get_calendar_events():
     """获取所有日程"""
     events = read_calendar_events()
@@ -3751,7 +3595,6 @@ def create_calendar_event():
     """创建日程"""
     try:
         data = request.get_json()
-        events = read_calendar_events()
 
         new_event = {
             'id': str(uuid.uuid4())[:8],
@@ -3764,8 +3607,7 @@ def create_calendar_event():
             'created_at': datetime.now().isoformat()
         }
 
-        events.append(new_event)
-        save_calendar_events(events)
+        calendar_store.insert(new_event)
 
         return jsonify({'success': True, 'event': new_event})
     except Exception as e:
@@ -3774,9 +3616,7 @@ def create_calendar_event():
 @app.route('/api/calendar/events/<event_id>', methods=['DELETE'])
 def delete_calendar_event(event_id):
     """删除日程"""
-    events = read_calendar_events()
-    events = [e for e in events if e['id'] != event_id]
-    save_calendar_events(events)
+    calendar_store.remove(event_id)
     return jsonify({'success': True})
 
 @app.route('/api/calendar/outlook/sync', methods=['POST'])
@@ -0,0 +1,166 @@
+# 静态资源流水线：启动时给 assets/ 下的文件加内容指纹
+#
+# css/style.css → css/style.<sha256 前 10 位>.css，连同 .gz / .br 预压缩版本写进构建目录。
+# 文件按内容命名，已经存在就跳过，多个 worker 同时启动也只是写入相同的字节。
+# CSS 里 url() 引用的本地文件先换成带指纹的名字再计算 CSS 自己的指纹，所以改一张
+# 图片，引用它的 CSS 地址也会变。
+#
+# 模板里的 url_for('static', filename=...) 经 url_defaults 钩子直接生成带指纹的地址；
+# 这些地址的内容永远不变，响应带 Cache-Control: immutable，重复访问不再发请求。
+# 不带指纹的旧地址仍由原文件提供（普通缓存）。
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_file
+
+import compression
+
+HASH_LENGTH = 10
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# 这些文件从根路径提供（/sw.js、/manifest.json），地址必须固定
+EXCLUDE = {'sw.js', 'manifest.json'}
+SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'"()]+)\1\s*\)""")
+_SW_ASSET_RE = re.compile(r"""(['"])/assets/([^'"]+)\1""")
+_SW_CACHE_NAME_RE = re.compile(r"""(const CACHE_NAME = (['"]))([^'"]*?)(-v\d+)?\2""")
+
+
+def _mimetype(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class AssetPipeline:
+    """assets/ 的指纹清单、构建产物和对应的静态文件视图"""
+
+    def __init__(self, source_dir, build_dir, url_prefix='/assets/'):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.url_prefix = url_prefix
+        self.manifest = {}   # 原始相对路径 → 带指纹的相对路径
+        self.version = ''    # 整个清单的摘要，随任一文件变化
+        self._files = {}     # 带指纹的相对路径 → 构建目录中的文件
+        self._encoded = set()  # (带指纹的相对路径, 编码) 有预压缩版本
+
+    # ---------- 构建 ----------
+
+    def build(self):
+        sources = set()
+        for root, _, files in os.walk(self.source_dir):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), self.source_dir).replace(os.sep, '/')
+                if rel not in EXCLUDE and not name.startswith('.'):
+                    sources.add(rel)
+        self._sources = sources
+        for rel in sorted(sources):
+            self._fingerprint(rel, set())
+        digest = hashlib.sha256(repr(sorted(self.manifest.items())).encode('utf-8'))
+        self.version = digest.hexdigest()[:HASH_LENGTH]
+        return self
+
+    def _fingerprint(self, rel, visiting):
+        hashed = self.manifest.get(rel)
+        if hashed is not None:
+            return hashed
+        with open(os.path.join(self.source_dir, *rel.split('/')), 'rb') as f:
+            data = f.read()
+        if rel.endswith('.css'):
+            data = self._rewrite_css(rel, data, visiting | {rel})
+        stem, ext = posixpath.splitext(rel)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+        target = os.path.join(self.build_dir, *hashed.split('/'))
+        self._write(target, lambda: data)
+        if _mimetype(rel) in compression.COMPRESSIBLE_TYPES:
+            for encoding, suffix in SUFFIXES.items():
+                if encoding == 'br' and compression.brotli is None:
+                    continue
+                if self._write(target + suffix, lambda: compression.compress(data, encoding, best=True), len(data)):
+                    self._encoded.add((hashed, encoding))
+        self.manifest[rel] = hashed
+        self._files[hashed] = target
+        return hashed
+
+    def _rewrite_css(self, rel, data, visiting):
+        """把 url() 中指向本地资源的引用换成带指纹的相对地址"""
+        base = posixpath.dirname(rel)
+
+        def replace(match):
+            quote, ref = match.group(1), match.group(2).strip()
+            path, sep, rest = ref.partition('?') if '?' in ref else ref.partition('#')
+            if path.startswith(self.url_prefix):
+                target = path[len(self.url_prefix):]
+            elif path.startswith(('/', 'data:', 'http:', 'https:')):
+                return match.group(0)
+            else:
+                target = posixpath.normpath(posixpath.join(base, path))
+            if target not in self._sources or target in visiting:
+                return match.group(0)
+            hashed = self._fingerprint(target, visiting)
+            url = posixpath.relpath(hashed, base or '.')
+            return f"url({quote}{url}{sep}{rest}{quote})"
+
+        return _CSS_URL_RE.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+    @staticmethod
+    def _write(path, produce, limit=None):
+        """内容寻址：文件已存在就不写；limit 为压缩前大小，压缩后没变小就不写。返回是否有文件"""
+        if os.path.exists(path):
+            return True
+        data = produce()
+        if limit is not None and len(data) >= limit:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return True
+
+    # ---------- Flask 接入 ----------
+
+    def init_app(self, app):
+        """构建并接管 static 端点；构建失败（如只读文件系统）时保持原样"""
+        try:
+            self.build()
+        except Exception as e:
+            print(f"[ASSETS] 构建失败，使用未加指纹的静态文件: {e}")
+            self.manifest, self._files = {}, {}
+            return self
+        app.url_defaults(self.url_defaults)
+        app.view_functions['static'] = self.serve
+        return self
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static':
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = hashed
+
+    def url(self, filename):
+        """原始相对路径对应的地址（没有指纹时返回原地址）"""
+        return self.url_prefix + self.manifest.get(filename, filename)
+
+    def serve(self, filename):
+        """static 端点：带指纹的地址从构建目录提供（优先预压缩版本），其余交给默认处理"""
+        target = self._files.get(filename)
+        if target is None:
+            return current_app.send_static_file(filename)
+        encoding = compression.choose_encoding(request.headers.get('Accept-Encoding'))
+        encoded = encoding is not None and (filename, encoding) in self._encoded
+        response = send_file(target + SUFFIXES[encoding] if encoded else target,
+                             mimetype=_mimetype(filename), download_name=posixpath.basename(filename),
+                             conditional=True)
+        response.headers['Cache-Control'] = IMMUTABLE
+        if encoded:
+            response.headers['Content-Encoding'] = encoding
+        if any((filename, e) in self._encoded for e in SUFFIXES):
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def service_worker(self, source):
+        """sw.js 源码：缓存名带上清单版本，预缓存列表换成带指纹的地址"""
+        source = _SW_CACHE_NAME_RE.sub(lambda m: f"{m.group(1)}{m.group(3)}-{self.version}{m.group(2)}", source, count=1)
+        return _SW_ASSET_RE.sub(lambda m: f"{m.group(1)}{self.url(m.group(2))}{m.group(1)}", source)
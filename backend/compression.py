@@ -0,0 +1,128 @@
+# 响应压缩：按 Accept-Encoding 协商 brotli / gzip
+#
+# 只压缩文本类型、超过 MIN_SIZE 的完整 200 响应；流式响应（/api/events 的 SSE）、
+# 已经编码过的响应、304 / 206 等一律原样返回。
+# 渲染出的页面和静态文件反复出现同样的内容，压缩结果按 (内容哈希, 编码) 放进
+# 有总大小上限的 LRU 缓存，相同内容只压缩一次；JSON 接口的响应每次都不同，
+# 直接压缩不进缓存。
+#
+# brotli 是可选依赖（pip install brotli），没有安装时只提供 gzip。
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，没有时只用 gzip
+    brotli = None
+
+MIN_SIZE = 1024
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'text/markdown',
+    'application/javascript', 'application/json', 'application/manifest+json', 'image/svg+xml',
+}
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def choose_encoding(accept_encoding):
+    """按 Accept-Encoding（含 q 值）选择 'br' / 'gzip'，都不接受时返回 None"""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    candidates = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best = None
+    for encoding in candidates:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def compress(body, encoding, best=False):
+    """压缩为 'br' / 'gzip'；best=True 用最高级别（构建时预压缩，慢但只做一次）"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if best else BROTLI_QUALITY)
+    # mtime=0：相同内容得到相同字节，结果可以缓存
+    return gzip.compress(body, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def _cached_compress(body, encoding):
+    global _cache_bytes
+    key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+            return data
+    data = compress(body, encoding)
+    if len(data) <= CACHE_MAX_BYTES // 8:
+        with _cache_lock:
+            if key not in _cache:
+                _cache[key] = data
+                _cache_bytes += len(data)
+                while _cache_bytes > CACHE_MAX_BYTES:
+                    _, evicted = _cache.popitem(last=False)
+                    _cache_bytes -= len(evicted)
+    return data
+
+
+def cache_stats():
+    with _cache_lock:
+        return {'entries': len(_cache), 'bytes': _cache_bytes}
+
+
+def compress_response(response):
+    """after_request 钩子：协商并压缩响应体"""
+    # 静态文件是 direct_passthrough 的文件包装器（也算流式），读出内容后照常处理；
+    # 其他流式响应和 send_file 不动
+    static = request.endpoint == 'static'
+    if (response.status_code != 200 or (response.is_streamed and not static)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or request.method == 'HEAD'):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    if response.direct_passthrough:
+        if not static:
+            return response
+        response.direct_passthrough = False
+    body = response.get_data()
+    if len(body) < MIN_SIZE:
+        return response
+
+    cacheable = static or response.mimetype == 'text/html'
+    data = _cached_compress(body, encoding) if cacheable else compress(body, encoding)
+    if len(data) >= len(body):
+        return response
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    # 强 ETag 标识的是未压缩的字节，压缩后只能作为弱验证器
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        response.headers['ETag'] = 'W/' + etag
+    return response
@@ -0,0 +1,413 @@
+# JSON 文档存储层：进程内缓存 + 原子写入
+#
+# 每个 JSON 数据文件（todos.json、bubbles.json ...）在进程内缓存一份解析后的文档，
+# 只有当文件的 (mtime, size, inode) 发生变化时才重新解析；save() 采用写穿透，
+# 写盘成功后直接替换缓存，不需要再读一次文件。
+#
+# 注意：load() 返回的是缓存对象本身，调用方修改后必须调用 save() 持久化；
+# 只读路径（GET 接口）不要原地修改返回值（例如用 sorted() 而不是 list.sort()）。
+#
+# 序列化：默认缩进两格（便于人工查看和 diff），configure(compact=True) 后写紧凑格式。
+# 安装了 orjson 时用它编解码，否则用标准库 json；两种格式读取时都能识别。
+import os
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，没有时用标准库
+    orjson = None
+
+_compact = False
+
+
+def configure(compact=False):
+    """设置写入格式：compact=True 时不缩进、不加空格"""
+    global _compact
+    _compact = compact
+
+
+def dumps(data, compact=None):
+    """序列化为 UTF-8 字节（compact=None 时按 configure() 的设置）"""
+    if compact is None:
+        compact = _compact
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=0 if compact else orjson.OPT_INDENT_2)
+        except TypeError:
+            pass  # orjson 不支持的数据（非字符串键、超大整数等）交给标准库
+    if compact:
+        text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    return text.encode('utf-8')
+
+
+def loads(raw):
+    """解析 JSON（bytes 或 str），缩进和紧凑格式都可以"""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # 标准库更宽松（NaN、BOM 等），再试一次；真正损坏时由它抛出异常
+    return json.loads(raw)
+
+
+class _Document:
+    """单个文件的缓存条目"""
+    __slots__ = ('path', 'data', 'stat_key', 'generation', 'writing', 'lock', 'index', 'index_for')
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self.stat_key = None
+        self.generation = 0
+        # begin_save() 与 finish_save() 之间为 True：缓存领先于磁盘，不按 stat 重新加载
+        self.writing = False
+        self.lock = threading.RLock()
+        # Collection 的 id 索引，以及它对应的列表对象
+        self.index = None
+        self.index_for = None
+
+
+_documents = {}
+_documents_lock = threading.Lock()
+
+
+def _document(path):
+    """获取（必要时创建）文件对应的缓存条目"""
+    doc = _documents.get(path)
+    if doc is None:
+        with _documents_lock:
+            doc = _documents.get(path)
+            if doc is None:
+                doc = _documents[path] = _Document(path)
+    return doc
+
+
+def stat_key(path):
+    """文件版本标识 (mtime_ns, size, inode)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def generation(path):
+    """文档版本号：每次重新加载或保存都会递增（缓存失效不算）"""
+    return _document(path).generation
+
+
+def version(path):
+    """
+    不读文件的版本标识，用作 HTTP 验证器
+
+    就是 stat_key：所有写入都是写临时文件再 os.replace，新文件创建时旧文件还在，
+    每次保存后的 inode 都和替换前不同，同一时钟刻度内的连续保存也能区分。
+    不依赖进程内状态，多个 worker 对同一个文件给出相同的值。
+    """
+    return stat_key(path)
+
+
+def load(path, default_factory):
+    """
+    读取 JSON 文档，文件未变化时直接返回缓存
+
+    文件不存在或解析失败时返回 default_factory()（不缓存）。
+    """
+    key = stat_key(path)
+    if key is None:
+        return default_factory()
+
+    doc = _document(path)
+    with doc.lock:
+        if doc.data is not None and (doc.stat_key == key or doc.writing):
+            return doc.data
+        # 先 stat 再读：读取期间文件若被替换，下次 load 会看到新的 key 并重新解析
+        try:
+            data = read_json(path)
+        except Exception as e:
+            print(f"[STORE] 读取 {os.path.basename(path)} 失败: {e}")
+            return default_factory()
+        doc.data = data
+        doc.stat_key = key
+        doc.generation += 1
+        return data
+
+
+def save(path, data, keep_index=False, keep_on_error=False):
+    """
+    写入 JSON 文档（临时文件 + os.replace 原子替换），并写穿透到缓存
+
+    keep_index 只供 Collection 使用：它已经同步维护了索引。其他调用方可能
+    增删过列表元素，索引一律作废。keep_on_error 供延迟写入使用：写盘失败时
+    保留缓存（内存中的修改还要重试写盘）。
+    """
+    doc = _document(path)
+    with doc.lock:
+        if not keep_index:
+            doc.index = None
+            doc.index_for = None
+        try:
+            write_json(path, data)
+        except Exception:
+            if keep_on_error:
+                raise
+            # 写盘失败时缓存里可能是调用方改过的对象，丢弃以免与磁盘不一致
+            doc.data = None
+            doc.stat_key = None
+            doc.index = None
+            doc.index_for = None
+            raise
+        doc.data = data
+        doc.stat_key = stat_key(path)
+        doc.generation += 1
+
+
+def begin_save(path, data):
+    """
+    在锁外写盘的保存（延迟写入使用）：持有文档锁时序列化 data，返回要写入的字节
+
+    调用方随后释放锁，用 write_bytes() 写盘，再持有锁调用 finish_save()。
+    这期间其他线程可以继续读写缓存；文件在写盘中途被替换不会触发重新加载
+    （那样会丢掉写盘期间的修改）。同一文件同时只能有一个这样的写盘。
+    """
+    doc = _document(path)
+    with doc.lock:
+        payload = dumps(data)
+        doc.writing = True
+        return payload
+
+
+def finish_save(path, data, written=True):
+    """
+    结束 begin_save() 开始的保存：written 为 True 时登记这次写盘（同 save(keep_index=True)），
+    写盘失败时只清除标记，缓存保留待重试
+    """
+    doc = _document(path)
+    with doc.lock:
+        doc.writing = False
+        if written:
+            doc.data = data
+            doc.stat_key = stat_key(path)
+            doc.generation += 1
+
+
+def invalidate(path):
+    """丢弃缓存，下次 load 时重新读取文件"""
+    doc = _document(path)
+    with doc.lock:
+        doc.data = None
+        doc.stat_key = None
+        doc.index = None
+        doc.index_for = None
+
+
+def read_json(path):
+    """不经缓存直接解析文件（失败时抛出异常）"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def write_bytes(path, data):
+    """不经缓存写入：先写同目录临时文件，再原子替换目标文件"""
+    # 不用 tempfile.mkstemp：它以 0600 权限创建文件，会改变数据文件原有的权限
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(path, data):
+    """不经缓存写入 JSON（原子替换，见 write_bytes）"""
+    write_bytes(path, dumps(data))
+
+
+class Derived:
+    """
+    一组随文档增量维护的派生索引（统计、标签、全文 ...）
+
+    每个索引提供 add(item, sign) / rebuild(items)；这里把调用分发给所有索引，
+    并用 version 记录对应的文档版本，版本不一致时由持有者整体重建。
+    """
+
+    def __init__(self, **indexes):
+        self._indexes = list(indexes.values())
+        self.__dict__.update(indexes)
+        self.version = None
+
+    def rebuild(self, items, version=None):
+        items = list(items)
+        for index in self._indexes:
+            index.rebuild(items)
+        self.version = version
+
+    def add(self, item, sign=1):
+        for index in self._indexes:
+            index.add(item, sign)
+
+    def discard(self, item):
+        self.add(item, -1)
+
+
+class Collection:
+    """
+    JSON 文件中的一个记录列表，附带 id → 记录 的哈希索引
+
+    文档可以直接是列表（list_key=None），也可以是 {list_key: [...]}。
+    索引随缓存一起失效（文件被外部修改时重建），insert / remove 时同步维护，
+    因此按 id 取记录是 O(1)。get() 返回的是缓存中的记录，原地修改后调用 save()。
+
+    derived（Derived）是可选的派生索引：insert / update / remove 增量维护，
+    其他写入（save() 整体保存、文件被外部修改）之后在下一次 derived() 时重建。
+    on_change(op, item_id) 在每次写盘之后调用（op 为 insert / update / delete / replace）。
+    """
+
+    def __init__(self, path, list_key=None, key='id', derived=None, on_change=None):
+        self.path = path
+        self.list_key = list_key
+        self.key = key
+        self._derived = derived
+        self._on_change = on_change
+
+    @property
+    def lock(self):
+        """读-改-写需要原子时持有这把锁（可重入）"""
+        return _document(self.path).lock
+
+    def _default(self):
+        return {self.list_key: []} if self.list_key else []
+
+    def document(self):
+        return load(self.path, self._default)
+
+    def _items_of(self, data):
+        if self.list_key is None:
+            return data if isinstance(data, list) else []
+        if not isinstance(data, dict):
+            return []
+        return data.setdefault(self.list_key, [])
+
+    def items(self):
+        """记录列表（缓存对象，只读路径不要原地修改）"""
+        return self._items_of(self.document())
+
+    def _index(self, items):
+        """当前列表对应的索引，列表对象变了（重新加载/整体替换）就重建"""
+        doc = _document(self.path)
+        with doc.lock:
+            if doc.index is None or doc.index_for is not items:
+                index = {}
+                for item in items:
+                    index.setdefault(item.get(self.key), item)
+                doc.index = index
+                doc.index_for = items
+            return doc.index
+
+    def get(self, item_id):
+        """按 id 取记录，O(1)"""
+        return self._index(self.items()).get(item_id)
+
+    def derived(self):
+        """与当前文档一致的派生索引（读取方在 lock 内使用）"""
+        doc = _document(self.path)
+        with doc.lock:
+            items = self.items()
+            if self._derived.version != doc.generation:
+                self._derived.rebuild(items, doc.generation)
+            return self._derived
+
+    def _fresh_derived(self):
+        return self.derived() if self._derived is not None else None
+
+    def _changed(self, op, item_id=None):
+        if self._on_change is not None:
+            self._on_change(op, item_id)
+
+    def _commit(self, data, write, derived, op=None, item_id=None):
+        """保存文档；派生索引已经应用了这次变化，写盘后对应新的文档版本"""
+        if write:
+            try:
+                save(self.path, data, keep_index=True)
+            except Exception:
+                if derived is not None:
+                    derived.version = None
+                raise
+        if derived is not None:
+            derived.version = _document(self.path).generation
+        if write:
+            self._changed(op, item_id)
+
+    def insert(self, item, write=True):
+        """追加一条记录并保存（write=False 时只改缓存，由调用方稍后 save()）"""
+        doc = _document(self.path)
+        with doc.lock:
+            derived = self._fresh_derived()
+            data = self.document()
+            items = self._items_of(data)
+            index = self._index(items)
+            items.append(item)
+            index.setdefault(item.get(self.key), item)
+            if derived is not None:
+                derived.add(item)
+            self._commit(data, write, derived, 'insert', item.get(self.key))
+        return item
+
+    def update(self, item_id, changes):
+        """原地更新一条记录并保存，返回记录（不存在时返回 None，不写盘）"""
+        doc = _document(self.path)
+        with doc.lock:
+            derived = self._fresh_derived()
+            data = self.document()
+            record = self._index(self._items_of(data)).get(item_id)
+            if record is None:
+                return None
+            if derived is not None:
+                derived.discard(record)
+            record.update(changes)
+            if derived is not None:
+                derived.add(record)
+            self._commit(data, True, derived, 'update', item_id)
+            return record
+
+    def remove(self, item_id, write=True):
+        """删除记录并保存，返回被删除的记录（不存在时返回 None，不写盘）"""
+        doc = _document(self.path)
+        with doc.lock:
+            derived = self._fresh_derived()
+            data = self.document()
+            items = self._items_of(data)
+            index = self._index(items)
+            record = index.pop(item_id, None)
+            if record is None:
+                return None
+            items[:] = [item for item in items if item.get(self.key) != item_id]
+            if derived is not None:
+                derived.discard(record)
+            self._commit(data, write, derived, 'delete', item_id)
+            return record
+
+    def save(self, items=None):
+        """保存当前文档（记录被原地修改后），或用 items 整体替换列表"""
+        doc = _document(self.path)
+        with doc.lock:
+            if items is None:
+                # 只改了记录内容，列表结构和 id 没变，索引仍然有效
+                save(self.path, self.document(), keep_index=True)
+            elif self.list_key is None:
+                save(self.path, items)
+            else:
+                data = self.document()
+                if not isinstance(data, dict):
+                    data = {}
+                data[self.list_key] = items
+                save(self.path, data)
+            self._changed('replace')
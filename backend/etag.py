@@ -0,0 +1,60 @@
+# GET 接口的条件请求（ETag / If-None-Match）
+#
+# ETag 由数据的版本号和请求（路径 + 查询参数）算出，不需要读取或序列化数据：
+# 版本号是存储层提供的廉价标识（文件 stat、sqlite 的 generation 计数器等），
+# 数据每次保存都会变。客户端带着相同的 If-None-Match 再来时直接回 304，
+# 视图函数根本不执行。
+#
+# 版本号在调用视图之前取：读取期间恰好有写入时，响应内容可能比 ETag 新，
+# 下一次请求只会多拿一次 200，而不会把旧内容当成新版本缓存。
+# 使用弱 ETag（W/"..."）：压缩与未压缩的响应体字节不同，但内容等价。
+import hashlib
+from functools import wraps
+
+from flask import make_response, request
+
+
+def make_etag(version, path='', args=()):
+    """版本号 + 请求路径 + 排序后的查询参数 → 弱 ETag"""
+    digest = hashlib.blake2b(repr((version, path, sorted(args))).encode('utf-8'), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def matches(if_none_match, etag):
+    """If-None-Match 头是否命中 etag（弱比较，支持逗号分隔的多个值和 *）"""
+    if not if_none_match:
+        return False
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def conditional(version_fn):
+    """
+    视图装饰器：version_fn() 返回当前数据版本（可哈希、可 repr 的值）
+
+    命中 If-None-Match 时返回 304；否则执行视图，并给 200 响应加上 ETag 和
+    Cache-Control: no-cache（浏览器缓存响应，但每次都带 If-None-Match 回来验证）。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = make_etag(version_fn(), request.path, request.args.items(multi=True))
+            if matches(request.headers.get('If-None-Match'), etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
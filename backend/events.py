@@ -0,0 +1,247 @@
+# 数据变更推送（Server-Sent Events）
+#
+# 发布：每次提交向 events.log 追加一行紧凑 JSON {generation, store, op, id}。
+# 发布方持有锁文件上的独占锁，generation 接着文件最后一行递增，所以所有 gunicorn
+# worker 的写入共用一个全局有序的序列。文件超过 MAX_BYTES 时换成只含最后一行的
+# 新文件（换 inode）。
+#
+# 订阅：每个进程一个后台线程按 POLL_INTERVAL 跟踪文件尾部，把新事件分发到本进程
+# 各个连接的有界队列。读得慢的客户端队列满了就清空，只留一个 resync 事件，让
+# 客户端重新全量拉取：慢客户端不会拖住跟踪线程，也不会让内存无限增长。
+# 连接空闲时每 HEARTBEAT_INTERVAL 秒发一行注释，代理不会断开连接，客户端断开
+# 后也能在下一次写入时发现。断线重连时浏览器带上 Last-Event-ID，从文件里补发。
+import os
+import queue
+import threading
+import time
+
+import doc_store
+import file_lock
+
+MAX_BYTES = 256 * 1024
+POLL_INTERVAL = 0.25
+QUEUE_SIZE = 256
+HEARTBEAT_INTERVAL = 15
+# 每个进程同时保持的连接数上限：每个连接占用一个工作线程
+MAX_SUBSCRIBERS = 8
+
+# 队列溢出或补发范围已被轮换掉时发给客户端的标记
+RESYNC = {'op': 'resync'}
+
+
+class TooManySubscribers(Exception):
+    """本进程的推送连接数已达上限"""
+
+
+def _parse_lines(data):
+    """解析完整的行，跳过损坏的记录"""
+    events = []
+    for line in data.split(b'\n'):
+        if not line.strip():
+            continue
+        try:
+            events.append(doc_store.loads(line))
+        except Exception:
+            pass
+    return events
+
+
+def _last_generation(fd, size):
+    """文件最后一行的 generation（只读文件尾部；空文件为 0）"""
+    tail = os.pread(fd, min(size, 4096), max(0, size - 4096))
+    last = _parse_lines(tail[tail.rfind(b'\n', 0, len(tail) - 1) + 1:])
+    return last[-1].get('generation', 0) if last else 0
+
+
+def format_event(event):
+    """一条 SSE 消息"""
+    if event is RESYNC:
+        return 'event: resync\ndata: {}\n\n'
+    data = doc_store.dumps(event, compact=True).decode('utf-8')
+    return f"id: {event['generation']}\nevent: change\ndata: {data}\n\n"
+
+
+class _Subscriber:
+    __slots__ = ('stores', 'queue')
+
+    def __init__(self, stores, size):
+        self.stores = stores
+        self.queue = queue.Queue(size)
+
+    def offer(self, event):
+        """放入队列，不阻塞；队列满了换成一个 resync"""
+        if self.stores and event.get('store') not in self.stores:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            try:
+                while True:
+                    self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(RESYNC)
+
+
+class EventLog:
+    """一个事件文件：跨进程发布，本进程内扇出给订阅者"""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, poll_interval=POLL_INTERVAL,
+                 queue_size=QUEUE_SIZE, max_subscribers=MAX_SUBSCRIBERS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = file_lock.FileLock(path + '.lock')
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self._thread = None
+
+    # ---------- 发布 ----------
+
+    def publish(self, store, op, item_id=None):
+        """记录一次已提交的修改；失败只打印，不影响写入本身"""
+        try:
+            with self._lock.hold(timeout=5):
+                self._append(store, op, item_id)
+        except Exception as e:
+            print(f"[EVENTS] 发布失败: {e}")
+
+    def publisher(self, store):
+        """doc_store.Collection 的 on_change 回调"""
+        return lambda op, item_id=None: self.publish(store, op, item_id)
+
+    def _append(self, store, op, item_id):
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            event = {'generation': _last_generation(fd, size) + 1, 'store': store, 'op': op, 'id': item_id}
+            line = doc_store.dumps(event, compact=True) + b'\n'
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        if size + len(line) > self.max_bytes:
+            # 新文件只保留最后一行，generation 得以延续
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(line)
+            os.replace(temp_path, self.path)
+
+    # ---------- 订阅 ----------
+
+    def read_since(self, generation):
+        """文件里 generation 之后的事件；更早的已被轮换掉时返回 None"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        events = _parse_lines(data[:data.rfind(b'\n') + 1])
+        if events and events[0].get('generation', 0) > generation + 1:
+            return None
+        return [event for event in events if event.get('generation', 0) > generation]
+
+    def subscribe(self, stores=None):
+        """注册一个连接（只关心 stores 中的存储，空表示全部）；连接数超限时抛出 TooManySubscribers"""
+        with self._subscribers_lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscriber = _Subscriber(set(stores or ()), self.queue_size)
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                # 从当前最后一条之后开始跟踪（在这里取，订阅之后的事件一条也不漏）
+                self._thread = threading.Thread(target=self._follow, args=(self._current(),),
+                                                name='events-follow', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._subscribers_lock:
+            self._subscribers.discard(subscriber)
+
+    def _dispatch(self, events):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for subscriber in subscribers:
+                subscriber.offer(event)
+
+    def _current(self):
+        """当前最后一条事件的 generation"""
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+        try:
+            return _last_generation(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+
+    def _follow(self, last):
+        """跟踪文件尾部，分发 generation 大于 last 的事件；只消费完整的行"""
+        f, buffer = None, b''
+        while True:
+            try:
+                if f is None:
+                    f = open(self.path, 'rb')
+                buffer += f.read()
+                # 文件被换掉：旧文件不会再有写入，读完剩余部分后切换到新文件
+                rotated = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+                if rotated:
+                    buffer += f.read()
+                end = buffer.rfind(b'\n')
+                if end >= 0:
+                    events = [e for e in _parse_lines(buffer[:end]) if e.get('generation', 0) > last]
+                    buffer = buffer[end + 1:]
+                    if events:
+                        last = events[-1].get('generation', last)
+                        self._dispatch(events)
+                if rotated:
+                    f.close()
+                    f, buffer = None, b''
+                    continue
+            except FileNotFoundError:
+                if f is not None:
+                    f.close()
+                f, buffer = None, b''
+            except Exception as e:
+                print(f"[EVENTS] 读取事件失败: {e}")
+            time.sleep(self.poll_interval)
+
+    def stream(self, subscriber, last_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """
+        subscribe() 得到的订阅者的 SSE 响应体
+
+        last_id 是浏览器重连时带回的 Last-Event-ID，先补发文件中之后的事件。
+        生成器结束时取消订阅；连接在第一次输出前就断开时生成器不会运行，
+        调用方还要在响应关闭时调用 unsubscribe()。
+        """
+        try:
+            yield 'retry: 3000\n: connected\n\n'
+            last = -1
+            if last_id is not None:
+                # 订阅之后再读文件：之后到达队列的事件与补发的重复时按 generation 跳过
+                backlog = self.read_since(last_id)
+                last = last_id
+                if backlog is None:
+                    yield format_event(RESYNC)
+                else:
+                    for event in backlog:
+                        if not subscriber.stores or event.get('store') in subscriber.stores:
+                            yield format_event(event)
+                        last = event.get('generation', last)
+            while True:
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if event is not RESYNC:
+                    # 补发和跟踪线程可能送来同一条事件
+                    if event.get('generation', 0) <= last:
+                        continue
+                    last = event['generation']
+                yield format_event(event)
+        finally:
+            self.unsubscribe(subscriber)
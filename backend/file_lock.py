@@ -0,0 +1,132 @@
+# 跨进程文件锁：基于 fcntl.flock 的内核建议锁
+#
+# 锁文件本身只是一个挂锁的 inode，永远不删除。持有者进程退出（包括崩溃）时内核
+# 自动释放锁，所以不存在"过期锁"，也不需要按 mtime 强制清理。
+# 每次 acquire 都单独打开一个文件描述符，flock 以打开的文件为单位，因此同一进程
+# 内的不同线程之间同样互斥。
+#
+# 没有 fcntl 的平台（Windows）退化为进程内的读写互斥（共享模式也按独占处理）。
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能依赖进程内的线程锁
+    fcntl = None
+
+# 限时获取时的重试间隔：从 1ms 开始翻倍，最多 32ms
+_BACKOFF_START = 0.001
+_BACKOFF_MAX = 0.032
+
+
+class LockTimeout(Exception):
+    """在限定时间内没有拿到锁"""
+
+
+class FileLock:
+    """
+    一个锁文件上的共享 / 独占锁
+
+    acquire(shared, timeout)：timeout=None 时阻塞等待（由内核在释放时唤醒）；
+    否则先非阻塞尝试，失败后按指数退避重试直到超时。
+    stats() 返回获取次数、发生等待的次数、超时次数和等待时间，用于观察锁竞争。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock() if fcntl is None else None
+        self._stats_lock = threading.Lock()
+        self._acquired = 0
+        self._contended = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, shared=False, timeout=None):
+        """获取锁，返回交给 release() 的句柄；超时返回 None"""
+        start = time.monotonic()
+        if fcntl is None:
+            if self._thread_lock.acquire(blocking=False):
+                self._record(start, contended=False, ok=True)
+                return self
+            ok = self._thread_lock.acquire(timeout=-1 if timeout is None else timeout)
+            self._record(start, contended=True, ok=ok)
+            return self if ok else None
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            try:
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                self._record(start, contended=False, ok=True)
+                return fd
+            except BlockingIOError:
+                pass
+
+            if timeout is None:
+                fcntl.flock(fd, mode)
+                self._record(start, contended=True, ok=True)
+                return fd
+
+            deadline = start + timeout
+            delay = _BACKOFF_START
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record(start, contended=True, ok=False)
+                    os.close(fd)
+                    return None
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, _BACKOFF_MAX)
+                try:
+                    fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                    self._record(start, contended=True, ok=True)
+                    return fd
+                except BlockingIOError:
+                    pass
+        except BaseException:
+            os.close(fd)
+            raise
+
+    def release(self, handle):
+        """释放 acquire() 返回的句柄"""
+        if fcntl is None:
+            self._thread_lock.release()
+        else:
+            os.close(handle)  # 关闭即释放 flock
+
+    @contextmanager
+    def hold(self, shared=False, timeout=None):
+        """with lock.hold(...): 持有锁；超时抛出 LockTimeout"""
+        handle = self.acquire(shared=shared, timeout=timeout)
+        if handle is None:
+            raise LockTimeout(f"{os.path.basename(self.path)}: 等待 {timeout}s 未获得锁")
+        try:
+            yield
+        finally:
+            self.release(handle)
+
+    def _record(self, start, contended, ok):
+        waited = time.monotonic() - start
+        with self._stats_lock:
+            if ok:
+                self._acquired += 1
+            else:
+                self._timeouts += 1
+            if contended:
+                self._contended += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+    def stats(self):
+        """锁竞争统计（本进程）"""
+        with self._stats_lock:
+            return {
+                'acquired': self._acquired,
+                'contended': self._contended,
+                'timeouts': self._timeouts,
+                'wait_total_ms': round(self._wait_total * 1000, 3),
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
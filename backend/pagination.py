@@ -0,0 +1,82 @@
+# 键集分页（keyset pagination）
+#
+# 列表按 (created_at, id) 排好序常驻内存（KeysetOrder，和 TagIndex 一样提供
+# add / discard / rebuild，随写入增量维护）。游标是上一页最后一条的键，下一页从
+# 二分查找到的位置开始切片，一页的代价是 O(log n + limit)，与翻到第几页无关；
+# 翻页期间有新增或删除也不会重复或漏掉记录。
+import base64
+import bisect
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(key):
+    """键 → 不透明的 URL 安全字符串"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """encode_cursor 的逆运算，格式不对时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(key, list) or not all(isinstance(part, str) for part in key):
+        raise ValueError('invalid cursor')
+    return tuple(key)
+
+
+def parse_page_args(limit, cursor):
+    """解析 ?limit=&cursor=，返回 (limit, 游标键或 None)；参数不合法时抛出 ValueError"""
+    try:
+        limit = int(limit) if limit not in (None, '') else DEFAULT_LIMIT
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    limit = max(1, min(limit, MAX_LIMIT))
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+class KeysetOrder:
+    """按 fields 升序保存的键列表，分页时从新到旧（降序）返回"""
+
+    def __init__(self, fields=('created_at', 'id')):
+        self.fields = fields
+        self.version = None
+        self._keys = []
+
+    def _key(self, item):
+        return tuple(str(item.get(field) or '') for field in self.fields)
+
+    def rebuild(self, items, version=None):
+        self._keys = sorted(self._key(item) for item in items)
+        self.version = version
+
+    def add(self, item, sign=1):
+        key = self._key(item)
+        if sign > 0:
+            bisect.insort(self._keys, key)
+            return
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def discard(self, item):
+        self.add(item, -1)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def page(self, limit, cursor=None):
+        """
+        降序的一页：返回 (键列表, 下一页游标键或 None)
+
+        cursor 是上一页最后一条的键，本页从严格小于它的键开始。键的最后一项是 id。
+        """
+        end = bisect.bisect_left(self._keys, cursor) if cursor is not None else len(self._keys)
+        start = max(0, end - limit)
+        keys = self._keys[start:end][::-1]
+        return keys, (keys[-1] if keys and start > 0 else None)
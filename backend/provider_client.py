@@ -0,0 +1,117 @@
+# 大模型 / OCR 服务的共享 HTTP 客户端
+#
+# 所有上游调用（DeepSeek、OpenAI、豆包、OCR.space）共用一个 requests.Session：
+# 每个主机一个 keep-alive 连接池，批量翻译时连续的请求复用同一条 TCP/TLS 连接，
+# 不再每次重新握手。池大小和超时可以用环境变量调整。
+#
+# 请求和响应的形状统一：post_json / post_form 返回解析后的 JSON，chat 返回 (回复文本, 完整响应)；
+# 非 2xx、超时、网络错误、响应不是 JSON 一律抛出 ProviderError，由调用方转成提示文字。
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEEPSEEK_API_BASE = 'https://api.deepseek.com/v1'
+OPENAI_API_BASE = 'https://api.openai.com/v1'
+DOUBAO_API_BASE = 'https://ark.cn-beijing.volces.com/api/v3'
+OCRSPACE_URL = 'https://api.ocr.space/parse/image'
+
+# 每个主机保持的连接数（同时进行的请求超过它时多出的连接用完即关）
+POOL_SIZE = int(os.environ.get('PROVIDER_POOL_SIZE', '8'))
+# 保持连接池的主机数
+POOL_HOSTS = int(os.environ.get('PROVIDER_POOL_HOSTS', '8'))
+CONNECT_TIMEOUT = float(os.environ.get('PROVIDER_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.environ.get('PROVIDER_READ_TIMEOUT', '30'))
+
+
+class ProviderError(Exception):
+    """
+    上游调用失败
+
+    status 是 HTTP 状态码（网络错误、超时时为 None），api_message 是响应里
+    error.message 的内容，body 是原始响应文本，timeout 表示超时。
+    """
+
+    def __init__(self, message, status=None, api_message=None, body='', timeout=False):
+        super().__init__(message)
+        self.status = status
+        self.api_message = api_message
+        self.body = body
+        self.timeout = timeout
+
+
+def _api_message(response):
+    try:
+        error = response.json().get('error')
+    except Exception:
+        return None
+    if isinstance(error, dict):
+        return error.get('message')
+    return error if isinstance(error, str) else None
+
+
+class ProviderClient:
+    def __init__(self, pool_size=POOL_SIZE, pool_hosts=POOL_HOSTS,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def close(self):
+        self._session.close()
+
+    def _request(self, url, timeout=None, **kwargs):
+        try:
+            response = self._session.post(url, timeout=(self.connect_timeout, timeout or self.read_timeout), **kwargs)
+        except requests.exceptions.Timeout as e:
+            raise ProviderError(f'请求超时: {e}', timeout=True) from e
+        except requests.exceptions.RequestException as e:
+            raise ProviderError(str(e)) from e
+        if not 200 <= response.status_code < 300:
+            api_message = _api_message(response)
+            raise ProviderError(api_message or f'HTTP {response.status_code}', status=response.status_code,
+                                api_message=api_message, body=response.text)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise ProviderError('响应不是 JSON', status=response.status_code, body=response.text) from e
+
+    def post_json(self, url, payload, api_key=None, timeout=None):
+        """POST JSON（api_key 作为 Bearer 令牌），返回解析后的 JSON"""
+        headers = {'Content-Type': 'application/json'}
+        if api_key:
+            headers['Authorization'] = f'Bearer {api_key}'
+        return self._request(url, timeout=timeout, json=payload, headers=headers)
+
+    def post_form(self, url, fields, timeout=None):
+        """POST 表单（application/x-www-form-urlencoded），返回解析后的 JSON"""
+        return self._request(url, timeout=timeout, data=fields)
+
+    def chat(self, api_base, api_key, model, messages, timeout=None, **params):
+        """
+        OpenAI 兼容的 chat/completions（DeepSeek、OpenAI、豆包），返回 (回复文本, 完整响应)
+
+        params 是 max_tokens、temperature 等其他请求字段。
+        """
+        payload = dict(params, model=model, messages=messages)
+        result = self.post_json(f'{api_base.rstrip("/")}/chat/completions', payload, api_key, timeout)
+        content = (result.get('choices') or [{}])[0].get('message', {}).get('content') or ''
+        return content, result
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """进程内共享的客户端（第一次使用时创建）"""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ProviderClient()
+    return _default
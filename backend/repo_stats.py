@@ -0,0 +1,153 @@
+# 项目统计（/api/project/stats）：代码行数和 git 指标
+#
+# 统计在后台线程里计算，接口直接返回最近一次的快照，不占住请求线程：
+# - 行数按文件缓存，键为 (mtime_ns, size)，刷新时只重新数变化过的文件；
+#   快照超过 CODE_REFRESH_INTERVAL 秒时在后台重新扫描一遍目录
+# - git 指标（提交数、作者）只在 .git/HEAD、packed-refs 或 refs/ 下的文件变化时重新计算
+# 进程里还没有快照时（第一次请求），最多等 FIRST_WAIT 秒让第一次计算完成。
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+EXTENSIONS = {'.py': 'python', '.html': 'html', '.css': 'css', '.js': 'javascript'}
+# 虚拟环境、缓存，以及 build/（静态资源的带指纹副本，不能重复计数）
+SKIP_DIRS = {'venv', 'env', '__pycache__', 'node_modules', '.git', 'build'}
+CODE_REFRESH_INTERVAL = 60
+FIRST_WAIT = 5
+GIT_TIMEOUT = 30
+
+
+def count_lines(path):
+    """行数，与逐行迭代文本文件的结果一致（最后一行没有换行符也算一行）"""
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    return lines + (last != b'\n')
+
+
+def _empty_code():
+    return dict({key: 0 for key in EXTENSIONS.values()}, total=0)
+
+
+class RepoStats:
+    """一个目录（git 仓库）的统计快照，按需在后台刷新"""
+
+    def __init__(self, root, refresh_interval=CODE_REFRESH_INTERVAL):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self._lines = {}        # 路径 → (mtime_ns, size, 语言, 行数)，只由刷新线程访问
+        self._code = None
+        self._code_at = 0.0
+        self._git = None
+        self._git_key = None
+        self._updated_at = None
+        self._refreshing = None  # 正在进行的刷新完成时 set 的 Event
+        self._lock = threading.Lock()
+
+    def snapshot(self, wait=FIRST_WAIT):
+        """最近一次的统计 {code, git, updated_at}；过期时触发后台刷新，不等待结果"""
+        git_key = self._git_refs_key()
+        with self._lock:
+            stale = (self._code is None or git_key != self._git_key
+                     or time.monotonic() - self._code_at >= self.refresh_interval)
+            done = self._refreshing
+            if stale and done is None:
+                done = self._refreshing = threading.Event()
+                threading.Thread(target=self._refresh, args=(done,),
+                                 name='repo-stats', daemon=True).start()
+            ready = self._code is not None
+        if not ready and done is not None:
+            done.wait(wait)
+        with self._lock:
+            return {
+                'code': dict(self._code or _empty_code()),
+                'git': dict(self._git or {'commits': 0, 'authors': []}),
+                'updated_at': self._updated_at or datetime.now().isoformat(),
+            }
+
+    def _refresh(self, done):
+        try:
+            # 先取 refs 的状态再运行 git：计算期间有新提交，下一次请求还会再刷新
+            git_key = self._git_refs_key()
+            code = self._count_code()
+            with self._lock:
+                git = self._git if git_key == self._git_key else None
+            if git is None:
+                git = self._git_stats()
+            with self._lock:
+                self._code, self._code_at = code, time.monotonic()
+                self._git, self._git_key = git, git_key
+                self._updated_at = datetime.now().isoformat()
+        except Exception as e:
+            print(f"[STATS] 统计失败: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = None
+            done.set()
+
+    # ---------- 代码行数 ----------
+
+    def _count_code(self):
+        totals = _empty_code()
+        seen = set()
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for name in files:
+                language = EXTENSIONS.get(os.path.splitext(name)[1])
+                if language is None:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    cached = self._lines.get(path)
+                    if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+                        cached = self._lines[path] = (st.st_mtime_ns, st.st_size, language, count_lines(path))
+                except OSError:
+                    continue
+                seen.add(path)
+                totals[language] += cached[3]
+        for path in self._lines.keys() - seen:
+            del self._lines[path]
+        totals['total'] = sum(totals[key] for key in EXTENSIONS.values())
+        return totals
+
+    # ---------- git ----------
+
+    def _git_refs_key(self):
+        """HEAD、packed-refs 和 refs/ 下所有文件的 (路径, mtime, size)；有提交、切分支时会变"""
+        git_dir = os.path.join(self.root, '.git')
+        paths = [os.path.join(git_dir, 'HEAD'), os.path.join(git_dir, 'packed-refs')]
+        for root, _, files in os.walk(os.path.join(git_dir, 'refs')):
+            paths.extend(os.path.join(root, name) for name in files)
+        key = []
+        for path in sorted(paths):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key.append((path, st.st_mtime_ns, st.st_size))
+        return tuple(key)
+
+    def _run_git(self, *args):
+        result = subprocess.run(['git', *args], capture_output=True, text=True, stdin=subprocess.DEVNULL,
+                                cwd=self.root, timeout=GIT_TIMEOUT)
+        return result.stdout if result.returncode == 0 else None
+
+    def _git_stats(self):
+        stats = {'commits': 0, 'authors': []}
+        try:
+            output = self._run_git('rev-list', '--count', 'HEAD')
+            if output:
+                stats['commits'] = int(output.strip())
+            output = self._run_git('shortlog', '-sn', '--all')
+            for line in (output or '').strip().split('\n'):
+                parts = line.strip().split('\t')
+                if len(parts) == 2:
+                    stats['authors'].append({'name': parts[1], 'commits': int(parts[0].strip())})
+        except Exception as e:
+            print(f"[STATS] git 统计失败: {e}")
+        return stats
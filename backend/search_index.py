@@ -0,0 +1,112 @@
+# 全文检索：内存倒排索引 + BM25 排序
+#
+# 分词：中日韩文字取相邻两字的二元组（同时保留单字，单字查询也能命中），其他文字按
+# 单词切分并 casefold。每条记录索引一个文本字段，保存词频和文档长度，和
+# TagIndex / TodoStats 一样提供 add / discard / rebuild，由存储层在写入时增量维护。
+# 高亮位置是字段文本中的字符下标（Python str 下标，即 code point）。
+import math
+import re
+from collections import Counter
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_RE = re.compile(f'(?P<cjk>[{_CJK}]+)|(?P<word>[^\\W_{_CJK}]+)')
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text, unigrams=True):
+    """切分为 (词, 起始下标, 结束下标)；unigrams=False 时较长的中日韩片段只出二元组"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text or ''):
+        start, run = match.start(), match.group()
+        if match.lastgroup == 'word':
+            tokens.append((run.casefold(), start, match.end()))
+            continue
+        if len(run) == 1 or unigrams:
+            tokens.extend((ch, start + i, start + i + 1) for i, ch in enumerate(run))
+        tokens.extend((run[i:i + 2], start + i, start + i + 2) for i in range(len(run) - 1))
+    return tokens
+
+
+def query_terms(query):
+    """查询词：中日韩片段用二元组（单字片段用单字），去重保序"""
+    return list(dict.fromkeys(token for token, _, _ in tokenize(query, unigrams=False)))
+
+
+class TextIndex:
+    """单个存储的倒排索引：词 → {记录 id: 词频}"""
+
+    def __init__(self, field):
+        self.field = field
+        self.version = None
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        self._doc_terms = {}
+        self._lengths = {}
+        self._total_length = 0
+
+    def rebuild(self, items, version=None):
+        self._reset()
+        for item in items:
+            self.add(item)
+        self.version = version
+
+    def add(self, item, sign=1):
+        """索引一条记录（sign=-1 表示移除；只按 id 移除，与传入的内容无关）"""
+        item_id = item.get('id')
+        old = self._doc_terms.pop(item_id, None)
+        if old is not None:
+            self._total_length -= self._lengths.pop(item_id)
+            for term in old:
+                postings = self._postings[term]
+                del postings[item_id]
+                if not postings:
+                    del self._postings[term]
+        if sign < 0:
+            return
+        terms = Counter(token for token, _, _ in tokenize(item.get(self.field) or ''))
+        self._doc_terms[item_id] = terms
+        self._lengths[item_id] = sum(terms.values())
+        self._total_length += self._lengths[item_id]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[item_id] = tf
+
+    def discard(self, item):
+        self.add(item, -1)
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def search(self, terms):
+        """按 BM25 给包含任一查询词的记录打分，返回 {id: score}"""
+        count = len(self._doc_terms)
+        if not count:
+            return {}
+        average = (self._total_length / count) or 1
+        scores = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for item_id, tf in postings.items():
+                norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * self._lengths[item_id] / average))
+                scores[item_id] = scores.get(item_id, 0.0) + idf * norm
+        return scores
+
+
+def highlights(text, terms):
+    """查询词在 text 中出现的位置，重叠的区间合并，返回 [[start, end], ...]"""
+    wanted = set(terms)
+    spans = sorted((start, end) for token, start, end in tokenize(text) if token in wanted)
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
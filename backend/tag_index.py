@@ -0,0 +1,103 @@
+# 标签倒排索引
+#
+# tag → 使用该标签的记录 id 集合（集合大小即计数），外加一棵按 casefold 后字符建的
+# 前缀树用于自动补全：每个节点记录其子树下的全部标签，前缀查询只需沿前缀走到节点，
+# 代价与前缀长度和结果数量有关，与标签总数、记录总数无关。
+#
+# 与 todo_stats.TodoStats 一样提供 add / discard / rebuild，由存储层在修改时增量维护。
+
+
+class _TrieNode:
+    __slots__ = ('children', 'tags')
+
+    def __init__(self):
+        self.children = {}
+        self.tags = set()
+
+
+class TagIndex:
+    """标签 → id 集合，以及前缀补全"""
+
+    def __init__(self):
+        self.version = None
+        self._reset()
+
+    def _reset(self):
+        self._ids = {}
+        self._root = _TrieNode()
+
+    def rebuild(self, items, version=None):
+        self._reset()
+        for item in items:
+            self.add(item)
+        self.version = version
+
+    def add(self, item, sign=1):
+        """计入一条记录的标签（sign=-1 表示移除）"""
+        item_id = item.get('id')
+        for tag in set(item.get('tags') or ()):
+            if not isinstance(tag, str):
+                continue
+            if sign > 0:
+                ids = self._ids.get(tag)
+                if ids is None:
+                    ids = self._ids[tag] = set()
+                    self._trie_update(tag, add=True)
+                ids.add(item_id)
+            else:
+                ids = self._ids.get(tag)
+                if ids is None:
+                    continue
+                ids.discard(item_id)
+                if not ids:
+                    del self._ids[tag]
+                    self._trie_update(tag, add=False)
+
+    def discard(self, item):
+        self.add(item, -1)
+
+    def _trie_update(self, tag, add):
+        node = self._root
+        path = [node]
+        for ch in tag.casefold():
+            child = node.children.get(ch)
+            if child is None:
+                if not add:
+                    return
+                child = node.children[ch] = _TrieNode()
+            node = child
+            path.append(node)
+        for node in path:
+            if add:
+                node.tags.add(tag)
+            else:
+                node.tags.discard(tag)
+        if not add:
+            # 剪掉不再有标签的分支
+            key = tag.casefold()
+            for depth in range(len(path) - 1, 0, -1):
+                if path[depth].tags:
+                    break
+                del path[depth - 1].children[key[depth - 1]]
+
+    # ---------- 查询 ----------
+
+    def tags(self, prefix=''):
+        """以 prefix 开头的标签（不区分大小写），按字母排序"""
+        node = self._root
+        for ch in prefix.casefold():
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return sorted(node.tags)
+
+    def count(self, tag):
+        ids = self._ids.get(tag)
+        return len(ids) if ids else 0
+
+    def counts(self, tags):
+        return {tag: self.count(tag) for tag in tags}
+
+    def ids(self, tag):
+        """使用该标签的记录 id（新集合）"""
+        return set(self._ids.get(tag, ()))
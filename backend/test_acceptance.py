@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Tests for the acceptance markdown model"""
+
+import re
+
+import acceptance
+
+CONTENT = '''# 待验收功能清单
+
+### acc-001: 第一项
+| 项目 | 内容 |
+|------|------|
+| **功能** | 一 |
+| **状态** | ⏳ 待验收 |
+| **备注** | |
+
+---
+
+### acc-002: 第二项
+| **状态** | ⏳ 待验收 |
+
+### acc-003: 没有状态
+| **功能** | 三 |
+
+### acc-010: 第十项
+| **功能** | 十 | 多余的列 |
+| **状态** | ❌ 有问题 |
+'''
+
+
+def _old_update(content, item_id, new_status):
+    pattern = rf'(### {item_id}:.*?)\| \*\*状态\*\* \| [^|]+ \|'
+    return re.sub(pattern, rf'\1| **状态** | {new_status} |', content, flags=re.DOTALL)
+
+
+def test_parse_fields_and_status(tmp_path):
+    path = tmp_path / 'PENDING_ACCEPTANCE.md'
+    path.write_text(CONTENT, encoding='utf-8')
+    items = acceptance.AcceptanceFile(str(path)).items()
+    assert [item['id'] for item in items] == ['acc-001', 'acc-002', 'acc-003', 'acc-010']
+    assert items[0]['title'] == '第一项'
+    assert items[0]['fields'] == {'功能': '一', '状态': '⏳ 待验收', '备注': ''}
+    assert items[2]['status'] == acceptance.DEFAULT_STATUS
+    assert items[3]['fields']['功能'] == '十'
+    assert items[3]['status'] == '❌ 有问题'
+
+
+def test_splice_matches_regex_update_and_keeps_offsets(tmp_path):
+    path = tmp_path / 'PENDING_ACCEPTANCE.md'
+    path.write_text(CONTENT, encoding='utf-8')
+    doc = acceptance.AcceptanceFile(str(path))
+    doc.items()
+
+    assert doc.set_status('acc-001', '✅ 已验收')
+    expected = _old_update(CONTENT, 'acc-001', '✅ 已验收')
+    assert path.read_text(encoding='utf-8') == expected
+
+    # 区间已经平移，后面的条目可以继续修改（一次写入多个）
+    assert doc.set_statuses({'acc-002': '✅ 已验收', 'acc-010': '✅ 已验收', 'acc-003': 'x', 'acc-999': 'x'}) == ['acc-003', 'acc-999']
+    expected = _old_update(_old_update(expected, 'acc-002', '✅ 已验收'), 'acc-010', '✅ 已验收')
+    assert path.read_text(encoding='utf-8') == expected
+    assert [item['status'] for item in doc.items()] == ['✅ 已验收', '✅ 已验收', acceptance.DEFAULT_STATUS, '✅ 已验收']
+
+    # 缓存与重新解析的结果一致
+    fresh = acceptance.AcceptanceFile(str(path))
+    assert fresh.items() == doc.items()
+    assert [entry[1:] for entry in fresh._entries] == [entry[1:] for entry in doc._entries]
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """Simple test to verify the todo parsing logic works correctly"""
 
-from app import parse_todolist, parse_motivation
+from app import parse_todolist, parse_motivation, platform_template, is_mobile_user_agent
 
 def test_todo_parsing():
     """Test that todolist.txt is parsed correctly"""
@@ -28,6 +28,14 @@ def test_motivation_reading():
     
     return motivation_data
 
+def test_platform_template_resolution():
+    """Platform overrides come from the startup table; others fall back to the shared template"""
+    assert platform_template('todo.html', 'mobile') == 'mobile/todo.html'
+    assert platform_template('main.html', 'desktop') == 'desktop/main.html'
+    assert platform_template('todo.html', 'desktop') == 'todo.html'
+    assert is_mobile_user_agent('Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X)')
+    assert not is_mobile_user_agent('Mozilla/5.0 (Windows NT 10.0; Win64; x64)')
+
 if __name__ == "__main__":
     test_todo_parsing()
     test_motivation_reading()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Tests for the fingerprinted static asset pipeline"""
+
+import gzip
+import os
+
+from flask import Flask, render_template_string
+
+import assets
+import compression
+
+
+def _app(tmp_path):
+    source = tmp_path / 'assets'
+    (source / 'css').mkdir(parents=True)
+    (source / 'images').mkdir()
+    (source / 'images' / 'logo.png').write_bytes(b'\x89PNG' + b'\x00' * 64)
+    (source / 'css' / 'style.css').write_text('body { color: red; }\n' * 200)
+    (source / 'css' / 'desktop.css').write_text(
+        "@import url('style.css');\n.logo { background: url(../images/logo.png); }\n")
+    (source / 'sw.js').write_text("const CACHE_NAME = 'site-v1';\nconst STATIC_ASSETS = ['/', '/assets/css/style.css'];\n")
+
+    app = Flask(__name__, static_folder=str(source), static_url_path='/assets')
+    app.after_request(compression.compress_response)
+    pipeline = assets.AssetPipeline(str(source), str(tmp_path / 'build')).init_app(app)
+    return app, pipeline, source
+
+
+def test_hashed_urls_are_immutable_and_precompressed(tmp_path):
+    app, pipeline, _ = _app(tmp_path)
+    with app.test_request_context():
+        url = render_template_string("{{ url_for('static', filename='css/style.css') }}")
+    assert url == '/assets/' + pipeline.manifest['css/style.css']
+    assert url != '/assets/css/style.css'
+    assert os.path.exists(os.path.join(tmp_path, 'build', pipeline.manifest['css/style.css'] + '.gz'))
+
+    client = app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == assets.IMMUTABLE
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert gzip.decompress(response.data) == b'body { color: red; }\n' * 200
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.data == b'body { color: red; }\n' * 200
+
+    # 原地址照常可用，但不是 immutable
+    legacy = client.get('/assets/css/style.css')
+    assert legacy.status_code == 200
+    assert 'immutable' not in legacy.headers.get('Cache-Control', '')
+
+
+def test_css_references_and_service_worker_follow_content(tmp_path):
+    _, pipeline, source = _app(tmp_path)
+    desktop = (tmp_path / 'build' / pipeline.manifest['css/desktop.css']).read_text()
+    assert "url('%s')" % os.path.basename(pipeline.manifest['css/style.css']) in desktop
+    assert 'url(../%s)' % pipeline.manifest['images/logo.png'] in desktop
+    assert 'sw.js' not in pipeline.manifest
+
+    worker = pipeline.service_worker((source / 'sw.js').read_text())
+    assert "'site-%s'" % pipeline.version in worker
+    assert "'/assets/%s'" % pipeline.manifest['css/style.css'] in worker
+
+    # 改一张图片：图片和引用它的 CSS 都换地址，无关的 CSS 不变
+    (source / 'images' / 'logo.png').write_bytes(b'\x89PNG' + b'\x01' * 64)
+    rebuilt = assets.AssetPipeline(str(source), str(tmp_path / 'build')).build()
+    assert rebuilt.manifest['images/logo.png'] != pipeline.manifest['images/logo.png']
+    assert rebuilt.manifest['css/desktop.css'] != pipeline.manifest['css/desktop.css']
+    assert rebuilt.manifest['css/style.css'] == pipeline.manifest['css/style.css']
+    assert rebuilt.version != pipeline.version
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Tests for response compression"""
+
+import gzip
+
+from flask import Flask, Response, jsonify
+
+import compression
+
+
+def _client():
+    app = Flask(__name__)
+    app.after_request(compression.compress_response)
+
+    @app.route('/page')
+    def page():
+        return '<p>hello</p>' * 500
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/stream')
+    def stream():
+        return Response((chunk for chunk in ['data: x\n\n'] * 300), mimetype='text/event-stream')
+
+    return app.test_client()
+
+
+def test_negotiation():
+    assert compression.choose_encoding('gzip, deflate') == 'gzip'
+    assert compression.choose_encoding('gzip;q=0, identity') is None
+    assert compression.choose_encoding('') is None
+    assert compression.choose_encoding('*') in ('br', 'gzip')
+
+
+def test_large_text_is_compressed_and_cached():
+    client = _client()
+    before = compression.cache_stats()['entries']
+    response = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == b'<p>hello</p>' * 500
+
+    again = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert again.data == response.data
+    assert compression.cache_stats()['entries'] == before + 1
+
+    assert 'Content-Encoding' not in client.get('/page').headers
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/stream', headers={'Accept-Encoding': 'gzip'}).headers
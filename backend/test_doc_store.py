@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Tests for the cached JSON document store"""
+
+import json
+import os
+
+import doc_store
+
+
+def test_load_is_cached_until_file_changes(tmp_path):
+    """An unchanged file is parsed once; an external rewrite is picked up"""
+    path = str(tmp_path / 'items.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'id': 'a'}], f)
+
+    first = doc_store.load(path, list)
+    assert doc_store.load(path, list) is first
+
+    with open(path + '.new', 'w', encoding='utf-8') as f:
+        json.dump([{'id': 'a'}, {'id': 'b'}], f)
+    os.replace(path + '.new', path)
+
+    assert [i['id'] for i in doc_store.load(path, list)] == ['a', 'b']
+
+
+def test_save_writes_through(tmp_path):
+    """save() updates the cache without a re-read and leaves no temp files"""
+    path = str(tmp_path / 'items.json')
+    data = [{'id': 'x', 'text': '中文'}]
+    doc_store.save(path, data)
+
+    assert doc_store.load(path, list) is data
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == data
+    assert os.listdir(tmp_path) == ['items.json']
+
+
+def test_missing_or_broken_file_returns_default(tmp_path):
+    """Missing and unparsable files fall back to the default factory"""
+    path = str(tmp_path / 'broken.json')
+    assert doc_store.load(path, dict) == {}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{not json')
+    assert doc_store.load(path, list) == []
+
+
+def test_collection_index_tracks_inserts_and_removes(tmp_path):
+    """Collection lookups stay O(1) and follow insert/remove/external rewrites"""
+    path = str(tmp_path / 'calendar.json')
+    events = doc_store.Collection(path, list_key='events')
+
+    events.insert({'id': 'a', 'title': 'one'})
+    events.insert({'id': 'b', 'title': 'two'})
+    assert events.get('b')['title'] == 'two'
+
+    events.get('a')['title'] = 'edited'
+    events.save()
+    assert events.remove('b')['title'] == 'two'
+    assert events.remove('b') is None
+    assert events.get('b') is None
+
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'events': [{'id': 'a', 'title': 'edited'}]}
+
+    with open(path + '.new', 'w', encoding='utf-8') as f:
+        json.dump({'events': [{'id': 'c'}]}, f)
+    os.replace(path + '.new', path)
+    assert events.get('a') is None and events.get('c') == {'id': 'c'}
+
+
+def test_compact_format_round_trips_with_and_without_orjson(tmp_path, monkeypatch):
+    """Compact writes are smaller, and either format reads back with either codec"""
+    data = [{'id': 'a', 'text': '中文', 'tags': ['x'], 'n': 1.5}]
+    pretty = str(tmp_path / 'pretty.json')
+    compact = str(tmp_path / 'compact.json')
+    doc_store.write_json(pretty, data)
+    monkeypatch.setattr(doc_store, '_compact', True)
+    doc_store.write_json(compact, data)
+
+    assert os.path.getsize(compact) < os.path.getsize(pretty)
+    with open(compact, encoding='utf-8') as f:
+        assert f.read() == json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    for codec in (doc_store.orjson, None):
+        monkeypatch.setattr(doc_store, 'orjson', codec)
+        assert doc_store.read_json(pretty) == data
+        assert doc_store.read_json(compact) == data
+
+
+def test_version_is_the_file_stat(tmp_path):
+    """version() depends only on the file, so every worker agrees; same-size saves still differ"""
+    path = str(tmp_path / 'doc.json')
+    doc_store.save(path, {'n': 1})
+    first = doc_store.version(path)
+    doc_store.invalidate(path)
+    doc_store.load(path, dict)
+    assert doc_store.version(path) == first == doc_store.stat_key(path)
+
+    seen = {first}
+    for n in range(2, 50):
+        doc_store.save(path, {'n': n % 10})
+        seen.add(doc_store.version(path))
+    assert len(seen) == 49
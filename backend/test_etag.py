@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Tests for the conditional GET decorator"""
+
+from flask import Flask, jsonify
+
+import etag
+
+
+def _app(state):
+    app = Flask(__name__)
+
+    @app.route('/items')
+    @etag.conditional(lambda: state['version'])
+    def items():
+        state['calls'] += 1
+        return jsonify({'version': state['version']})
+
+    return app.test_client()
+
+
+def test_if_none_match_short_circuits_the_view():
+    state = {'version': 1, 'calls': 0}
+    client = _app(state)
+
+    first = client.get('/items')
+    tag = first.headers['ETag']
+    assert first.status_code == 200 and tag.startswith('W/"')
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    cached = client.get('/items', headers={'If-None-Match': tag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == tag
+    assert state['calls'] == 1
+
+    # Different query parameters, or a new version, get a different validator
+    assert client.get('/items?tab=week').headers['ETag'] != tag
+    state['version'] = 2
+    assert client.get('/items', headers={'If-None-Match': tag}).status_code == 200
+
+
+def test_matches_handles_lists_and_wildcards():
+    tag = etag.make_etag(1, '/items')
+    assert etag.matches(f'"x", {tag[2:]}', tag)
+    assert etag.matches('*', tag)
+    assert not etag.matches('', tag)
+    assert not etag.matches('W/"other"', tag)
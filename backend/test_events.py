@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Tests for the change event log and its fan-out"""
+
+import queue
+
+import events
+
+
+def test_generations_continue_across_publishers_and_rotation(tmp_path):
+    """Two logs on one file (two workers) share one sequence, even after rotation"""
+    path = str(tmp_path / 'events.log')
+    a = events.EventLog(path, max_bytes=200)
+    b = events.EventLog(path, max_bytes=200)
+    for i in range(10):
+        (a if i % 2 else b).publish('todos', 'update', str(i))
+
+    backlog = a.read_since(9)
+    assert [e['generation'] for e in backlog] == [10]
+    assert backlog[0]['id'] == '9'
+    # Older events were rotated away: the client has to resync
+    assert a.read_since(1) is None
+
+
+def test_subscribers_get_events_and_slow_ones_resync(tmp_path):
+    path = str(tmp_path / 'events.log')
+    log = events.EventLog(path, poll_interval=0.01, queue_size=2)
+    todos = log.subscribe(['todos'])
+    slow = log.subscribe()
+
+    events.EventLog(path).publish('todos', 'insert', 'a')
+    event = todos.queue.get(timeout=2)
+    assert (event['store'], event['op'], event['id'], event['generation']) == ('todos', 'insert', 'a', 1)
+
+    log.publish('bubbles', 'delete', 'b')
+    log.publish('todos', 'update', 'a')
+    # The todos-only subscriber never sees bubbles
+    assert todos.queue.get(timeout=2)['op'] == 'update'
+
+    # Nobody reads `slow`: its full queue collapses to a resync instead of growing
+    for i in range(5):
+        log.publish('todos', 'update', str(i))
+    seen = []
+    try:
+        while True:
+            seen.append(slow.queue.get(timeout=0.5))
+    except queue.Empty:
+        pass
+    assert events.RESYNC in seen
+    assert len(seen) <= 2
+
+
+def test_stream_replays_after_last_event_id(tmp_path):
+    log = events.EventLog(str(tmp_path / 'events.log'), poll_interval=0.01)
+    for i in range(3):
+        log.publish('prompts', 'insert', str(i))
+    subscriber = log.subscribe()
+    stream = log.stream(subscriber, last_id=1, heartbeat=0.05)
+    assert next(stream).startswith('retry:')
+    assert next(stream).startswith('id: 2\n')
+    assert next(stream).startswith('id: 3\n')
+    assert next(stream) == ': ping\n\n'
+    stream.close()
+    assert subscriber not in log._subscribers
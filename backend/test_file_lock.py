@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Tests for the flock-based cross-process lock"""
+
+import threading
+
+import pytest
+
+import file_lock
+
+
+def test_shared_holders_coexist_and_block_exclusive(tmp_path):
+    """Readers share the lock; a writer times out until they release it"""
+    lock = file_lock.FileLock(str(tmp_path / 'data.json.lock'))
+
+    first = lock.acquire(shared=True)
+    second = lock.acquire(shared=True, timeout=0.1)
+    assert second is not None
+    assert lock.acquire(timeout=0.05) is None
+
+    lock.release(first)
+    lock.release(second)
+    with lock.hold(timeout=0.1):
+        with pytest.raises(file_lock.LockTimeout):
+            with lock.hold(shared=True, timeout=0.05):
+                pass
+
+    stats = lock.stats()
+    assert stats['acquired'] == 3
+    assert stats['timeouts'] == 2
+    assert stats['contended'] == 2
+
+
+def test_blocking_acquire_wakes_on_release(tmp_path):
+    """A blocked writer gets the lock as soon as the holder releases it"""
+    lock = file_lock.FileLock(str(tmp_path / 'data.json.lock'))
+    holder = lock.acquire()
+    acquired = threading.Event()
+
+    def writer():
+        with lock.hold():
+            acquired.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    assert not acquired.wait(0.05)
+    lock.release(holder)
+    assert acquired.wait(1)
+    thread.join()
+    assert lock.stats()['contended'] == 1
@@ -0,0 +1,39 @@
+import pytest
+
+import pagination
+
+
+def _items(n):
+    return [{'id': f'p{i:03d}', 'created_at': f'2024-01-01T00:00:{i % 7:02d}'} for i in range(n)]
+
+
+def test_pages_cover_every_item_once_newest_first():
+    items = _items(23)
+    order = pagination.KeysetOrder()
+    order.rebuild(items)
+
+    seen, cursor = [], None
+    while True:
+        keys, cursor = order.page(5, cursor)
+        seen.extend(keys)
+        if cursor is None:
+            break
+        cursor = pagination.decode_cursor(pagination.encode_cursor(cursor))
+    assert [k[-1] for k in seen] == [k[-1] for k in sorted(
+        ((i['created_at'], i['id']) for i in items), reverse=True)]
+
+
+def test_writes_between_pages_do_not_shift_the_cursor():
+    items = _items(10)
+    order = pagination.KeysetOrder()
+    order.rebuild(items)
+    first, cursor = order.page(4)
+
+    order.add({'id': 'new', 'created_at': '2025-01-01T00:00:00'})
+    order.discard(items[0])
+    second, _ = order.page(4, cursor)
+    assert second[0] < first[-1]
+    assert not set(first) & set(second)
+
+    with pytest.raises(ValueError):
+        pagination.decode_cursor('not a cursor')
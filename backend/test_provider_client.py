@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Tests for the pooled provider client, against a local OpenAI-compatible stub"""
+
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import provider_client
+
+
+@pytest.fixture
+def stub():
+    state = {'requests': [], 'connections': set(), 'status': 200, 'delay': 0.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            state['connections'].add(self.client_address)
+            state['requests'].append((self.path, self.headers.get('Authorization'), raw))
+            time.sleep(state['delay'])
+            if self.path == '/parse/image':
+                fields = urllib.parse.parse_qs(raw.decode('utf-8'))
+                body = {'ParsedResults': [{'ParsedText': fields['language'][0]}]}
+            elif state['status'] != 200:
+                body = {'error': {'message': 'invalid key'}}
+            else:
+                payload = json.loads(raw)
+                body = {'choices': [{'message': {'content': f"{payload['model']}:{payload['messages'][-1]['content']}"}}]}
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(state['status'] if self.path != '/parse/image' else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state['base'] = f'http://127.0.0.1:{server.server_port}'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_reuses_one_connection(stub):
+    client = provider_client.ProviderClient()
+    for n in range(5):
+        text, result = client.chat(f"{stub['base']}/v1", 'sk-test', 'deepseek-chat',
+                                   [{'role': 'user', 'content': f'page {n}'}], max_tokens=5)
+        assert text == f'deepseek-chat:page {n}'
+        assert result['choices']
+    assert [path for path, _, _ in stub['requests']] == ['/v1/chat/completions'] * 5
+    assert stub['requests'][0][1] == 'Bearer sk-test'
+    assert json.loads(stub['requests'][0][2])['max_tokens'] == 5
+    assert len(stub['connections']) == 1
+    client.close()
+
+
+def test_form_post_and_errors(stub):
+    client = provider_client.ProviderClient(read_timeout=0.2)
+    result = client.post_form(f"{stub['base']}/parse/image", {'language': 'chs', 'scale': 'true'})
+    assert result['ParsedResults'][0]['ParsedText'] == 'chs'
+
+    stub['status'] = 401
+    with pytest.raises(provider_client.ProviderError) as info:
+        client.chat(stub['base'], 'bad', 'm', [{'role': 'user', 'content': 'hi'}])
+    assert info.value.status == 401
+    assert info.value.api_message == 'invalid key'
+    assert str(info.value) == 'invalid key'
+
+    stub['status'], stub['delay'] = 200, 0.5
+    with pytest.raises(provider_client.ProviderError) as info:
+        client.chat(stub['base'], 'k', 'm', [{'role': 'user', 'content': 'slow'}])
+    assert info.value.timeout and info.value.status is None
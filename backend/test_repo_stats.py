@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Tests for the cached project statistics"""
+
+import subprocess
+
+import repo_stats
+
+
+def _git(root, *args):
+    subprocess.run(['git', '-c', 'user.name=Tester', '-c', 'user.email=t@example.com', *args],
+                   cwd=root, check=True, capture_output=True)
+
+
+def test_count_lines_matches_text_iteration(tmp_path):
+    for content in ['', 'a', 'a\n', 'a\nb', 'a\nb\n\n']:
+        path = tmp_path / 'f.py'
+        path.write_text(content)
+        with open(path) as f:
+            assert repo_stats.count_lines(str(path)) == sum(1 for _ in f)
+
+
+def test_only_changed_files_are_recounted(tmp_path, monkeypatch):
+    (tmp_path / 'a.py').write_text('x = 1\ny = 2\n')
+    (tmp_path / 'page.html').write_text('<p>\n</p>\n<br>\n')
+    (tmp_path / 'build').mkdir()
+    (tmp_path / 'build' / 'copy.css').write_text('a{}\n' * 50)
+
+    counted = []
+    original = repo_stats.count_lines
+    monkeypatch.setattr(repo_stats, 'count_lines', lambda path: counted.append(path) or original(path))
+
+    stats = repo_stats.RepoStats(str(tmp_path))
+    code = stats.snapshot()['code']
+    assert code == {'python': 2, 'html': 3, 'css': 0, 'javascript': 0, 'total': 5}
+    assert len(counted) == 2
+
+    (tmp_path / 'a.py').write_text('x = 1\n')
+    counted.clear()
+    assert stats._count_code()['python'] == 1
+    assert [p.endswith('a.py') for p in counted] == [True]
+
+
+def test_git_metrics_refresh_when_refs_change(tmp_path):
+    _git(tmp_path, 'init', '-q')
+    (tmp_path / 'a.py').write_text('pass\n')
+    _git(tmp_path, 'add', 'a.py')
+    _git(tmp_path, 'commit', '-q', '-m', 'first')
+
+    stats = repo_stats.RepoStats(str(tmp_path), refresh_interval=3600)
+    git = stats.snapshot()['git']
+    assert git['commits'] == 1
+    assert git['authors'] == [{'name': 'Tester', 'commits': 1}]
+
+    _git(tmp_path, 'commit', '-q', '--allow-empty', '-m', 'second')
+    stats.snapshot()  # 发现 refs 变化，触发后台刷新并立即返回
+    if stats._refreshing is not None:
+        stats._refreshing.wait(5)
+    assert stats.snapshot()['git']['commits'] == 2
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Tests for the CJK-aware full-text index"""
+
+import doc_store
+import search_index
+
+
+def test_tokenizer_mixes_bigrams_and_words():
+    """Chinese runs become bigrams (plus single characters); Latin words are casefolded"""
+    tokens = [token for token, _, _ in search_index.tokenize('修复Bug 的问题')]
+    assert tokens == ['修', '复', '修复', 'bug', '的', '问', '题', '的问', '问题']
+    assert search_index.query_terms('问题 BUG 修') == ['问题', 'bug', '修']
+
+
+def test_bm25_ranks_and_highlights():
+    """Denser matches rank first, and highlight spans merge overlapping bigrams"""
+    index = search_index.TextIndex('content')
+    index.rebuild([
+        {'id': 'a', 'content': '页面动画卡顿，动画需要优化'},
+        {'id': 'b', 'content': '增加一个动画效果，同时整理很多其他无关的内容和说明'},
+        {'id': 'c', 'content': 'Refactor the parser'},
+    ])
+    terms = search_index.query_terms('动画')
+    scores = index.search(terms)
+    assert sorted(scores, key=scores.get, reverse=True) == ['a', 'b']
+    assert search_index.highlights('页面动画卡顿，动画需要优化', search_index.query_terms('动画卡顿')) == [[2, 6], [7, 9]]
+
+    index.discard({'id': 'a'})
+    assert set(index.search(terms)) == {'b'}
+    assert set(index.search(['parser'])) == {'c'}
+
+
+def test_collection_keeps_derived_index_in_step(tmp_path):
+    """Collection insert/update/remove feed the index; a whole-list save triggers a rebuild"""
+    store = doc_store.Collection(str(tmp_path / 'prompts.json'),
+                                 derived=doc_store.Derived(text=search_index.TextIndex('content')))
+    store.insert({'id': 'a', 'content': '旧的内容'})
+    store.insert({'id': 'b', 'content': '其他'})
+    store.update('a', {'content': '新的提示词'})
+    with store.lock:
+        assert set(store.derived().text.search(['提示'])) == {'a'}
+        assert store.derived().text.search(['旧的']) == {}
+
+    store.remove('b')
+    store.save([{'id': 'c', 'content': '提示'}])
+    with store.lock:
+        assert set(store.derived().text.search(['提示'])) == {'c'}
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tests for the tag inverted index and prefix lookup"""
+
+import tag_index
+import todo_storage
+
+
+def test_prefix_lookup_and_counts_follow_changes():
+    """Prefix matches are case-insensitive and tags disappear with their last user"""
+    index = tag_index.TagIndex()
+    index.rebuild([{'id': 'a', 'tags': ['Work', 'home']},
+                   {'id': 'b', 'tags': ['work', 'workout']}])
+
+    assert index.tags('wo') == ['Work', 'work', 'workout']
+    assert index.tags('x') == []
+    assert index.counts(['work', 'home']) == {'work': 1, 'home': 1}
+
+    index.discard({'id': 'b', 'tags': ['work', 'workout']})
+    index.add({'id': 'b', 'tags': ['home']})
+    assert index.tags('') == ['Work', 'home']
+    assert index.tags('workou') == []
+    assert index.ids('home') == {'a', 'b'}
+
+
+def test_todo_backends_filter_by_tag(tmp_path):
+    """list_items(tag=) and all_tags(prefix) agree across json and sqlite backends"""
+    for store in (todo_storage.JsonTodoBackend(str(tmp_path / 'todos.json')),
+                  todo_storage.SqliteTodoBackend(str(tmp_path / 'todos.db'))):
+        store.insert({'id': 'a', 'text': 'one', 'tab': 'today', 'tags': ['work']})
+        store.insert({'id': 'b', 'text': 'two', 'tab': 'week', 'tags': ['work', 'home']})
+        store.update('a', {'tags': ['writing']})
+
+        assert [i['id'] for i in store.list_items(tag='work')] == ['b']
+        assert [i['id'] for i in store.list_items('today', 'writing')] == ['a']
+        assert store.all_tags('w') == ['work', 'writing']
+        assert store.tag_counts(['home', 'gone']) == {'home': 1, 'gone': 0}
+        store.delete('b')
+        assert store.all_tags() == ['writing']
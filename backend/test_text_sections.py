@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Tests for the cached sectioned text files"""
+
+import os
+
+import text_sections
+
+HEADERS = [('a', '---A---'), ('b', '---B---'), ('c', '---C---')]
+
+
+def test_parse_matches_split_rules(tmp_path):
+    doc = text_sections.SectionedDocument(str(tmp_path / 'missing.txt'), HEADERS)
+    assert doc.sections() == {'a': '', 'b': '', 'c': ''}
+    assert doc.parse('intro\n---A---\n one \n---B---\ntwo\n---C---\nthree\n') == {'a': 'one', 'b': 'two', 'c': 'three'}
+    # 缺少中间的标题：剩余文本都归前一段
+    assert doc.parse('---A---\none\n---C---\nthree') == {'a': 'one\n---C---\nthree', 'b': '', 'c': ''}
+    assert doc.parse('no headers here') == {'a': '', 'b': '', 'c': ''}
+
+
+def test_update_writes_file_and_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'todo.txt'
+    path.write_text('---A---\none\n---B---\ntwo\n---C---\nthree\n', encoding='utf-8')
+    doc = text_sections.SectionedDocument(str(path), HEADERS)
+    assert doc.sections()['b'] == 'two'
+
+    doc.update('b', 'new\n\n\n\nlines')
+    assert path.read_text(encoding='utf-8') == '---A---\none\n\n---B---\nnew\n\nlines\n\n---C---\nthree\n'
+
+    # 缓存已经是新内容，不需要再读文件
+    monkeypatch.setattr('builtins.open', None)
+    assert doc.sections() == {'a': 'one', 'b': 'new\n\nlines', 'c': 'three'}
+
+
+def test_cached_value_matches_a_fresh_parse(tmp_path):
+    path = tmp_path / 'todo.txt'
+    doc = text_sections.SectionedDocument(str(path), HEADERS)
+    for key, content in [('a', '  one  '), ('b', 'x\r\ny\r\n\r\n\r\nz\n\n'), ('c', '\n\n'),
+                         ('a', 'has ---C--- inside'), ('b', '---A---\nmoved')]:
+        doc.update(key, content)
+        assert doc.sections() == text_sections.SectionedDocument(str(path), HEADERS).sections()
+
+    quotes = text_sections.LineList(str(tmp_path / 'quotes.txt'), ['default'])
+    for items in [[' a ', '', 'b'], ['', ' '], ['one\ntwo', 'three\r\n']]:
+        quotes.save(items)
+        assert quotes.items() == text_sections.LineList(str(tmp_path / 'quotes.txt'), ['default']).items()
+
+
+def test_external_change_is_picked_up(tmp_path):
+    path = tmp_path / 'quotes.txt'
+    path.write_text('first\n\n second \n', encoding='utf-8')
+    quotes = text_sections.LineList(str(path), ['default'])
+    assert quotes.items() == ['first', 'second']
+    assert quotes.choice() in ('first', 'second')
+
+    path.write_text('replaced\n', encoding='utf-8')
+    os.utime(path, ns=(1, 1))
+    assert quotes.items() == ['replaced']
+
+    quotes.save(['x', '', 'y'])
+    assert quotes.items() == ['x', 'y']
+    path.write_text('\n', encoding='utf-8')
+    os.utime(path, ns=(2, 2))
+    assert quotes.items() == ['default']
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Tests for the todo storage backends"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import doc_store
+import todo_storage
+
+
+def _item(item_id, text='task'):
+    return {'id': item_id, 'text': text, 'tab': 'today', 'quadrant': 'important-urgent',
+            'tags': [], 'completed': False, 'completed_at': None}
+
+
+def test_journal_appends_and_replays(tmp_path):
+    """Mutations go to todos.log and a fresh backend rebuilds the same state"""
+    path, log = str(tmp_path / 'todos.json'), str(tmp_path / 'todos.log')
+    store = todo_storage.JournalTodoBackend(path, log)
+
+    store.insert(_item('a'))
+    store.insert(_item('b'))
+    assert store.update('a', {'text': 'changed'})['text'] == 'changed'
+    assert store.update('missing', {'text': 'x'}) is None
+    assert store.delete('b') is True
+    assert store.batch_update([('a', {'quadrant': 'not-important-urgent'}), ('b', {'text': 'gone'})]) == 1
+    assert store.batch_update([('missing', {'text': 'x'})]) == 0
+
+    assert not os.path.exists(path)
+    with open(log, encoding='utf-8') as f:
+        assert len(f.readlines()) == 5
+
+    replayed = todo_storage.JournalTodoBackend(path, log).items()
+    assert replayed == [dict(_item('a', 'changed'), quadrant='not-important-urgent')]
+
+
+def test_journal_compacts_into_snapshot(tmp_path):
+    """Passing the record threshold folds the log into todos.json"""
+    path, log = str(tmp_path / 'todos.json'), str(tmp_path / 'todos.log')
+    store = todo_storage.JournalTodoBackend(path, log, max_records=3)
+
+    for i in range(4):
+        store.insert(_item(str(i)))
+
+    with open(path, encoding='utf-8') as f:
+        assert [i['id'] for i in json.load(f)['items']] == ['0', '1', '2']
+    assert [i['id'] for i in store.items()] == ['0', '1', '2', '3']
+    assert [i['id'] for i in todo_storage.JournalTodoBackend(path, log).items()] == ['0', '1', '2', '3']
+
+
+def test_sqlite_migrates_and_queries(tmp_path):
+    """The SQLite backend imports todos.json and answers indexed queries"""
+    path, db = str(tmp_path / 'todos.json'), str(tmp_path / 'todos.db')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'items': [dict(_item('a'), tags=['work', 'home']),
+                             dict(_item('b'), tab='week', tags=['work'])]}, f)
+
+    store = todo_storage.SqliteTodoBackend(db, json_path=path)
+    assert [i['id'] for i in store.list_items('week')] == ['b']
+    assert store.all_tags() == ['home', 'work']
+
+    store.update('a', {'completed': True, 'completed_at': '2025-01-02T10:00:00'})
+    assert store.status_counts()[('today', 'important-urgent', True)] == 1
+    assert store.count_completed_on(datetime(2025, 1, 2).date()) == 1
+
+    assert store.delete('a') is True
+    assert store.all_tags() == ['work']
+    assert store.get('b')['tags'] == ['work']
+
+
+def test_sqlite_migration_keeps_sync_cursors(tmp_path):
+    """Clients that synced against todos.json keep getting deltas after switching to SQLite"""
+    path, db = str(tmp_path / 'todos.json'), str(tmp_path / 'todos.db')
+    json_store = todo_storage.JsonTodoBackend(path)
+    json_store.insert(_item('a'))
+    json_store.insert(_item('b'))
+    since = datetime.now().isoformat()
+    json_store.delete('b')
+
+    store = todo_storage.SqliteTodoBackend(db, json_path=path)
+    assert store.changes(since) == ([], ['b'])
+    meta = dict(store._conn().execute("SELECT key, typeof(value) FROM todo_meta").fetchall())
+    assert meta == {'generation': 'integer'}
+
+    store.reload()
+    assert store.changes(since) is None
+    assert store._conn().execute("SELECT typeof(value) FROM todo_meta WHERE key = 'reset_at'").fetchone()[0] == 'text'
+
+
+def test_write_behind_coalesces_writes(tmp_path):
+    """A burst of edits is applied in memory at once and written to disk once"""
+    path = str(tmp_path / 'todos.json')
+    store = todo_storage.WriteBehindTodoBackend(path, delay_ms=50, max_ops=1000, max_staleness_ms=1000)
+    store.insert(_item('a'))
+    for i in range(20):
+        store.update('a', {'text': f'drag {i}'})
+    assert store.get('a')['text'] == 'drag 19'
+    assert store.delete('missing') is False
+
+    deadline = time.monotonic() + 2
+    while store.flush_count == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.flush_count == 1
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['items'][0]['text'] == 'drag 19'
+
+    store.batch_update([('a', {'quadrant': 'not-important-urgent'})])
+    store.close()
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['items'][0]['quadrant'] == 'not-important-urgent'
+
+
+def test_write_behind_flush_does_not_hold_the_lock(tmp_path, monkeypatch):
+    """Edits made while flush() is writing the file neither block nor get lost"""
+    path = str(tmp_path / 'todos.json')
+    store = todo_storage.WriteBehindTodoBackend(path, delay_ms=60000, max_ops=1000, max_staleness_ms=60000)
+    store.insert(_item('a'))
+    write_bytes = doc_store.write_bytes
+
+    def slow_write(target, data):
+        write_bytes(target, data)
+        editor = threading.Thread(target=store.update, args=('a', {'text': 'during flush'}))
+        editor.start()
+        editor.join(timeout=2)
+        assert not editor.is_alive()
+
+    monkeypatch.setattr(doc_store, 'write_bytes', slow_write)
+    store.flush()
+    monkeypatch.setattr(doc_store, 'write_bytes', write_bytes)
+    assert store.flush_count == 1
+    assert store.get('a')['text'] == 'during flush'
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['items'][0]['text'] == 'task'
+
+    store.close()
+    assert store.flush_count == 2
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['items'][0]['text'] == 'during flush'
+
+
+def test_stats_are_maintained_incrementally(tmp_path):
+    """Mutations adjust the aggregates so they match a full recount"""
+    import todo_stats
+
+    for store in (todo_storage.JsonTodoBackend(str(tmp_path / 'a.json')),
+                  todo_storage.JournalTodoBackend(str(tmp_path / 'b.json'), str(tmp_path / 'b.log'))):
+        for i in range(5):
+            store.insert(_item(str(i)))
+        store.update('1', {'completed': True, 'completed_at': '2025-01-02T10:00:00'})
+        store.batch_update([('2', {'quadrant': 'not-important-urgent'}),
+                            ('3', {'completed': True, 'completed_at': '2025-01-02T23:00:00'})])
+        store.delete('3')
+        store.update('1', {'tab': 'week'})
+
+        stats = store.stats()
+        recount = todo_stats.TodoStats()
+        recount.rebuild(store.items())
+        assert stats.status_counts() == recount.status_counts()
+        assert stats.status_counts()[('week', 'important-urgent', True)] == 1
+        assert store.count_completed_on(datetime(2025, 1, 2).date()) == 1
+
+
+def test_timeseries_rollups_and_streaks(tmp_path):
+    """Completions land in day/week buckets; SQLite notices writes from other connections"""
+    db = str(tmp_path / 'todos.db')
+    store = todo_storage.SqliteTodoBackend(db)
+    for i, day in enumerate(['2025-01-06', '2025-01-07', '2025-01-08', '2025-01-13']):
+        store.insert(dict(_item(str(i)), created_at=f'{day}T09:00:00', completed=True,
+                          completed_at=f'{day}T18:00:00'))
+    store.update('3', {'quadrant': 'not-important-urgent'})
+
+    start, end = datetime(2025, 1, 6).date(), datetime(2025, 1, 13).date()
+    weekly = store.timeseries(start, end, 'week', today=datetime(2025, 1, 9).date())
+    assert [(p['start'], p['completed']) for p in weekly['series']] == [('2025-01-06', 3), ('2025-01-13', 1)]
+    assert weekly['series'][1]['by_quadrant'] == {'not-important-urgent': {'created': 1, 'completed': 1}}
+    assert weekly['streak'] == {'current': 3, 'longest': 3}
+    assert weekly['velocity'] == 2
+
+    # A second backend on the same file stands in for another worker process
+    todo_storage.SqliteTodoBackend(db).delete('0')
+    daily = store.timeseries(start, start, 'day')
+    assert daily['totals'] == {'created': 0, 'completed': 0}
+    assert daily['streak']['longest'] == 2
+
+
+def test_version_changes_on_every_mutation(tmp_path):
+    """version() is cheap and moves whenever the data does"""
+    stores = [
+        todo_storage.JsonTodoBackend(str(tmp_path / 'a.json')),
+        todo_storage.JournalTodoBackend(str(tmp_path / 'b.json'), str(tmp_path / 'b.log')),
+        todo_storage.SqliteTodoBackend(str(tmp_path / 'c.db')),
+        todo_storage.WriteBehindTodoBackend(str(tmp_path / 'd.json'), delay_ms=60000),
+    ]
+    for store in stores:
+        seen = {store.version()}
+        store.insert(_item('1'))
+        seen.add(store.version())
+        store.update('1', {'text': 'edited'})
+        seen.add(store.version())
+        store.delete('1')
+        seen.add(store.version())
+        assert len(seen) == 4, type(store).__name__
+        assert store.version() == store.version()
+    stores[-1].close()
+
+
+def test_changes_return_updates_and_tombstones(tmp_path):
+    """changes(since) sees inserts, updates and deletes; a full replace resets it"""
+    stores = [
+        todo_storage.JsonTodoBackend(str(tmp_path / 'a.json')),
+        todo_storage.JournalTodoBackend(str(tmp_path / 'b.json'), str(tmp_path / 'b.log')),
+        todo_storage.SqliteTodoBackend(str(tmp_path / 'c.db')),
+    ]
+    for store in stores:
+        name = type(store).__name__
+        for i in range(3):
+            store.insert(dict(_item(str(i)), created_at='2025-01-01T00:00:00', updated_at='2025-01-01T00:00:00'))
+        since = datetime.now().isoformat()
+        store.update('1', {'text': 'edited', 'updated_at': datetime.now().isoformat()})
+        store.delete('2')
+
+        items, deleted = store.changes(since)
+        assert [item['id'] for item in items] == ['1'], name
+        assert deleted == ['2'], name
+        # 同步字段不出现在对外的文档里（导出与后端无关）
+        assert list(store.read_document()) == ['items'], name
+
+        replacement = {'items': store.items()}
+        store.write_document(replacement)
+        assert list(replacement) == ['items'], name
+        assert store.changes(since) is None, name
+        assert store.changes(datetime.now().isoformat()) == ([], []), name
+
+    # Tombstones survive journal compaction and replay
+    journal = todo_storage.JournalTodoBackend(str(tmp_path / 'd.json'), str(tmp_path / 'd.log'))
+    journal.insert(_item('x'))
+    since = datetime.now().isoformat()
+    journal.delete('x')
+    journal.compact()
+    reopened = todo_storage.JournalTodoBackend(str(tmp_path / 'd.json'), str(tmp_path / 'd.log'))
+    assert reopened.changes(since) == ([], ['x'])
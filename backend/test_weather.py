@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Tests for the per-city weather cache, against a local stand-in for wttr.in"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import weather
+
+
+class _Stub:
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+        self.delay = 0.0
+        self.code = 113
+
+
+@pytest.fixture
+def stub():
+    state = _Stub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state.requests.append(self.path)
+            time.sleep(state.delay)
+            if state.fail:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps({'current_condition': [{
+                'weatherCode': str(state.code), 'temp_C': '20', 'temp_F': '68', 'humidity': '50',
+                'weatherDesc': [{'value': self.path}]}]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f'http://127.0.0.1:{server.server_port}/{{city}}?format=j1'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cities_are_cached_separately(stub):
+    cache = weather.WeatherCache(base_url=stub.url, max_cities=2, clock=_Clock())
+    waterloo = cache.get('Waterloo,Ontario')
+    toronto = cache.get('Toronto')
+    assert waterloo['city'] == 'Waterloo,Ontario' and toronto['city'] == 'Toronto'
+    assert cache.get(' waterloo , ontario ') is waterloo
+    assert len(stub.requests) == 2
+
+    cache.get('Ottawa')  # 超出上限，淘汰最久未用的 Toronto
+    cache.get('Toronto')
+    assert len(stub.requests) == 4
+
+
+def test_concurrent_misses_share_one_request(stub):
+    stub.delay = 0.3
+    cache = weather.WeatherCache(base_url=stub.url)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('Waterloo'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(stub.requests) == 1
+    assert all(result['success'] for result in results)
+
+
+def test_stale_value_is_served_while_refreshing(stub):
+    clock = _Clock()
+    cache = weather.WeatherCache(base_url=stub.url, clock=clock)
+    assert cache.get('Waterloo')['weather_type'] == 'sunny'
+
+    stub.code = 296
+    clock.now += weather.FRESH_TTL + 1
+    stale = cache.get('Waterloo')
+    assert stale['weather_type'] == 'sunny' and stale['cached'] is True
+    for _ in range(50):
+        if len(stub.requests) == 2 and not cache._flights:
+            break
+        time.sleep(0.05)
+    assert cache.get('Waterloo')['weather_type'] == 'rainy'
+
+
+def test_failures_are_cached(stub):
+    clock = _Clock()
+    stub.fail = True
+    cache = weather.WeatherCache(base_url=stub.url, clock=clock)
+    assert cache.get('Nowhere')['success'] is False
+    assert cache.get('Nowhere')['success'] is False
+    assert len(stub.requests) == 1
+
+    clock.now += weather.NEGATIVE_TTL
+    stub.fail = False
+    assert cache.get('Nowhere')['success'] is True
+    assert len(stub.requests) == 2
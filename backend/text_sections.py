@@ -0,0 +1,131 @@
+# 文本数据文件的解析缓存：分段文件（todolist.txt、motivation.txt）和逐行文件（quotes.txt）
+#
+# 分段文件由一张 (键, 标题行) 表描述，标题按顺序出现，各段内容是两个标题之间的文本。
+# 解析是一次从左到右的扫描，规则与原来逐层 split 的写法一致：
+# - 第一个标题之前的内容忽略；找不到第一个标题时所有段都为空
+# - 某个标题找不到时，剩余文本全部归前一段，后面的段为空
+#
+# 解析结果按文件的 (mtime, size, inode) 缓存，文件没变就不再读取。
+# 通过这里写入时直接用刚写出的文本更新缓存，不需要再读一次文件。
+import os
+import random
+import re
+import threading
+
+import doc_store
+
+
+def normalize_content(content):
+    """Clean up content: normalize line endings and remove excessive blank lines"""
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    return content.strip() + '\n'
+
+
+class _CachedTextFile:
+    """一个文本文件解析后的缓存，子类提供 parse(text) 和 empty()"""
+
+    def __init__(self, path):
+        self.path = path
+        self._value = None
+        self._stat_key = None
+        self._lock = threading.RLock()
+
+    def _current(self):
+        key = doc_store.stat_key(self.path)
+        if key is None:
+            return self.empty()
+        with self._lock:
+            if self._value is not None and self._stat_key == key:
+                return self._value
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    value = self.parse(f.read())
+            except Exception as e:
+                print(f"Error parsing {os.path.basename(self.path)}: {e}")
+                return self.empty()
+            self._value, self._stat_key = value, key
+            return value
+
+    def _store(self, text, value):
+        """写入文件，缓存调用方给出的解析结果 value（与 parse(text) 相同），只刷新 stat"""
+        doc_store.write_bytes(self.path, text.encode('utf-8'))
+        self._value = value
+        self._stat_key = doc_store.stat_key(self.path)
+
+
+class SectionedDocument(_CachedTextFile):
+    """按标题行分段的文本文件"""
+
+    def __init__(self, path, headers):
+        super().__init__(path)
+        self.headers = list(headers)  # [(键, 标题行), ...]
+
+    def empty(self):
+        return {key: "" for key, _ in self.headers}
+
+    def parse(self, content):
+        sections = self.empty()
+        pos = 0
+        current = None
+        for key, header in self.headers:
+            found = content.find(header, pos)
+            if found < 0:
+                break
+            if current is not None:
+                sections[current] = content[pos:found].strip()
+            current, pos = key, found + len(header)
+        if current is not None:
+            sections[current] = content[pos:].strip()
+        return sections
+
+    def render(self, sections):
+        parts = [f"{header}\n{sections.get(key, '')}\n" for key, header in self.headers]
+        return normalize_content('\n'.join(parts))
+
+    def sections(self):
+        """所有段的内容（副本，可以修改）"""
+        return dict(self._current())
+
+    def update(self, key, content):
+        """替换一段并写回文件"""
+        with self._lock:
+            sections = self.sections()
+            sections[key] = content
+            text = self.render(sections)
+            # render 会规范化换行，各段按同样的规则清理后就是重新解析的结果；
+            # 内容里含有标题行时分段会变，只能重新解析
+            if any(header in value for value in sections.values() for _, header in self.headers):
+                value = self.parse(text)
+            else:
+                value = {k: normalize_content(sections[k]).strip() for k, _ in self.headers}
+            self._store(text, value)
+
+
+class LineList(_CachedTextFile):
+    """每行一条记录的文本文件（空行忽略）；缓存的列表支持 O(1) 随机选取"""
+
+    def __init__(self, path, default):
+        super().__init__(path)
+        self.default = list(default)
+
+    def empty(self):
+        return self.default
+
+    def parse(self, content):
+        return [line.strip() for line in content.split('\n') if line.strip()] or self.default
+
+    def items(self):
+        return list(self._current())
+
+    def choice(self):
+        return random.choice(self._current())
+
+    def save(self, items):
+        with self._lock:
+            # 条目里带换行时写出去会变成多行，只能按文件内容重新解析
+            if any('\n' in item or '\r' in item for item in items):
+                value = self.parse('\n'.join(items))
+            else:
+                value = [item.strip() for item in items if item.strip()] or self.default
+            self._store('\n'.join(items), value)
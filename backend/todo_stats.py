@@ -0,0 +1,145 @@
+# Todo 统计聚合
+#
+# /api/stats 需要的计数（按 tab / quadrant / 完成状态分组、每天完成数）以及
+# /api/stats/timeseries 用的按天 / 按周、按象限的创建数和完成数，都作为聚合量常驻内存：
+# 全量构建只在文档第一次加载或被外部替换时做一次（即从 todos.json 重建），之后由
+# todo_storage 的修改路径按"先减去旧记录、再加上新记录"增量维护。查询只访问
+# 请求范围内的桶，与历史记录总量无关。
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+BUCKETS = ('day', 'week')
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def completed_day(item):
+    """记录的完成日期（未完成或时间无法解析时为 None）"""
+    if not item.get('completed'):
+        return None
+    return _parse_day(item.get('completed_at'))
+
+
+def bucket_start(day, bucket):
+    """day 所在桶的起始日期（周以周一开始）"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class TodoStats:
+    """
+    增量维护的计数器
+
+    version 由存储后端设置，用来判断聚合是否对应当前文档（不一致就 rebuild）。
+    series[(bucket, kind)][桶起始日期] 是该桶内按象限的计数，kind 为 created / completed。
+    """
+
+    def __init__(self):
+        self.version = None
+        self._reset()
+
+    def _reset(self):
+        self.status = Counter()
+        self.completed_by_day = Counter()
+        self.series = {(bucket, kind): defaultdict(Counter)
+                       for bucket in BUCKETS for kind in ('created', 'completed')}
+        self._longest_streak = None
+
+    def rebuild(self, items, version=None):
+        self._reset()
+        for item in items:
+            self.add(item)
+        self.version = version
+
+    def add(self, item, sign=1):
+        """计入一条记录（sign=-1 表示移除）"""
+        quadrant = item.get('quadrant')
+        self.status[(item.get('tab'), quadrant, bool(item.get('completed')))] += sign
+        for kind, day in (('created', _parse_day(item.get('created_at'))), ('completed', completed_day(item))):
+            if day is None:
+                continue
+            if kind == 'completed':
+                self.completed_by_day[day] += sign
+                self._longest_streak = None
+            for bucket in BUCKETS:
+                self.series[(bucket, kind)][bucket_start(day, bucket)][quadrant] += sign
+
+    def discard(self, item):
+        self.add(item, -1)
+
+    # ---------- 查询 ----------
+
+    def status_counts(self):
+        """按 (tab, quadrant, completed) 分组计数（去掉归零的分组）"""
+        return +self.status
+
+    def count_completed_on(self, day):
+        return self.completed_by_day.get(day, 0)
+
+    def current_streak(self, today):
+        """截至 today 连续有完成记录的天数（今天还没完成时从昨天算起）"""
+        day = today if self.completed_by_day.get(today, 0) > 0 else today - timedelta(days=1)
+        streak = 0
+        while self.completed_by_day.get(day, 0) > 0:
+            streak += 1
+            day -= timedelta(days=1)
+        return streak
+
+    def longest_streak(self):
+        """历史最长连续完成天数（按有完成记录的日期计算，结果缓存到下一次变化）"""
+        if self._longest_streak is None:
+            longest = run = 0
+            previous = None
+            for day in sorted(d for d, n in self.completed_by_day.items() if n > 0):
+                run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+                longest = max(longest, run)
+                previous = day
+            self._longest_streak = longest
+        return self._longest_streak
+
+    def timeseries(self, start, end, bucket='day', today=None):
+        """[start, end] 范围内每个桶的创建数 / 完成数（含按象限拆分）、连续天数和完成速度"""
+        step = timedelta(days=7 if bucket == 'week' else 1)
+        created = self.series[(bucket, 'created')]
+        completed = self.series[(bucket, 'completed')]
+
+        points = []
+        current = bucket_start(start, bucket)
+        while current <= end:
+            by_created, by_completed = created.get(current, Counter()), completed.get(current, Counter())
+            quadrants = {q for q in set(by_created) | set(by_completed)
+                         if q is not None and (by_created[q] or by_completed[q])}
+            points.append({
+                'start': current.isoformat(),
+                'created': sum(by_created.values()),
+                'completed': sum(by_completed.values()),
+                'by_quadrant': {q: {'created': by_created[q], 'completed': by_completed[q]}
+                                for q in sorted(quadrants)},
+            })
+            current += step
+
+        total_completed = sum(p['completed'] for p in points)
+        today = today or end
+        return {
+            'bucket': bucket,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'series': points,
+            'totals': {
+                'created': sum(p['created'] for p in points),
+                'completed': total_completed,
+            },
+            'velocity': round(total_completed / len(points), 2) if points else 0,
+            'streak': {
+                'current': self.current_streak(today),
+                'longest': self.longest_streak(),
+            },
+        }
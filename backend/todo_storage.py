@@ -0,0 +1,1027 @@
+# Todo 存储后端
+#
+# app.py 的 todo 接口只通过这里的 insert / update / delete / batch_update 修改数据，
+# 具体怎么落盘由后端决定：
+#   json    - 默认，每次修改整体重写 todos.json（经 doc_store 缓存）
+#   journal - todos.json 作为快照，每次修改只向 todos.log 追加一行操作记录，
+#             当前状态 = 快照 + 日志重放；日志超过阈值后合并回 todos.json
+#   write-behind - 与 json 相同的文件格式，但修改只作用于内存，由后台线程合并后
+#             定期写盘（拖拽看板时的连续修改只写一次）；只适合单进程部署
+#   sqlite  - todos.db（WAL 模式），tab / quadrant / completed / updated_at 有索引，
+#             标签存在单独的 todo_tags 表；按 tab 过滤、统计、标签列表都是索引查询
+#
+# 增量同步（changes）：新增 / 修改按 updated_at 查找；删除时留下墓碑（id + 删除时间），
+# 保留 TOMBSTONE_RETENTION_DAYS 天。整体替换（导入、恢复备份）会记录 reset_at，
+# 早于它或早于墓碑保留期的同步游标只能全量同步。
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import doc_store
+import search_index
+import tag_index
+import todo_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能依赖进程内的线程锁
+    fcntl = None
+
+# 日志超过任一阈值就触发合并
+JOURNAL_MAX_RECORDS = 500
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+# 延迟写入：最后一次修改后静默这么久、或累计这么多次修改就写盘；
+# 无论修改是否持续，第一次未写盘的修改最多等待 MAX_STALENESS
+WRITE_BEHIND_DELAY_MS = 200
+WRITE_BEHIND_MAX_OPS = 50
+WRITE_BEHIND_MAX_STALENESS_MS = 2000
+
+# 删除记录的墓碑保留天数
+TOMBSTONE_RETENTION_DAYS = 30
+
+
+def _new_derived():
+    """todo 的派生数据：统计聚合、标签索引、全文索引"""
+    return doc_store.Derived(stats=todo_stats.TodoStats(), tags=tag_index.TagIndex(),
+                             text=search_index.TextIndex('text'))
+
+
+def _empty_document():
+    return {"items": []}
+
+
+# 文档里只供增量同步使用的字段，不对外返回（导出、备份下载看到的只有 items）
+_SYNC_KEYS = ('deleted', 'reset_at')
+
+
+def _public_document(doc):
+    """去掉同步字段的文档（浅拷贝，items 仍是缓存对象）"""
+    if not isinstance(doc, dict):
+        return doc
+    return {key: value for key, value in doc.items() if key not in _SYNC_KEYS}
+
+
+def _replacement_document(doc):
+    """整体替换时实际写入的文档：丢弃调用方带来的同步字段，记录新的 reset_at（不修改 doc）"""
+    new = _public_document(doc)
+    new['reset_at'] = _now()
+    return new
+
+
+def _list_order(item):
+    """列表排序：未完成在前，再按创建时间"""
+    return (item.get('completed', False), item.get('created_at', ''))
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def _sync_horizon():
+    """墓碑保留期的起点：更早的同步游标可能漏掉已清理的删除"""
+    return (datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)).isoformat()
+
+
+def _changed_since(item, since):
+    return (item.get('updated_at') or item.get('created_at') or '') >= since
+
+
+def _add_tombstone(doc, item_id, deleted_at):
+    """在文档的 deleted 列表里记录一次删除，顺带清理过期的墓碑"""
+    horizon = _sync_horizon()
+    doc['deleted'] = [t for t in doc.get('deleted', [])
+                      if t.get('deleted_at', '') >= horizon and t.get('id') != item_id]
+    doc['deleted'].append({'id': item_id, 'deleted_at': deleted_at})
+
+
+def _doc_changes(doc, since):
+    """文档（{"items", "deleted", "reset_at"}）里 since 之后的变化，游标失效时返回 None"""
+    if since < max(doc.get('reset_at') or '', _sync_horizon()):
+        return None
+    items = [item for item in doc.get('items', []) if _changed_since(item, since)]
+    deleted = [t.get('id') for t in doc.get('deleted', []) if t.get('deleted_at', '') >= since]
+    return sorted(items, key=_list_order), deleted
+
+
+class JsonTodoBackend:
+    """整文件存储：每次修改都重写 todos.json（按 id 查找走 Collection 的哈希索引）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._collection = doc_store.Collection(path, list_key='items')
+        self._lock = self._collection.lock
+        self._derived = _new_derived()
+
+    def _document(self):
+        """内存中的完整文档（含墓碑和 reset_at）"""
+        return self._collection.document()
+
+    def read_document(self):
+        """返回文档 {"items": [...]}（不含同步字段）"""
+        return _public_document(self._document())
+
+    def write_document(self, doc):
+        """整体替换文档（之前的同步游标全部失效）"""
+        doc_store.save(self.path, _replacement_document(doc))
+
+    def items(self):
+        return self._collection.items()
+
+    def get(self, item_id):
+        return self._collection.get(item_id)
+
+    def version(self):
+        """数据版本标识（不读取数据，任何修改后都会变），用作 HTTP 验证器"""
+        return doc_store.version(self.path)
+
+    # ---------- 修改：先改内存文档并同步派生数据，再由 _persist 写盘 ----------
+
+    def derived(self):
+        """当前文档对应的统计聚合和标签索引（文档被重新加载或整体替换后全量重建一次）"""
+        with self._lock:
+            items = self.items()
+            generation = doc_store.generation(self.path)
+            if self._derived.version != generation:
+                self._derived.rebuild(items, generation)
+            return self._derived
+
+    def stats(self):
+        return self.derived().stats
+
+    def tag_index(self):
+        return self.derived().tags
+
+    def search(self, terms, limit):
+        """全文检索，返回得分最高的 [(score, item), ...]"""
+        with self._lock:
+            scores = self.derived().text.search(terms)
+            top = sorted(scores.items(), key=lambda pair: -pair[1])[:limit]
+            return [(score, self.get(item_id)) for item_id, score in top]
+
+    @contextmanager
+    def _tracking(self):
+        """持有锁修改文档；结束后派生数据对应写盘后的新版本，出错则作废"""
+        with self._lock:
+            derived = self.derived()
+            try:
+                yield derived
+            except BaseException:
+                derived.version = None
+                raise
+            derived.version = doc_store.generation(self.path)
+
+    def _persist(self, ops=1):
+        """把已经作用到内存文档的修改写盘"""
+        self._collection.save()
+
+    def _ensure_file(self):
+        # 文件不存在时 doc_store 不缓存默认文档，内存修改无处安放，先落一个空文档
+        if doc_store.stat_key(self.path) is None:
+            doc_store.save(self.path, _empty_document())
+
+    def insert(self, item):
+        with self._tracking() as derived:
+            self._ensure_file()
+            self._collection.insert(item, write=False)
+            derived.add(item)
+            self._persist()
+            return item
+
+    def update(self, item_id, changes):
+        """更新字段，返回更新后的 item；不存在时返回 None"""
+        with self._tracking() as derived:
+            item = self._collection.get(item_id)
+            if item is None:
+                return None
+            derived.discard(item)
+            item.update(changes)
+            derived.add(item)
+            self._persist()
+            return item
+
+    def delete(self, item_id):
+        """删除 item 并留下墓碑，返回是否存在"""
+        with self._tracking() as derived:
+            record = self._collection.remove(item_id, write=False)
+            if record is None:
+                return False
+            derived.discard(record)
+            _add_tombstone(self._collection.document(), item_id, _now())
+            self._persist()
+            return True
+
+    def batch_update(self, updates):
+        """批量更新 [(item_id, changes), ...]，只写一次盘，返回命中数量"""
+        with self._tracking() as derived:
+            count = 0
+            for item_id, changes in updates:
+                item = self._collection.get(item_id)
+                if item is not None:
+                    derived.discard(item)
+                    item.update(changes)
+                    derived.add(item)
+                    count += 1
+            if count:
+                self._persist(count)
+            return count
+
+    # ---------- 查询 ----------
+
+    def list_items(self, tab=None, tag=None):
+        """按 tab / 标签过滤并排序后的列表（新列表，不影响缓存）"""
+        if tag:
+            # 标签过滤走倒排索引，只取命中的记录
+            with self._lock:
+                items = [self.get(item_id) for item_id in self.tag_index().ids(tag)]
+            items = [item for item in items if item is not None]
+        else:
+            items = self.items()
+        if tab:
+            items = [item for item in items if item.get('tab') == tab]
+        return sorted(items, key=_list_order)
+
+    def status_counts(self):
+        """按 (tab, quadrant, completed) 分组计数（来自增量聚合，O(1)）"""
+        with self._lock:
+            return self.stats().status_counts()
+
+    def count_completed_on(self, day):
+        """某一天完成的数量"""
+        with self._lock:
+            return self.stats().count_completed_on(day)
+
+    def timeseries(self, start, end, bucket='day', today=None):
+        """按天 / 按周的创建与完成数、连续天数和速度（只读预先聚合好的桶）"""
+        with self._lock:
+            return self.stats().timeseries(start, end, bucket, today)
+
+    def all_tags(self, prefix=''):
+        """所有用过的标签（排序去重），可按前缀过滤"""
+        with self._lock:
+            return self.tag_index().tags(prefix)
+
+    def tag_counts(self, tags):
+        """每个标签被多少条 todo 使用"""
+        with self._lock:
+            return self.tag_index().counts(tags)
+
+    def changes(self, since):
+        """
+        增量同步：since（isoformat 时间）之后新增 / 修改的 item 和删除的 id
+
+        返回 (items, deleted_ids)；since 早于最近一次整体替换或墓碑保留期时返回 None，
+        调用方应改为全量同步。
+        """
+        with self._lock:
+            return _doc_changes(self._document(), since)
+
+    def checkpoint(self):
+        """确保 todos.json 本身是完整的（备份前调用）"""
+
+    def reload(self):
+        """todos.json 被外部替换后（如恢复备份）调用，按整体替换处理"""
+        doc_store.invalidate(self.path)
+        try:
+            doc = doc_store.read_json(self.path)
+        except Exception as e:
+            print(f"[TODO] 重新加载 {os.path.basename(self.path)} 失败: {e}")
+            return
+        self.write_document(doc)
+
+
+class WriteBehindTodoBackend(JsonTodoBackend):
+    """
+    延迟写入：修改立即作用于内存中的文档（doc_store 缓存），由后台线程合并写盘
+
+    请求路径上没有磁盘 IO；进程退出时（atexit）和备份前会把未写盘的修改刷下去。
+    内存状态领先于磁盘，所以只能有一个进程写 todos.json（gunicorn 单 worker）。
+    """
+
+    def __init__(self, path, delay_ms=WRITE_BEHIND_DELAY_MS, max_ops=WRITE_BEHIND_MAX_OPS,
+                 max_staleness_ms=WRITE_BEHIND_MAX_STALENESS_MS):
+        super().__init__(path)
+        self.delay = delay_ms / 1000
+        self.max_ops = max_ops
+        self.max_staleness = max_staleness_ms / 1000
+        self.flush_count = 0
+        self._cond = threading.Condition(self._collection.lock)
+        # 写盘互斥：flush 在文档锁外写文件，整体替换不能与它交错（先取这把锁，再取文档锁）
+        self._write_lock = threading.RLock()
+        self._pending = 0
+        self._changes = 0
+        self._first_change = None
+        self._last_change = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, name='todo-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- 修改：只改内存 ----------
+
+    def _changed(self, ops):
+        """记录未写盘的修改并唤醒后台线程（调用方持有锁）"""
+        now = time.monotonic()
+        if self._pending == 0:
+            self._first_change = now
+        self._last_change = now
+        self._pending += ops
+        self._changes += 1
+        self._cond.notify()
+
+    def _persist(self, ops=1):
+        self._changed(ops)
+
+    def version(self):
+        # 内存领先于磁盘，文件版本之外再加上内存修改计数
+        return (doc_store.version(self.path), self._changes)
+
+    def write_document(self, doc):
+        """整体替换直接写盘，之前未写盘的修改随之作废"""
+        with self._write_lock, self._cond:
+            doc_store.save(self.path, _replacement_document(doc))
+            self._pending = 0
+
+    # ---------- 写盘 ----------
+
+    def _due(self):
+        """距离下一次必须写盘还有多少秒（<= 0 表示现在就写）"""
+        if self._pending >= self.max_ops:
+            return 0
+        now = time.monotonic()
+        return min(self._last_change + self.delay, self._first_change + self.max_staleness) - now
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending == 0:
+                        self._cond.wait()
+                        continue
+                    remaining = self._due()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+            # 写盘时不持有文档锁
+            try:
+                self.flush()
+            except Exception as e:
+                # 保留内存中的修改，稍后重试
+                print(f"[TODO] 延迟写入失败: {e}")
+                with self._cond:
+                    self._cond.wait(self.delay)
+
+    def flush(self):
+        """
+        立即把未写盘的修改写入 todos.json
+
+        只在序列化和登记时持有文档锁，写文件期间其他请求照常读写内存；
+        写盘期间的新修改留在 _pending 里，由下一次 flush 写入。
+        """
+        with self._write_lock:
+            with self._cond:
+                if self._pending == 0:
+                    return
+                ops = self._pending
+                started = time.monotonic()
+                generation = doc_store.generation(self.path)
+                document = self._collection.document()
+                payload = doc_store.begin_save(self.path, document)
+            written = False
+            try:
+                doc_store.write_bytes(self.path, payload)
+                written = True
+            finally:
+                with self._cond:
+                    doc_store.finish_save(self.path, document, written)
+                    if written:
+                        # 写盘会推进文档版本，聚合内容不变，跟着换成新版本避免重建
+                        if self._derived.version == generation:
+                            self._derived.version = doc_store.generation(self.path)
+                        self._pending -= ops
+                        self.flush_count += 1
+                        if self._pending:
+                            self._first_change = started
+
+    def close(self):
+        """停止后台线程并写盘（进程退出时自动调用）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def checkpoint(self):
+        self.flush()
+
+    def reload(self):
+        """todos.json 被外部替换：内存中未写盘的修改作废"""
+        with self._write_lock, self._cond:
+            self._pending = 0
+            super().reload()
+
+
+def _apply_record(items, index, record, derived=None, doc=None):
+    """把一条日志记录应用到 items / index（以及派生数据、doc 的墓碑）上（幂等，重复重放结果不变）"""
+    derived = derived if derived is not None else _new_derived()
+    op = record.get('op')
+    if op == 'insert':
+        item = record['item']
+        existing = index.get(item.get('id'))
+        if existing is None:
+            items.append(item)
+            index[item.get('id')] = item
+        else:
+            derived.discard(existing)
+            existing.clear()
+            existing.update(item)
+            item = existing
+        derived.add(item)
+    elif op == 'update':
+        item = index.get(record.get('id'))
+        if item is not None:
+            derived.discard(item)
+            item.update(record.get('set', {}))
+            derived.add(item)
+    elif op == 'delete':
+        removed = index.pop(record.get('id'), None)
+        if removed is not None:
+            derived.discard(removed)
+            items[:] = [item for item in items if item.get('id') != record.get('id')]
+        if doc is not None and record.get('at'):
+            _add_tombstone(doc, record.get('id'), record['at'])
+    elif op == 'batch':
+        for update in record.get('updates', []):
+            item = index.get(update.get('id'))
+            if item is not None:
+                derived.discard(item)
+                item.update(update.get('set', {}))
+                derived.add(item)
+
+
+class JournalTodoBackend(JsonTodoBackend):
+    """快照 + 追加日志：写入成本只和本次修改的大小有关"""
+
+    def __init__(self, path, log_path, max_records=JOURNAL_MAX_RECORDS, max_bytes=JOURNAL_MAX_BYTES):
+        self.path = path
+        self.log_path = log_path
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._doc = None
+        self._index = {}
+        self._derived = _new_derived()
+        self._snapshot_key = None
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_records = 0
+
+    # ---------- 读取：快照 + 日志重放 ----------
+
+    def _document(self):
+        with self._lock:
+            self._refresh()
+            return self._doc
+
+    def items(self):
+        return self._document()['items']
+
+    def get(self, item_id):
+        with self._lock:
+            self._refresh()
+            return self._index.get(item_id)
+
+    def version(self):
+        # 快照和日志两个文件的 stat：追加日志会改变大小和 mtime，合并会换 inode
+        return (doc_store.stat_key(self.path), doc_store.stat_key(self.log_path))
+
+    def derived(self):
+        """统计聚合和标签索引随快照重建和日志重放同步维护"""
+        with self._lock:
+            self._refresh()
+            return self._derived
+
+    def _refresh(self):
+        """同步内存状态：只重放日志新增的部分，快照或日志文件被替换时整体重建"""
+        snapshot_key = doc_store.stat_key(self.path)
+        log_key = doc_store.stat_key(self.log_path)
+        log_inode = log_key[2] if log_key else None
+        log_size = log_key[1] if log_key else 0
+
+        if (self._doc is None or snapshot_key != self._snapshot_key
+                or log_inode != self._log_inode or log_size < self._log_offset):
+            self._rebuild()
+        elif log_size > self._log_offset:
+            self._replay_tail()
+
+    def _rebuild(self):
+        snapshot_key = doc_store.stat_key(self.path)
+        doc = _empty_document()
+        if snapshot_key is not None:
+            try:
+                doc = doc_store.read_json(self.path)
+            except Exception as e:
+                print(f"[JOURNAL] 读取快照失败: {e}")
+        doc.setdefault('items', [])
+        self._doc = doc
+        self._index = {}
+        for item in doc['items']:
+            self._index.setdefault(item.get('id'), item)
+        self._derived.rebuild(doc['items'])
+        self._snapshot_key = snapshot_key
+        log_key = doc_store.stat_key(self.log_path)
+        self._log_inode = log_key[2] if log_key else None
+        self._log_offset = 0
+        self._log_records = 0
+        self._replay_tail()
+
+    def _replay_tail(self):
+        """从上次的位置继续重放日志，只消费完整的行"""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return
+        items = self._doc['items']
+        for line in chunk[:end].split(b'\n'):
+            if not line.strip():
+                continue
+            try:
+                _apply_record(items, self._index, doc_store.loads(line), self._derived, self._doc)
+            except Exception as e:
+                print(f"[JOURNAL] 跳过损坏的日志记录: {e}")
+            self._log_records += 1
+        self._log_offset += end + 1
+
+    # ---------- 写入：追加一行日志 ----------
+
+    @contextmanager
+    def _locked_log(self):
+        """以独占方式打开日志文件（跨进程），保证拿到的是当前的日志文件"""
+        while True:
+            fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            # 合并时会用新文件替换日志，打开和加锁之间可能已经被换掉
+            try:
+                current = os.stat(self.log_path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                break
+            os.close(fd)
+        try:
+            yield fd
+        finally:
+            os.close(fd)  # 关闭即释放 flock
+
+    def _append(self, record):
+        line = doc_store.dumps(record, compact=True) + b'\n'
+        with self._locked_log() as fd:
+            os.write(fd, line)
+        # 通过重放把自己的记录（以及其他进程刚追加的记录）应用到内存状态
+        self._refresh()
+        if self._log_records >= self.max_records or self._log_offset >= self.max_bytes:
+            self.compact()
+
+    def insert(self, item):
+        with self._lock:
+            self._append({'op': 'insert', 'item': item})
+            return self._index.get(item['id'], item)
+
+    def update(self, item_id, changes):
+        with self._lock:
+            if self.get(item_id) is None:
+                return None
+            self._append({'op': 'update', 'id': item_id, 'set': changes})
+            return self._index.get(item_id)
+
+    def delete(self, item_id):
+        with self._lock:
+            if self.get(item_id) is None:
+                return False
+            self._append({'op': 'delete', 'id': item_id, 'at': _now()})
+            return True
+
+    def batch_update(self, updates):
+        with self._lock:
+            self._refresh()
+            records = [{'id': i, 'set': c} for i, c in updates if i in self._index]
+            if records:
+                self._append({'op': 'batch', 'updates': records})
+            return len(records)
+
+    def write_document(self, doc):
+        """整体替换：直接写新快照并清空日志"""
+        with self._lock, self._locked_log():
+            doc_store.write_json(self.path, _replacement_document(doc))
+            self._reset_log()
+            self._rebuild()
+
+    # ---------- 合并 ----------
+
+    def compact(self):
+        """把日志合并进 todos.json，然后换一个空日志"""
+        with self._lock, self._locked_log():
+            # 持有日志锁期间没有人能追加，此时的状态就是完整状态
+            self._refresh()
+            doc_store.write_json(self.path, self._doc)
+            self._reset_log()
+            self._snapshot_key = doc_store.stat_key(self.path)
+            log_key = doc_store.stat_key(self.log_path)
+            self._log_inode = log_key[2] if log_key else None
+            self._log_offset = 0
+            self._log_records = 0
+
+    def _reset_log(self):
+        """用新的空文件替换日志（换 inode，其他进程据此发现需要重建）"""
+        temp_path = f"{self.log_path}.{os.getpid()}.tmp"
+        open(temp_path, 'wb').close()
+        os.replace(temp_path, self.log_path)
+
+    def checkpoint(self):
+        self.compact()
+
+    def reload(self):
+        """todos.json 被外部替换：旧日志不再适用，丢弃"""
+        try:
+            doc = doc_store.read_json(self.path)
+        except Exception as e:
+            print(f"[JOURNAL] 重新加载快照失败: {e}")
+            with self._lock, self._locked_log():
+                self._reset_log()
+                self._rebuild()
+            return
+        self.write_document(doc)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id           TEXT PRIMARY KEY,
+    text         TEXT NOT NULL DEFAULT '',
+    tab          TEXT,
+    quadrant     TEXT,
+    completed    INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    created_at   TEXT,
+    updated_at   TEXT,
+    extra        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_todos_tab ON todos(tab);
+CREATE INDEX IF NOT EXISTS idx_todos_quadrant ON todos(quadrant);
+CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos(completed, completed_at);
+CREATE INDEX IF NOT EXISTS idx_todos_updated_at ON todos(updated_at);
+CREATE TABLE IF NOT EXISTS todo_tags (
+    todo_id  TEXT NOT NULL REFERENCES todos(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag      TEXT NOT NULL,
+    PRIMARY KEY (todo_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_todo_tags_tag ON todo_tags(tag);
+-- 删除记录的墓碑，供增量同步返回
+CREATE TABLE IF NOT EXISTS todo_tombstones (
+    id         TEXT PRIMARY KEY,
+    deleted_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_todo_tombstones_deleted_at ON todo_tombstones(deleted_at);
+-- generation：todos 表每变一行加一（整数），跨进程判断内存中的统计聚合是否过期
+-- reset_at：最近一次整体替换的时间（isoformat 文本），早于它的同步游标失效
+-- value 不声明类型：两种值都按写入时的类型原样保存
+CREATE TABLE IF NOT EXISTS todo_meta (
+    key   TEXT PRIMARY KEY,
+    value NOT NULL
+);
+INSERT OR IGNORE INTO todo_meta (key, value) VALUES ('generation', 0);
+CREATE TRIGGER IF NOT EXISTS todos_generation_insert AFTER INSERT ON todos
+BEGIN UPDATE todo_meta SET value = value + 1 WHERE key = 'generation'; END;
+CREATE TRIGGER IF NOT EXISTS todos_generation_update AFTER UPDATE ON todos
+BEGIN UPDATE todo_meta SET value = value + 1 WHERE key = 'generation'; END;
+CREATE TRIGGER IF NOT EXISTS todos_generation_delete AFTER DELETE ON todos
+BEGIN UPDATE todo_meta SET value = value + 1 WHERE key = 'generation'; END;
+"""
+
+# 有独立列的字段，其余字段原样存进 extra（JSON）
+_COLUMNS = ('id', 'text', 'tab', 'quadrant', 'completed', 'completed_at', 'created_at', 'updated_at')
+
+
+class SqliteTodoBackend:
+    """SQLite 存储：适合大量历史任务，查询走索引而不是全表扫描"""
+
+    def __init__(self, db_path, json_path=None):
+        self.db_path = db_path
+        self.json_path = json_path
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._derived = _new_derived()
+        is_new = not os.path.exists(db_path)
+        self._conn().executescript(_SCHEMA)
+        # 第一次切换到 sqlite 时自动从 todos.json 迁移
+        if is_new and json_path and os.path.exists(json_path):
+            count = self.migrate_from_json(json_path)
+            print(f"[TODO] 已从 {os.path.basename(json_path)} 迁移 {count} 条任务到 SQLite")
+
+    def _conn(self):
+        """每个线程一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None：事务由 _transaction() 显式控制
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        with self._lock:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def generation(self):
+        """数据库版本号（任何进程修改 todos 表都会递增）"""
+        return self._conn().execute("SELECT value FROM todo_meta WHERE key = 'generation'").fetchone()[0]
+
+    def version(self):
+        # 数据库文件被整个替换时计数器会从头开始，带上 inode 区分
+        key = doc_store.stat_key(self.db_path)
+        return (key[2] if key else None, self.generation())
+
+    def derived(self):
+        """统计聚合和标签索引：版本号没变就直接用内存中的，变了（其他进程写入）才重新统计"""
+        with self._lock:
+            generation = self.generation()
+            if self._derived.version != generation:
+                conn = self._conn()
+                rows = [dict(row) for row in conn.execute(
+                    "SELECT id, text, tab, quadrant, completed, completed_at, created_at FROM todos")]
+                tags = {}
+                for row in conn.execute("SELECT todo_id, tag FROM todo_tags ORDER BY todo_id, position"):
+                    tags.setdefault(row['todo_id'], []).append(row['tag'])
+                for row in rows:
+                    row['tags'] = tags.get(row['id'], [])
+                self._derived.rebuild(rows, generation)
+            return self._derived
+
+    def stats(self):
+        return self.derived().stats
+
+    def tag_index(self):
+        return self.derived().tags
+
+    def search(self, terms, limit):
+        """全文检索，返回得分最高的 [(score, item), ...]"""
+        with self._lock:
+            scores = self.derived().text.search(terms)
+            top = sorted(scores.items(), key=lambda pair: -pair[1])[:limit]
+            return [(score, self.get(item_id)) for item_id, score in top]
+
+    @contextmanager
+    def _tracking(self):
+        """写事务内同步维护统计聚合，提交后对应新的版本号"""
+        with self._transaction() as conn:
+            derived = self.derived()
+            try:
+                yield conn, derived
+            except BaseException:
+                derived.version = None
+                raise
+            derived.version = self.generation()
+
+    # ---------- 行 <-> item ----------
+
+    def _row_to_item(self, row, tags):
+        item = {
+            'id': row['id'],
+            'text': row['text'],
+            'tab': row['tab'],
+            'quadrant': row['quadrant'],
+            'tags': tags,
+            'completed': bool(row['completed']),
+            'completed_at': row['completed_at'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+        if row['extra']:
+            item.update(json.loads(row['extra']))
+        return item
+
+    def _tags_for(self, conn, ids):
+        """批量取标签 {todo_id: [tag, ...]}"""
+        tags = {item_id: [] for item_id in ids}
+        if not ids:
+            return tags
+        # SQLite 默认最多 999 个参数，分批查询
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT todo_id, tag FROM todo_tags WHERE todo_id IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY todo_id, position", chunk)
+            for row in rows:
+                tags[row['todo_id']].append(row['tag'])
+        return tags
+
+    def _select(self, where='', params=(), order='rowid'):
+        conn = self._conn()
+        rows = conn.execute(f"SELECT * FROM todos {where} ORDER BY {order}", params).fetchall()
+        tags = self._tags_for(conn, [row['id'] for row in rows])
+        return [self._row_to_item(row, tags[row['id']]) for row in rows]
+
+    def _write_item(self, conn, item):
+        extra = {k: v for k, v in item.items() if k not in _COLUMNS and k != 'tags'}
+        conn.execute(
+            "INSERT OR REPLACE INTO todos (id, text, tab, quadrant, completed, completed_at, created_at, updated_at, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (item['id'], item.get('text', ''), item.get('tab'), item.get('quadrant'),
+             1 if item.get('completed') else 0, item.get('completed_at'),
+             item.get('created_at'), item.get('updated_at'),
+             json.dumps(extra, ensure_ascii=False) if extra else None))
+        conn.execute("DELETE FROM todo_tags WHERE todo_id = ?", (item['id'],))
+        conn.executemany("INSERT INTO todo_tags (todo_id, position, tag) VALUES (?, ?, ?)",
+                         [(item['id'], i, tag) for i, tag in enumerate(item.get('tags') or [])])
+
+    # ---------- 与 JSON 后端相同的接口 ----------
+
+    def read_document(self):
+        return {'items': self.items()}
+
+    def write_document(self, doc):
+        self._replace(doc.get('items', []), _now())
+
+    def _replace(self, items, reset_at, tombstones=()):
+        """整体替换 todos，记录 reset_at（为空时不改），并补充墓碑"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM todos")
+            for item in items:
+                self._write_item(conn, item)
+            conn.executemany("INSERT OR REPLACE INTO todo_tombstones (id, deleted_at) VALUES (?, ?)",
+                             [(t.get('id'), t.get('deleted_at')) for t in tombstones
+                              if t.get('id') is not None and t.get('deleted_at')])
+            if reset_at:
+                conn.execute("INSERT OR REPLACE INTO todo_meta (key, value) VALUES ('reset_at', ?)", (reset_at,))
+
+    def items(self):
+        return self._select()
+
+    def get(self, item_id):
+        items = self._select("WHERE id = ?", (item_id,))
+        return items[0] if items else None
+
+    def insert(self, item):
+        with self._tracking() as (conn, derived):
+            existing = self.get(item['id'])
+            if existing is not None:
+                derived.discard(existing)
+            self._write_item(conn, item)
+            derived.add(item)
+        return item
+
+    def update(self, item_id, changes):
+        with self._tracking() as (conn, derived):
+            item = self.get(item_id)
+            if item is None:
+                return None
+            derived.discard(item)
+            item.update(changes)
+            self._write_item(conn, item)
+            derived.add(item)
+        return item
+
+    def delete(self, item_id):
+        with self._tracking() as (conn, derived):
+            item = self.get(item_id)
+            if item is None:
+                return False
+            conn.execute("DELETE FROM todos WHERE id = ?", (item_id,))
+            conn.execute("INSERT OR REPLACE INTO todo_tombstones (id, deleted_at) VALUES (?, ?)",
+                         (item_id, _now()))
+            conn.execute("DELETE FROM todo_tombstones WHERE deleted_at < ?", (_sync_horizon(),))
+            derived.discard(item)
+            return True
+
+    def batch_update(self, updates):
+        count = 0
+        with self._tracking() as (conn, derived):
+            for item_id, changes in updates:
+                item = self.get(item_id)
+                if item is not None:
+                    derived.discard(item)
+                    item.update(changes)
+                    self._write_item(conn, item)
+                    derived.add(item)
+                    count += 1
+        return count
+
+    def list_items(self, tab=None, tag=None):
+        order = 'completed, created_at'
+        conditions, params = [], []
+        if tab:
+            conditions.append("tab = ?")
+            params.append(tab)
+        if tag:
+            conditions.append("id IN (SELECT todo_id FROM todo_tags WHERE tag = ?)")
+            params.append(tag)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self._select(where, params, order)
+
+    def status_counts(self):
+        rows = self._conn().execute(
+            "SELECT tab, quadrant, completed, COUNT(*) AS n FROM todos GROUP BY tab, quadrant, completed")
+        return Counter({(row['tab'], row['quadrant'], bool(row['completed'])): row['n'] for row in rows})
+
+    def count_completed_on(self, day):
+        # completed_at 是 isoformat 字符串，按字典序做区间查询即可走索引
+        start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM todos WHERE completed = 1 AND completed_at >= ? AND completed_at < ?",
+            (start, end)).fetchone()
+        return row[0]
+
+    def all_tags(self, prefix=''):
+        with self._lock:
+            return self.tag_index().tags(prefix)
+
+    def tag_counts(self, tags):
+        with self._lock:
+            return self.tag_index().counts(tags)
+
+    def timeseries(self, start, end, bucket='day', today=None):
+        with self._lock:
+            return self.stats().timeseries(start, end, bucket, today)
+
+    def changes(self, since):
+        """增量同步，走 updated_at 和墓碑表的索引"""
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM todo_meta WHERE key = 'reset_at'").fetchone()
+        if since < max(str(row[0]) if row else '', _sync_horizon()):
+            return None
+        items = self._select("WHERE updated_at >= ? OR (updated_at IS NULL AND created_at >= ?)",
+                             (since, since), 'completed, created_at')
+        deleted = [r[0] for r in conn.execute(
+            "SELECT id FROM todo_tombstones WHERE deleted_at >= ? ORDER BY deleted_at", (since,))]
+        return items, deleted
+
+    # ---------- 迁移 / 备份 ----------
+
+    def migrate_from_json(self, json_path):
+        """
+        一次性把 todos.json 导入数据库（覆盖现有数据），返回条数
+
+        数据没有变，只是换了存储：沿用 JSON 文档里的 reset_at 和墓碑，
+        迁移前同步过的客户端继续拿增量，而不是全部重置。
+        """
+        doc = doc_store.read_json(json_path)
+        self._replace(doc.get('items', []), doc.get('reset_at'), doc.get('deleted', []))
+        return len(doc.get('items', []))
+
+    def checkpoint(self):
+        """备份只拷贝 todos.json，所以先把数据库导出一份"""
+        if self.json_path:
+            doc_store.write_json(self.json_path, self.read_document())
+
+    def reload(self):
+        """todos.json 被恢复后重新导入（数据变了，按整体替换处理）"""
+        if self.json_path and os.path.exists(self.json_path):
+            self.write_document(doc_store.read_json(self.json_path))
+
+
+def create_backend(kind, path, log_path, db_path):
+    """按配置创建 todo 存储后端"""
+    if kind == 'journal':
+        return JournalTodoBackend(path, log_path)
+    if kind == 'sqlite':
+        return SqliteTodoBackend(db_path, json_path=path)
+    if kind == 'write-behind':
+        return WriteBehindTodoBackend(path)
+    if kind != 'json':
+        print(f"[TODO] 未知的存储模式 {kind!r}，使用 json")
+    return JsonTodoBackend(path)
+
+
+if __name__ == '__main__':
+    # 一次性迁移：python backend/todo_storage.py [todos.json] [todos.db]
+    import sys
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(data_dir, 'todos.json')
+    db_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(data_dir, 'todos.db')
+    count = SqliteTodoBackend(db_path).migrate_from_json(json_path)
+    print(f"已迁移 {count} 条任务: {json_path} -> {db_path}")
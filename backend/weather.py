@@ -0,0 +1,176 @@
+# 天气缓存（/api/weather）：按城市缓存 wttr.in 的查询结果
+#
+# - 以规范化的城市名为键的 LRU，最多 MAX_CITIES 个城市
+# - FRESH_TTL 内直接返回；过期但不超过 STALE_TTL 时先返回旧值（cached=True），
+#   同时在后台刷新（stale-while-revalidate）
+# - 同一城市同时只有一个上游请求（singleflight），并发的未命中等待它的结果
+# - 查询失败也缓存 NEGATIVE_TTL 秒：没有旧值时直接返回失败结果，有旧值时返回旧值，
+#   这段时间内都不再请求上游
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+WTTR_URL = 'https://wttr.in/{city}?format=j1'
+FRESH_TTL = 600          # 10 分钟
+STALE_TTL = 6 * 3600
+NEGATIVE_TTL = 60
+MAX_CITIES = 64
+TIMEOUT = 5
+
+# wttr.in 天气代码 → (类型, 图标)
+_CODE_TYPES = [
+    ({113}, 'sunny', '☀️'),  # 晴天
+    ({116, 119, 122}, 'cloudy', '☁️'),  # 多云/阴天
+    ({176, 263, 266, 293, 296, 299, 302, 305, 308, 311, 314, 353, 356, 359}, 'rainy', '🌧️'),  # 雨
+    ({179, 182, 185, 227, 230, 317, 320, 323, 326, 329, 332, 335, 338, 350, 362, 365, 368,
+      371, 374, 377, 392, 395}, 'snowy', '❄️'),  # 雪
+    ({200, 386, 389}, 'stormy', '⛈️'),  # 雷暴
+]
+
+
+def normalize_city(city):
+    """缓存键：忽略大小写和多余空白（'waterloo, ontario' 与 'Waterloo,Ontario' 相同）"""
+    return ','.join(' '.join(part.split()) for part in city.split(',')).lower()
+
+
+def parse_weather(city, weather_data):
+    """wttr.in 的 JSON → 接口返回的结果"""
+    current = weather_data.get('current_condition', [{}])[0]
+    weather_code = int(current.get('weatherCode', 113))
+    weather_type, icon = 'cloudy', '☁️'
+    for codes, code_type, code_icon in _CODE_TYPES:
+        if weather_code in codes:
+            weather_type, icon = code_type, code_icon
+            break
+    return {
+        'success': True,
+        'weather_type': weather_type,
+        'icon': icon,
+        'temp_c': current.get('temp_C', '--'),
+        'temp_f': current.get('temp_F', '--'),
+        'humidity': current.get('humidity', '--'),
+        'description': current.get('weatherDesc', [{}])[0].get('value', ''),
+        'city': city,
+        'cached': False
+    }
+
+
+def failure(error):
+    return {
+        'success': False,
+        'error': error,
+        'weather_type': 'cloudy',
+        'icon': '☁️',
+        'temp_c': '--',
+        'description': '无法获取天气'
+    }
+
+
+class _Entry:
+    __slots__ = ('result', 'fetched_at', 'error', 'failed_at')
+
+    def __init__(self):
+        self.result = None      # 最近一次成功的结果
+        self.fetched_at = 0.0
+        self.error = None       # 最近一次失败的原因
+        self.failed_at = None
+
+
+class _Flight:
+    """一次进行中的上游请求"""
+    __slots__ = ('done',)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class WeatherCache:
+    def __init__(self, base_url=WTTR_URL, fresh_ttl=FRESH_TTL, stale_ttl=STALE_TTL,
+                 negative_ttl=NEGATIVE_TTL, max_cities=MAX_CITIES, timeout=TIMEOUT, clock=time.monotonic):
+        self.base_url = base_url
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_cities = max_cities
+        self.timeout = timeout
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, city):
+        """请求上游，返回解析后的 JSON（失败时抛出异常）"""
+        url = self.base_url.format(city=urllib.parse.quote(city, safe=','))
+        req = urllib.request.Request(url, headers={'User-Agent': 'curl/7.68.0'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def get(self, city):
+        """城市的天气结果（总是返回可以直接 jsonify 的字典）"""
+        key = normalize_city(city)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            may_retry = entry.failed_at is None or now - entry.failed_at >= self.negative_ttl
+            if entry.result is not None:
+                age = now - entry.fetched_at
+                if age < self.fresh_ttl:
+                    return entry.result
+                if age < self.stale_ttl or not may_retry:
+                    if may_retry:
+                        self._start(key, city, background=True)
+                    return dict(entry.result, cached=True)
+            elif not may_retry:
+                return failure(entry.error)
+        self._start(key, city, background=False)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return failure('天气查询超时')
+        if entry.result is None:
+            return failure(entry.error)
+        return entry.result if entry.fetched_at >= now else dict(entry.result, cached=True)
+
+    def _start(self, key, city, background):
+        """发起（或加入已有的）上游请求；background=False 时等它完成"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            if background:
+                threading.Thread(target=self._refresh, args=(key, city, flight),
+                                 name='weather-refresh', daemon=True).start()
+            else:
+                self._refresh(key, city, flight)
+        elif not background:
+            flight.done.wait(self.timeout + 1)
+
+    def _refresh(self, key, city, flight):
+        result = error = None
+        try:
+            result = parse_weather(city, self.fetch(city))
+        except Exception as e:
+            error = str(e)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+                while len(self._entries) > self.max_cities:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            if result is not None:
+                entry.result, entry.fetched_at = result, now
+                entry.error = entry.failed_at = None
+            else:
+                entry.error, entry.failed_at = error, now
+            del self._flights[key]
+        flight.done.set()